@@ -0,0 +1,44 @@
+"""Benchmark: scalar ActionEngine.get_action loop vs the vectorized get_actions.
+
+Run from the backend directory:
+    python -m benchmarks.bench_action_engine [--resources 10000] [--json out.json]
+"""
+import argparse
+import time
+import numpy as np
+from benchmarks.common import write_json
+from services.action_engine import ActionEngine
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=10000)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    n = args.resources
+    cpu, memory = rng.uniform(10, 95, n), rng.uniform(10, 95, n)
+    instances, confidence = rng.integers(1, 10, n), rng.uniform(0.3, 0.95, n)
+    action_engine = ActionEngine()
+    
+    cases = {
+        "scalar_loop": lambda: [
+            action_engine.get_action(c, m, i, k)
+            for c, m, i, k in zip(cpu.tolist(), memory.tolist(), instances.tolist(), confidence.tolist())
+        ],
+        "vectorized": lambda: action_engine.get_actions(cpu, memory, instances, confidence),
+        "vectorized_with_reasons": lambda: action_engine.get_actions(cpu, memory, instances, confidence, with_reasons=True),
+    }
+    results = {}
+    print(f"\nActionEngine over {n} resources")
+    for name, fn in cases.items():
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        results[name] = {"seconds": round(elapsed, 6), "resources_per_sec": round(n / elapsed, 1)}
+        print(f"{name:<26}{elapsed * 1000:>10.2f} ms{n / elapsed:>16,.0f} resources/sec")
+    if args.json:
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
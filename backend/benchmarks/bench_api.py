@@ -0,0 +1,344 @@
+"""Benchmark: end-to-end latency, throughput and memory of the API hot paths.
+
+Runs the FastAPI app in-process (with its lifespan: ring buffers, scheduler, /ws hub)
+on a temporary SQLite DB seeded with --resources simulated resources
+(utils.simulate_data). Cases:
+    HTTP endpoints      latency percentiles over --requests sequential calls, throughput
+                        with --concurrency client threads, peak RSS
+    /ws                 connect-to-first-frame latency, producer tick time, and delivery
+                        from an ingest call to every one of --ws-clients fleet-wide clients
+    model               LSTMModel.predict, predict_batch over the fleet, model load
+    cold start          a fresh interpreter from import to the first /api/predict response
+Without --model-dir, a briefly trained model with the production architecture is published
+to the temp dir; its weights don't affect latency. Peak RSS is reset before each case
+where Linux allows it (/proc/self/clear_refs); elsewhere it is the process peak so far.
+Results go to --json. --compare baseline.json flags cases whose latency, throughput or
+memory regressed by more than --threshold, and exits 1 if any did. Run from the backend
+directory:
+    python -m benchmarks.bench_api [--resources 200] [--requests 300] [--json out.json] [--compare baseline.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from benchmarks.common import percentiles, time_calls, write_json
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_EPOCH = datetime(1970, 1, 1)
+
+# Lower is better for every compared metric except throughput
+COMPARED = ("p50_ms", "p99_ms", "throughput_rps", "peak_rss_mb", "total_seconds")
+
+COLD_START = """
+import json, resource, sys, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    response = client.get("/api/predict/", params={"resource_id": sys.argv[1]})
+    response.raise_for_status()
+    answered = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": ready - imported,
+    "first_request_seconds": answered - ready,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+def reset_peak_rss():
+    """Reset the process's peak RSS (VmHWM); False where the kernel doesn't allow it"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(call, requests, concurrency):
+    """Sequential latency percentiles, then throughput of the same call from concurrent threads"""
+    reset_peak_rss()
+    latency = percentiles(time_calls(call, requests))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(call) for _ in range(requests)]:
+            future.result()
+    return {
+        "latency": latency,
+        "throughput_rps": round(requests / (time.perf_counter() - started), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def seed_database(client, simulator, first_step, steps, step_seconds, batch_steps=20):
+    """POST steps samples per resource through /api/metrics/ingest, which also fills the ring buffers"""
+    for step in range(first_step, first_step + steps, batch_steps):
+        rows = ingest_rows(simulator, step, min(batch_steps, first_step + steps - step), step_seconds)
+        client.post("/api/metrics/ingest", json=rows).raise_for_status()
+    return steps * len(simulator)
+
+def ensure_model(model_dir):
+    """Publish quickly trained production-shaped models unless model_dir already has them"""
+    from config import settings
+    from model.lstm_model import LSTMModel
+    from model.training_data import generate_patterns
+
+    trained = False
+    for horizon in (1, settings.prediction_horizon):
+        lstm_model = LSTMModel(horizon=horizon, load=False)
+        if os.path.exists(lstm_model.model_path):
+            continue
+        lstm_model.model = lstm_model._build_model((lstm_model.sequence_length, 1))
+        X, y = generate_patterns(512, lstm_model.sequence_length, horizon, rng=np.random.default_rng(0))
+        lstm_model.model.fit(X, y, epochs=1, batch_size=64, verbose=0)
+        lstm_model._publish()
+        trained = True
+    return trained
+
+def bench_model(args, simulator):
+    from model.lstm_model import LSTMModel
+
+    reset_peak_rss()
+    load_ms = time_calls(LSTMModel, iterations=3, warmup=1)
+    lstm_model = LSTMModel()
+    windows = simulator.generate(0, lstm_model.sequence_length)
+    window, fleet = windows["cpu"], np.concatenate([windows["cpu"], windows["memory"]])
+    return {
+        "model load": {"latency": percentiles(load_ms), "peak_rss_mb": round(peak_rss_mb(), 1)},
+        "LSTMModel.predict": {"latency": percentiles(time_calls(lambda: lstm_model.predict(window[0]), args.requests))},
+        f"predict_batch x{len(fleet)}": {"latency": percentiles(time_calls(lambda: lstm_model.predict_batch(fleet), 50))},
+    }
+
+def bench_ws(client, simulator, args, next_step):
+    """Fleet-wide batched JSON clients; each round ingests one sample per resource"""
+    from services.broadcast import broadcast_hub
+
+    reset_peak_rss()
+    connect_ms, sockets = [], []
+    for _ in range(args.ws_clients):
+        started = time.perf_counter()
+        session = client.websocket_connect("/ws?resources=*&batch=1")
+        ws = session.__enter__()
+        ws.receive_text()  # Connect-time replay of every resource's latest sample
+        connect_ms.append((time.perf_counter() - started) * 1000)
+        sockets.append((session, ws))
+
+    delivery_ms, tick_ms = [], []
+    try:
+        for _ in range(args.ws_rounds):
+            step = next(next_step)
+            rows = ingest_rows(simulator, step, 1, args.step_seconds)
+            timestamp = rows[0]["timestamp"]
+            client.post("/api/metrics/ingest", json=rows).raise_for_status()
+            started = time.perf_counter()
+            for _, ws in sockets:
+                while timestamp not in ws.receive_text():
+                    pass  # A tick that ran before this round's rows were committed
+            delivery_ms.append((time.perf_counter() - started) * 1000)
+            tick_ms.append(broadcast_hub.last_tick_seconds * 1000)
+    finally:
+        for session, _ in sockets:
+            session.__exit__(None, None, None)
+    return {
+        "ws connect": {"latency": percentiles(connect_ms)},
+        "ws tick": {"latency": percentiles(tick_ms)},
+        "ws ingest->delivery": {"latency": percentiles(delivery_ms), "peak_rss_mb": round(peak_rss_mb(), 1)},
+    }
+
+def ingest_rows(simulator, first_step, steps, step_seconds):
+    """MetricIngest dicts for every resource at each step, one step after another"""
+    values = {metric: matrix.round(2).T.tolist() for metric, matrix in simulator.generate(first_step, steps).items()}
+    instances = simulator.instance_counts.tolist()
+    rows = []
+    for i in range(steps):
+        timestamp = (_EPOCH + timedelta(seconds=(first_step + i) * step_seconds)).isoformat()
+        rows.extend(
+            {"resource_id": resource_id, "timestamp": timestamp, "cpu": c, "memory": m, "network": n, "instance_count": k}
+            for resource_id, c, m, n, k in zip(simulator.resource_ids, values["cpu"][i], values["memory"][i],
+                                               values["network"][i], instances)
+        )
+    return rows
+
+def bench_cold_start(resource_id):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", COLD_START, resource_id], cwd=BACKEND_DIR, env=os.environ,
+                            capture_output=True, text=True, check=True)
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats["total_seconds"] = time.perf_counter() - started
+    return {"cold start": {key: round(value, 3) for key, value in stats.items()}}
+
+def run(args):
+    from utils.simulate_data import FleetSimulator
+
+    simulator = FleetSimulator(args.resources, seed=args.seed)
+    trained = ensure_model(os.environ["MODEL_DIR"])
+    cases = bench_model(args, simulator)
+
+    from fastapi.testclient import TestClient
+    from config import settings
+    from services.broadcast import broadcast_hub
+    from services.scheduler import forecast_scheduler
+    import main
+
+    broadcast_hub.interval = args.ws_interval
+    resource_ids = itertools.cycle(simulator.resource_ids)
+    end_step = int((datetime.utcnow() - _EPOCH).total_seconds() // args.step_seconds)
+    first_step = end_step - args.history_steps + 1
+    range_start = (_EPOCH + timedelta(seconds=first_step * args.step_seconds)).isoformat()
+    with TestClient(main.app) as client:
+        started = time.perf_counter()
+        rows = seed_database(client, simulator, first_step, args.history_steps, args.step_seconds)
+        seed_seconds = time.perf_counter() - started
+        if settings.forecast_scheduler_enabled:
+            # Publish a snapshot of the seeded fleet rather than waiting for the next cycle
+            client.portal.call(forecast_scheduler.run_cycle)
+
+        def get(path, **params):
+            return lambda: client.get(path, params={"resource_id": next(resource_ids), **params}).raise_for_status()
+
+        etags = {}
+
+        def revalidate():
+            """A polling dashboard: send back the last ETag, expect 304 while nothing changed"""
+            resource_id = next(resource_ids)
+            headers = {"If-None-Match": etags[resource_id]} if resource_id in etags else {}
+            response = client.get("/api/dashboard/overview", params={"resource_id": resource_id}, headers=headers)
+            if response.status_code not in (200, 304):
+                response.raise_for_status()
+            etags[resource_id] = response.headers["etag"]
+
+        endpoints = {
+            "GET /api/predict": get("/api/predict/"),
+            "GET /api/predict/fleet": lambda: client.get("/api/predict/fleet").raise_for_status(),
+            "GET /api/dashboard/stats": get("/api/dashboard/stats"),
+            "GET /api/dashboard/overview": get("/api/dashboard/overview"),
+            "GET /api/dashboard/overview If-None-Match": revalidate,
+            "GET /api/metrics/history": get("/api/metrics/history", limit=100),
+            "GET /api/metrics/history range": get("/api/metrics/history", start=range_start),
+        }
+        for name, call in endpoints.items():
+            cases[name] = measure(call, args.requests, args.concurrency)
+            print(f"{name}: p50 {cases[name]['latency']['p50_ms']:.2f} ms")
+        cases.update(bench_ws(client, simulator, args, itertools.count(end_step + 1)))
+
+    if not args.skip_cold_start:
+        cases.update(bench_cold_start(simulator.resource_ids[0]))
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "seeded_rows": rows,
+            "seed_seconds": round(seed_seconds, 2),
+            "model_trained_for_benchmark": trained,
+        },
+        "cases": cases,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def flatten(stats, prefix=""):
+    """{"latency": {"p50_ms": 1.0}} -> {"latency.p50_ms": 1.0}"""
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(results, baseline, threshold):
+    """Print every compared metric against the baseline; returns the regressions"""
+    regressions = []
+    print(f"\n{'case':<34}{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for case, stats in results["cases"].items():
+        old = flatten(baseline.get("cases", {}).get(case, {}))
+        for metric, value in flatten(stats).items():
+            if not metric.endswith(COMPARED) or not old.get(metric):
+                continue
+            change = value / old[metric] - 1
+            worse = -change if metric.endswith("_rps") else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            if flag:
+                regressions.append((case, metric, change))
+            print(f"{case:<34}{metric:<24}{old[metric]:>12.3f}{value:>12.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+def print_summary(results):
+    print(f"\n{'case':<34}{'p50_ms':>10}{'p99_ms':>10}{'req/s':>10}{'peak MB':>10}")
+    for case, stats in results["cases"].items():
+        latency = stats.get("latency", {})
+        print(f"{case:<34}{latency.get('p50_ms', float('nan')):>10.2f}{latency.get('p99_ms', float('nan')):>10.2f}"
+              f"{stats.get('throughput_rps', float('nan')):>10.1f}{stats.get('peak_rss_mb', float('nan')):>10.1f}")
+    cold = results["cases"].get("cold start")
+    if cold:
+        print(f"cold start {cold['total_seconds']:.2f}s (import {cold['import_seconds']:.2f}s, startup "
+              f"{cold['startup_seconds']:.2f}s, first /api/predict {cold['first_request_seconds']:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=200)
+    parser.add_argument("--history-steps", type=int, default=360, help="Seeded samples per resource")
+    parser.add_argument("--step-seconds", type=float, default=10.0, help="Simulated time between samples")
+    parser.add_argument("--requests", type=int, default=300, help="Calls per case (sequential, then concurrent)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads for the throughput runs")
+    parser.add_argument("--ws-clients", type=int, default=20)
+    parser.add_argument("--ws-rounds", type=int, default=10)
+    parser.add_argument("--ws-interval", type=float, default=0.1, help="Broadcast interval during the /ws case")
+    parser.add_argument("--model-dir", help="Use this published model instead of training a benchmark model")
+    parser.add_argument("--skip-cold-start", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    # Point the app at throwaway state before anything imports config
+    tmp_dir = tempfile.mkdtemp(prefix="bench_api_")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+        MODEL_DIR=args.model_dir or os.path.join(tmp_dir, "models"),
+        DEFAULT_RESOURCE_ID="sim-00000",
+        TRAIN_ON_MISSING_MODEL="false",
+        COMPACTION_ENABLED="false",
+    )
+    results = run(args)
+    print_summary(results)
+    if args.json:
+        write_json(args.json, results)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark: Parquet archive export and memory-mapped reads vs the JSON history endpoint.
+
+Fills a temporary SQLite DB, exports it with services.archive, then compares reading
+the archive back into NumPy arrays with paging through GET /api/metrics/history.
+Needs pyarrow. Run from the backend directory:
+    python -m benchmarks.bench_archive [--rows 1000000] [--json out.json]
+"""
+import argparse
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_archive_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ["ARCHIVE_DIR"] = os.path.join(_tmp_dir, "archive")
+os.environ.setdefault("MODEL_WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("COMPACTION_ENABLED", "false")
+
+import numpy as np
+from fastapi.testclient import TestClient
+from benchmarks.common import write_json
+from database import init_db
+from services.archive import export_metrics, read_archive
+
+def fill_db(n_rows, n_resources=100, days=90):
+    """Insert synthetic rows straight through sqlite3 so setup time stays small"""
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2024-01-01T00:00:00", "us")
+    step = np.timedelta64(int(days * 86400e6 / n_rows), "us")
+    conn = sqlite3.connect(os.path.join(_tmp_dir, "bench.db"))
+    batch = 200000
+    for offset in range(0, n_rows, batch):
+        n = min(batch, n_rows - offset)
+        ids = np.arange(offset, offset + n)
+        timestamps = np.datetime_as_string(start + ids * step).astype(object)
+        conn.executemany(
+            "INSERT INTO metrics (resource_id, timestamp, cpu_utilization, memory_utilization, network_io, cost, instance_count)"
+            " VALUES (?, replace(?, 'T', ' '), ?, ?, 1.0, 0.1, 1)",
+            zip((f"vm-{i % n_resources}" for i in ids.tolist()), timestamps, rng.uniform(0, 100, n).tolist(), rng.uniform(0, 100, n).tolist())
+        )
+        conn.commit()
+    conn.close()
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    init_db()
+    fill_db(args.rows)
+    results = {}
+
+    start = time.perf_counter()
+    rss_before = rss_mb()
+    exported, paths = export_metrics()
+    elapsed = time.perf_counter() - start
+    results["export"] = {
+        "rows_per_sec": round(exported / elapsed, 1),
+        "seconds": round(elapsed, 3),
+        "files": len(paths),
+        "archive_mb": round(sum(os.path.getsize(p) for p in paths) / 1e6, 2),
+        "peak_rss_growth_mb": round(rss_mb() - rss_before, 1)
+    }
+
+    start = time.perf_counter()
+    arrays = read_archive()
+    elapsed = time.perf_counter() - start
+    results["read_archive"] = {"rows_per_sec": round(len(arrays["timestamp"]) / elapsed, 1), "seconds": round(elapsed, 3)}
+
+    # The JSON path a client had before: one resource's raw history, 10k rows per call
+    import main as app_module
+    with TestClient(app_module.app) as client:
+        start = time.perf_counter()
+        n_json = len(client.get("/api/metrics/history", params={
+            "resource_id": "vm-0", "start": "2024-01-01T00:00:00", "resolution": "raw", "limit": 10000
+        }).json())
+        elapsed = time.perf_counter() - start
+    results["json_history"] = {"rows_per_sec": round(n_json / elapsed, 1), "seconds": round(elapsed, 3)}
+
+    print(f"\nMetric archive, {args.rows} rows (DB: {os.environ['DATABASE_URL']})")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['rows_per_sec']:>14,.0f} rows/sec  {stats['seconds']:>8.2f}s")
+    print(f"archive: {results['export']['files']} files, {results['export']['archive_mb']} MB, "
+          f"export RSS growth {results['export']['peak_rss_growth_mb']} MB")
+    if args.json:
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Microbenchmark: per-call latency of the traced fast path vs Keras model.predict.
+
+The NumPy engine is included when exported weights exist.
+
+Run from the backend directory:
+    python -m benchmarks.bench_inference [--iterations 500] [--json out.json]
+"""
+import argparse
+import os
+import numpy as np
+import tensorflow as tf
+from benchmarks.common import percentiles, time_calls, print_table, write_json
+from model.registry import model_registry
+from model.numpy_engine import NumpyLSTMEngine, default_weights_path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    lstm_model = model_registry.get("lstm")
+    numpy_engine = NumpyLSTMEngine() if os.path.exists(default_weights_path()) else None
+    rng = np.random.default_rng(0)
+    results = {}
+
+    for batch in (1, 2, 16, 128):
+        X = rng.uniform(10, 95, (batch, lstm_model.sequence_length, 1)).astype(np.float32)
+        results[f"model.predict batch={batch}"] = percentiles(time_calls(
+            lambda: lstm_model.model.predict(X, verbose=0), args.iterations
+        ))
+        results[f"traced fn batch={batch}"] = percentiles(time_calls(
+            lambda: lstm_model._infer(tf.constant(X)).numpy(), args.iterations
+        ))
+        if numpy_engine is not None:
+            results[f"numpy engine batch={batch}"] = percentiles(time_calls(
+                lambda: numpy_engine._forward(X), args.iterations
+            ))
+
+    series = [list(rng.uniform(10, 95, lstm_model.sequence_length)) for _ in range(2)]
+    results["predict_batch cpu+memory"] = percentiles(time_calls(
+        lambda: lstm_model.predict_batch(series), args.iterations
+    ))
+
+    print_table("LSTM inference latency per call", results)
+    if args.json:
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
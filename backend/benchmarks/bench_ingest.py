@@ -0,0 +1,91 @@
+"""Benchmark: metric ingestion throughput (rows/sec) against a temporary SQLite DB.
+
+Compares one commit per row (the GET /api/metrics/current pattern) with bulk
+inserts, and measures the HTTP JSON-array and NDJSON ingestion endpoints.
+Run from the backend directory:
+    python -m benchmarks.bench_ingest [--rows 50000] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+# Point the app at a throwaway database before anything imports config
+_tmp_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.environ.setdefault("MODEL_WARMUP_ON_STARTUP", "false")
+
+from fastapi.testclient import TestClient
+from benchmarks.common import write_json
+from database import init_db, SessionLocal, MetricRecord, async_engine
+from schemas import MetricIngest
+from services.ingest import to_metric_rows, write_metrics_batch
+
+def make_items(n_rows, n_resources=100):
+    return [
+        {"resource_id": f"vm-{i % n_resources}", "cpu": 20 + i % 70, "memory": 30 + i % 60, "network": 10.0}
+        for i in range(n_rows)
+    ]
+
+def rows_per_sec(fn, n_rows):
+    start = time.perf_counter()
+    fn()
+    return n_rows / (time.perf_counter() - start)
+
+def per_row_commits(items):
+    db = SessionLocal()
+    try:
+        for item in items:
+            db.add(MetricRecord(
+                resource_id=item["resource_id"],
+                cpu_utilization=item["cpu"],
+                memory_utilization=item["memory"],
+                network_io=item["network"],
+                cost=0.1
+            ))
+            db.commit()
+    finally:
+        db.close()
+
+def bulk_batches(items, batch_size):
+    parsed = [MetricIngest(**item) for item in items]
+    
+    async def run():
+        for i in range(0, len(parsed), batch_size):
+            await write_metrics_batch(to_metric_rows(parsed[i:i + batch_size]))
+        await async_engine.dispose()
+    asyncio.run(run())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+    
+    init_db()
+    import main as app_module
+    
+    items = make_items(args.rows)
+    per_row_sample = items[:min(len(items), 2000)]
+    ndjson_body = "\n".join(json.dumps(item) for item in items).encode()
+    
+    results = {
+        "per_row_commit": rows_per_sec(lambda: per_row_commits(per_row_sample), len(per_row_sample)),
+        "bulk_batch_1000": rows_per_sec(lambda: bulk_batches(items, 1000), len(items)),
+        "bulk_batch_10000": rows_per_sec(lambda: bulk_batches(items, 10000), len(items)),
+    }
+    with TestClient(app_module.app) as client:
+        results["http_json_array"] = rows_per_sec(lambda: client.post("/api/metrics/ingest", json=items), len(items))
+        results["http_ndjson"] = rows_per_sec(lambda: client.post("/api/metrics/ingest/ndjson", content=ndjson_body), len(items))
+        results["http_json_buffered"] = rows_per_sec(lambda: client.post("/api/metrics/ingest?buffered=true", json=items), len(items))
+    
+    print(f"\nMetric ingestion, {args.rows} rows (DB: {os.environ['DATABASE_URL']})")
+    for name, rate in results.items():
+        print(f"{name:<22}{rate:>14,.0f} rows/sec")
+    if args.json:
+        write_json(args.json, {name: {"rows_per_sec": round(rate, 1)} for name, rate in results.items()})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark: many concurrent /ws clients against one uvicorn worker.
+
+Starts the API in a subprocess on a temporary SQLite DB, opens --clients WebSocket
+connections in waves and listens for --ticks broadcast ticks. It reports connect
+time, server RSS per connection, the share of clients that got every tick and the
+delivery delay from frame timestamp to receipt. Client and server share the
+machine, so on small hosts the client side dominates the delay.
+Needs uvicorn and websockets (both in requirements.txt), and `ulimit -n` above the
+client count. Run from the backend directory:
+    python -m benchmarks.bench_websocket [--clients 10000] [--ticks 5] [--ws wsproto] [--deflate] [--json out.json]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import websockets
+from benchmarks.common import percentiles, write_json
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def start_server(port, interval, ws_impl, deflate):
+    tmp_dir = tempfile.mkdtemp(prefix="bench_ws_")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+        MODEL_WARMUP_ON_STARTUP="false",
+        TRAIN_ON_MISSING_MODEL="false",
+        FORECAST_SCHEDULER_ENABLED="false",
+        COMPACTION_ENABLED="false",
+        WS_INTERVAL=str(interval),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--backlog", "4096", "--ws", ws_impl, "--ws-per-message-deflate", str(deflate).lower()],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("API server did not start")
+
+async def client(url, received, delays, stop):
+    async with websockets.connect(url, max_queue=None, ping_interval=None) as ws:
+        received.append(0)
+        index = len(received) - 1
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            received[index] += 1
+            # "...Z" frame timestamps are UTC
+            sent = datetime.fromisoformat(message.split('"timestamp":"', 1)[1][:26])
+            delays.append((datetime.utcnow() - sent).total_seconds() * 1000)
+
+async def run(args):
+    port = free_port()
+    server = start_server(port, args.interval, args.ws, args.deflate)
+    url = f"ws://127.0.0.1:{port}/ws"
+    try:
+        rss_before = rss_mb(server.pid)
+        received, delays, stop = [], [], asyncio.Event()
+        tasks = []
+        started = time.perf_counter()
+        for wave in range(0, args.clients, args.wave):
+            tasks += [asyncio.create_task(client(url, received, delays, stop))
+                      for _ in range(min(args.wave, args.clients - wave))]
+            while len(received) < len(tasks) and not any(task.done() for task in tasks):
+                await asyncio.sleep(0.05)
+        connect_seconds = time.perf_counter() - started
+        failed = sum(task.done() for task in tasks)
+        rss_connected = rss_mb(server.pid)
+
+        # Only count ticks after everyone is connected
+        received[:] = [0] * len(received)
+        delays.clear()
+        await asyncio.sleep(args.ticks * args.interval + args.interval / 2)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    counts = np.array(received)
+    return {
+        "ws": args.ws,
+        "deflate": args.deflate,
+        "clients": args.clients,
+        "connected": len(received),
+        "failed": failed,
+        "connect_seconds": round(connect_seconds, 2),
+        "server_rss_mb": round(rss_connected, 1),
+        "server_kb_per_connection": round((rss_connected - rss_before) * 1024 / max(len(received), 1), 2),
+        "ticks": args.ticks,
+        "clients_with_every_tick": round(float(np.mean(counts >= args.ticks)), 4) if counts.size else 0.0,
+        "messages_per_client": round(float(counts.mean()), 2) if counts.size else 0.0,
+        "delivery_delay": percentiles(delays),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=2.0, help="Server broadcast interval (seconds)")
+    parser.add_argument("--wave", type=int, default=500, help="Connections opened at a time")
+    parser.add_argument("--ws", default="auto", help="uvicorn WebSocket implementation (auto, websockets, wsproto)")
+    parser.add_argument("--deflate", action="store_true",
+                        help="Keep permessage-deflate on (uvicorn's default; costs a zlib context per connection)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    delay = results["delivery_delay"]
+    print(f"\n/ws broadcast ({args.ws}, deflate {'on' if args.deflate else 'off'}), {results['connected']}/{results['clients']} clients connected "
+          f"in {results['connect_seconds']}s ({results['failed']} failed)")
+    print(f"server RSS {results['server_rss_mb']} MB ({results['server_kb_per_connection']} KB/connection)")
+    print(f"clients with every tick: {results['clients_with_every_tick']:.1%}, "
+          f"{results['messages_per_client']} messages/client over {results['ticks']} ticks")
+    if delay["count"]:
+        print(f"delivery delay p50 {delay['p50_ms']:.1f} ms, p99 {delay['p99_ms']:.1f} ms, max {delay['max_ms']:.1f} ms")
+    if args.json:
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark: /ws stream encodings, bytes and producer CPU per 1k subscribers.
+
+Runs the broadcast hub in-process with --subscribers clients over --resources resources,
+each of which gets a new sample every tick. For each format it reports the producer's
+CPU per tick (collect + encode + queue to every client) and the bytes and messages
+that clients receive. Wire bytes include the WebSocket frame header of each message.
+Clients follow every resource (--subscription all), or --per-client random resources
+each. Random subsets defeat frame sharing between clients, the worst case for batching.
+The compact streams are decoded and checked against the hub's latest values. msgpack
+is skipped when it isn't installed. Run from the backend directory:
+    python -m benchmarks.bench_ws_encoding [--resources 1000] [--subscribers 1000] [--subscription random] [--json out.json]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from benchmarks.common import percentiles, print_table, write_json
+from services.broadcast import BroadcastHub
+from services.recent import recent_metrics
+from services.stream_encoding import StreamDecoder, SCALES
+
+MODES = {
+    "json": {"encoding": "json"},
+    "json batch": {"encoding": "json", "batch": True},
+    "binary full": {"encoding": "binary", "delta": False},
+    "binary delta": {"encoding": "binary"},
+    "msgpack delta": {"encoding": "msgpack"},
+}
+
+def ws_header_bytes(size):
+    """Server-to-client (unmasked) WebSocket frame header for a payload of size bytes"""
+    return 2 if size < 126 else 4 if size < 65536 else 10
+
+def feed(resource_ids, rng, start, tick):
+    """One new sample per resource: a bounded random walk around a per-resource level"""
+    timestamp = start + timedelta(seconds=tick)
+    cpu = np.clip(50 + 30 * np.sin(np.arange(len(resource_ids)) + tick / 10) + rng.normal(0, 3, len(resource_ids)), 0, 100)
+    memory = np.clip(cpu * 0.8 + rng.normal(0, 2, len(resource_ids)), 0, 100)
+    network = rng.gamma(2.0, 20.0, len(resource_ids))
+    recent_metrics.extend([
+        {"resource_id": resource_id, "timestamp": timestamp, "cpu_utilization": c, "memory_utilization": m,
+         "network_io": n, "instance_count": 2}
+        for resource_id, c, m, n in zip(resource_ids, cpu.tolist(), memory.tolist(), network.tolist())
+    ])
+
+def run_mode(options, args, resource_ids, subscriptions, start):
+    hub = BroadcastHub(interval=args.interval, queue_size=args.resources + 64, keyframe_interval=args.keyframe_interval)
+    subscribers = [hub.subscribe(resources, **options) for resources in subscriptions]
+    decoder = StreamDecoder(options["encoding"]) if subscribers[0].encoding.binary else None
+    rng = np.random.default_rng(args.seed)
+    tick_ms, payload, wire, messages = [], 0, 0, 0
+    for tick in range(args.ticks + 1):
+        feed(resource_ids, rng, start, tick)
+        began = time.process_time()
+        hub.publish(hub.collect(), keyframe=tick > 0 and tick % args.keyframe_interval == 0)
+        elapsed = (time.process_time() - began) * 1000
+        for i, subscriber in enumerate(subscribers):
+            queue = subscriber.queue
+            while queue:
+                message = queue.popleft()
+                if tick == 0:
+                    if decoder is not None and i == 0:
+                        decoder.apply(message)
+                    continue  # Connect-time replay, not steady state
+                size = len(message)
+                payload += size
+                wire += size + ws_header_bytes(size)
+                messages += 1
+                if decoder is not None and i == 0:
+                    decoder.apply(message)
+        if tick:
+            tick_ms.append(elapsed)
+
+    verified = None
+    if decoder is not None:
+        expected = {r: [s[0] // 1000, *s[1:]] for r, s in hub._latest.items()
+                    if subscriptions[0] is None or r in subscriptions[0]}
+        verified = decoder.state == expected
+    per_1k = 1000 / len(subscribers) / args.interval / args.ticks
+    return {
+        "tick_cpu": percentiles(tick_ms),
+        "payload_bytes_per_sec_per_1k": round(payload * per_1k),
+        "wire_bytes_per_sec_per_1k": round(wire * per_1k),
+        "messages_per_sec_per_1k": round(messages * per_1k, 1),
+        "bytes_per_message": round(payload / messages, 1) if messages else 0.0,
+        "decoded_ok": verified,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resources", type=int, default=1000)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=2.0, help="Broadcast interval (seconds), for the per-second rates")
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    parser.add_argument("--subscription", choices=["all", "random"], default="all")
+    parser.add_argument("--per-client", type=int, default=20, help="Resources per client with --subscription random")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    resource_ids = [f"bench-ws-{i:05d}" for i in range(args.resources)]
+    picker = random.Random(args.seed)
+    subscriptions = [
+        None if args.subscription == "all" else set(picker.sample(resource_ids, min(args.per_client, args.resources)))
+        for _ in range(args.subscribers)
+    ]
+    start = datetime.utcnow()
+    results = {}
+    for name, options in MODES.items():
+        try:
+            results[name] = run_mode(options, args, resource_ids, subscriptions, start)
+        except RuntimeError as e:
+            print(f"Skipping {name}: {e}")
+        start += timedelta(seconds=args.ticks + 1)
+
+    print_table(f"Producer CPU per tick, {args.subscribers} clients x {args.resources} resources "
+                f"({args.subscription}), ms", {name: r["tick_cpu"] for name, r in results.items()})
+    baseline = results["json"]["wire_bytes_per_sec_per_1k"]
+    print(f"\n{'case':<32}{'wire KB/s/1k':>14}{'vs json':>10}{'msg/s/1k':>12}{'B/msg':>10}{'decoded':>9}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['wire_bytes_per_sec_per_1k'] / 1024:>14.1f}{r['wire_bytes_per_sec_per_1k'] / baseline:>10.3f}"
+              f"{r['messages_per_sec_per_1k']:>12.1f}{r['bytes_per_message']:>10.1f}{str(r['decoded_ok']):>9}")
+    if args.json:
+        write_json(args.json, {"args": vars(args), "scales": SCALES, "results": results})
+
+if __name__ == "__main__":
+    main()
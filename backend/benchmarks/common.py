@@ -0,0 +1,42 @@
+import json
+import time
+import numpy as np
+
+def percentiles(samples_ms):
+    """Summarize latency samples (milliseconds) as p50/p90/p99/mean"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p90_ms": round(float(np.percentile(samples, 90)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+        "max_ms": round(float(samples.max()), 4)
+    }
+
+def time_calls(fn, iterations=200, warmup=10):
+    """Call fn repeatedly and return per-call latencies in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def print_table(title, rows):
+    """Print {name: stats} rows as an aligned text table"""
+    print(f"\n{title}")
+    keys = ["p50_ms", "p99_ms", "mean_ms"]
+    print(f"{'case':<32}" + "".join(f"{k:>12}" for k in keys))
+    for name, stats in rows.items():
+        print(f"{name:<32}" + "".join(f"{stats.get(k, float('nan')):>12.3f}" for k in keys))
+
+def write_json(path, results):
+    """Write results as machine-readable JSON"""
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {path}")
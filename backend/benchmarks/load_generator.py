@@ -0,0 +1,159 @@
+"""Load generator: replay a simulated fleet into a running API's ingestion endpoints.
+
+Generates --resources resources with utils.simulate_data.FleetSimulator, one sample
+per resource every --step-seconds of simulated time. The samples are replayed through
+POST /api/metrics/ingest (or /ingest/ndjson) in --batch row requests, paced to --rate
+rows/sec over --concurrency keep-alive connections. Simulated timestamps end at the
+current time, so the run also backfills realistic history. It reports the achieved
+rate, request latency percentiles and how far sending fell behind schedule. The same
+--seed replays the same data. Run from the backend directory against a started server:
+    python -m benchmarks.load_generator --url http://127.0.0.1:8000 [--resources 1000] [--rate 10000] [--duration 30]
+"""
+import argparse
+import http.client
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from benchmarks.common import percentiles, write_json
+from utils.simulate_data import FleetSimulator
+
+_EPOCH = datetime(1970, 1, 1)
+
+def iter_batches(simulator, total_rows, batch_size, step_seconds, end_time=None):
+    """Time-ordered row-dict batches: every resource's sample for a step, then the next step"""
+    steps = math.ceil(total_rows / len(simulator))
+    end_time = end_time or datetime.utcnow()
+    first = int((end_time - _EPOCH).total_seconds() // step_seconds) - steps + 1
+    chunk_steps = max(1, math.ceil(4 * batch_size / len(simulator)))
+    pending, produced = [], 0
+    for start in range(first, first + steps, chunk_steps):
+        n = min(chunk_steps, first + steps - start)
+        values = simulator.generate(start, n)
+        cpu, memory, network = (values[metric].round(2).T.tolist() for metric in ("cpu", "memory", "network"))
+        instance_counts = simulator.instance_counts.tolist()
+        for step in range(n):
+            timestamp = (_EPOCH + timedelta(seconds=(start + step) * step_seconds)).isoformat()
+            for resource_id, c, m, net, instances in zip(simulator.resource_ids, cpu[step], memory[step], network[step], instance_counts):
+                pending.append({"resource_id": resource_id, "timestamp": timestamp, "cpu": c, "memory": m,
+                                "network": net, "instance_count": instances})
+            while len(pending) >= batch_size or (pending and produced + len(pending) >= total_rows):
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                batch = batch[:total_rows - produced]
+                produced += len(batch)
+                yield batch
+                if produced >= total_rows:
+                    return
+
+def encode(batch, ndjson):
+    if ndjson:
+        return "\n".join(json.dumps(row, separators=(",", ":")) for row in batch).encode()
+    return json.dumps(batch, separators=(",", ":")).encode()
+
+class Sender:
+    """POSTs request bodies over one keep-alive HTTP connection per worker thread"""
+    def __init__(self, url, ndjson=False, buffered=False):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        path = parts.path.rstrip("/") + ("/api/metrics/ingest/ndjson" if ndjson else "/api/metrics/ingest")
+        self.path = path + ("?buffered=true" if buffered else "")
+        self.content_type = "application/x-ndjson" if ndjson else "application/json"
+        self._local = threading.local()
+
+    def post(self, body):
+        """Send one batch; returns (latency ms, accepted rows or None on failure)"""
+        started = time.perf_counter()
+        for _ in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                connection.request("POST", self.path, body, {"Content-Type": self.content_type})
+                response = connection.getresponse()
+                payload = response.read()
+                accepted = json.loads(payload)["accepted"] if response.status == 200 else None
+                return (time.perf_counter() - started) * 1000, accepted
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self._local.connection = None  # Server closed the keep-alive connection: reconnect once
+        return (time.perf_counter() - started) * 1000, None
+
+def run(args):
+    simulator = FleetSimulator(args.resources, seed=args.seed)
+    total_rows = int(args.rate * args.duration)
+    sender = Sender(args.url, args.format == "ndjson", args.buffered)
+    latencies, lags, lock = [], [], threading.Lock()
+    totals = {"requests": 0, "accepted": 0, "failed": 0}
+    slots = threading.Semaphore(args.concurrency * 2)  # Don't run further ahead than the server can absorb
+
+    def send(body):
+        try:
+            latency, accepted = sender.post(body)
+            with lock:
+                totals["requests"] += 1
+                latencies.append(latency)
+                if accepted is None:
+                    totals["failed"] += 1
+                else:
+                    totals["accepted"] += accepted
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    sent = 0
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for batch in iter_batches(simulator, total_rows, args.batch, args.step_seconds):
+            body = encode(batch, args.format == "ndjson")
+            due = started + sent / args.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            lags.append(max(time.perf_counter() - due, 0.0) * 1000)
+            pool.submit(send, body)
+            sent += len(batch)
+    elapsed = time.perf_counter() - started
+    return {
+        "resources": args.resources,
+        "target_rows_per_sec": args.rate,
+        "rows_sent": sent,
+        "rows_accepted": totals["accepted"],
+        "achieved_rows_per_sec": round(totals["accepted"] / elapsed, 1),
+        "seconds": round(elapsed, 3),
+        "requests": totals["requests"],
+        "failed_requests": totals["failed"],
+        "request_latency": percentiles(latencies),
+        "schedule_lag": percentiles(lags),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--resources", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=10000, help="Target rows/sec")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load at the target rate")
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json")
+    parser.add_argument("--buffered", action="store_true", help="Use the write-behind buffer (?buffered=true)")
+    parser.add_argument("--step-seconds", type=float, default=1.0, help="Simulated time between a resource's samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args)
+    latency, lag = results["request_latency"], results["schedule_lag"]
+    print(f"\n{results['rows_accepted']}/{results['rows_sent']} rows accepted in {results['seconds']}s: "
+          f"{results['achieved_rows_per_sec']:.0f} rows/s (target {args.rate:.0f}), "
+          f"{results['failed_requests']}/{results['requests']} requests failed")
+    if latency["count"]:
+        print(f"request latency p50 {latency['p50_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms; "
+              f"schedule lag p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms")
+    if args.json:
+        write_json(args.json, results)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,11 +13,75 @@ class Settings(BaseSettings):
     
     # Database Settings
     database_url: str = "sqlite:///./cloud_optimizer.db"
+    async_database_url: Optional[str] = None  # Derived from database_url when unset (aiosqlite / asyncpg)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 65536
+    
+    # Ingestion Settings
+    ingest_batch_size: int = 5000  # Rows per transaction when streaming NDJSON
+    ingest_max_line_bytes: int = 65536  # Longest NDJSON line accepted; longer ones get a 413
+    ingest_buffer_max_rows: int = 20000  # Write-behind buffer flushes at this many rows...
+    ingest_flush_interval: float = 1.0  # ...or when its oldest row is this many seconds old
+    ingest_flush_max_attempts: int = 5  # Writes of a buffered batch before it is dropped (retries back off)
+    
+    # History Settings
+    history_target_points: int = 1000  # Auto resolution picks the finest level with at most this many points
+    history_max_points: int = 10000  # Hard cap on rows returned by /api/metrics/history
+    
+    # Retention Settings (days; 0 keeps rows forever)
+    # Raw samples. Opt-in: rows older than their resource's oldest rollup are never pruned, so run
+    # `python -m services.rollups` first to backfill history recorded before rollups existed
+    metrics_retention_days: float = 0.0
+    rollup_1m_retention_days: float = 90.0
+    predictions_retention_days: float = 30.0
+    action_history_retention_days: float = 365.0
+    compaction_enabled: bool = True
+    compaction_interval: float = 3600.0  # Seconds between compaction cycles
+    compaction_batch_size: int = 5000  # Rows deleted per transaction, so write locks stay short
+    compaction_vacuum_pages: int = 2000  # Pages released per incremental vacuum step (SQLite)
+    compaction_archive: bool = False  # Write expired raw metrics to the Parquet archive before deleting them
+    archive_dir: str = "./archive"
+    
+    # WebSocket Settings
+    ws_interval: float = 2.0  # Seconds between broadcast ticks
+    ws_queue_size: int = 64  # Frames queued per client before the oldest are dropped
+    ws_keyframe_interval: int = 30  # Ticks between full-value keyframes on delta streams
+    
+    # Observability Settings
+    metrics_enabled: bool = False  # Time hot-path stages and serve Prometheus metrics on GET /metrics
+    profiler_enabled: bool = False  # Install the request profiling middleware (services.profiler)
+    profiler_sample_rate: float = 0.01  # Fraction of requests profiled at random
+    profiler_header: str = "X-Profile"  # Requests with this header (any value but 0/false) are always profiled
+    profiler_interval: float = 0.005  # Seconds between stack samples
+    profiler_max_profiles: int = 20  # Slowest profiles kept in memory
+    
+    # Resource Settings
+    default_resource_id: str = "default"  # Used for metrics sent without a resource ID
     
     # Model Settings
     model_dir: str = "./models"
     sequence_length: int = 10
     prediction_horizon: int = 5  # Predict next 5 time steps
+    model_warmup_on_startup: bool = True  # Load models in the background at startup
+    inference_backend: str = "keras"  # "keras" or "numpy" (no TensorFlow import when weights are exported)
+    inference_chunk_size: int = 4096  # Max rows per call of the traced forward pass
+    train_on_missing_model: bool = True  # Spawn `python -m model.train` when no artifact exists
+    model_reload_interval: float = 10.0  # Seconds between checks for newly published models
+    training_lock_timeout: float = 3600.0  # Seconds before a training lock left by a dead worker is taken over
+    forecast_scheduler_enabled: bool = True  # Precompute every resource's forecast in the background
+    forecast_interval: float = 10.0  # Seconds between scheduler cycles
+    forecast_persist: bool = True  # Store PredictionRecords for resources whose window changed (one batch insert per cycle)
+    prediction_cache_size: int = 10000  # Cached forecasts (LRU); 0 disables the cache
+    prediction_cache_ttl: float = 60.0  # Seconds a cached forecast may be served
+    fallback_ewma_alpha: float = 0.5  # Smoothing of the predictor served until a model is trained
+    history_chunk_size: int = 50000  # Rows per chunk when streaming training data from the DB
+    finetune_learning_rate: float = 1e-4
+    finetune_epochs: int = 1
     
     # Cost Settings (per hour in USD)
     instance_cost_per_hour: float = 0.10
@@ -29,6 +94,8 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
         case_sensitive = False
+        # Allow the model_* settings without pydantic's protected-namespace warning
+        protected_namespaces = ("settings_",)
 
 settings = Settings()
 
@@ -1,27 +1,61 @@
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, Float, DateTime, String, Index, LargeBinary
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from datetime import datetime
 from config import settings
+from services import telemetry
 
 Base = declarative_base()
 
 class MetricRecord(Base):
     __tablename__ = "metrics"
+    __table_args__ = (Index("ix_metrics_resource_timestamp", "resource_id", "timestamp"),)
     
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    resource_id = Column(String, default=settings.default_resource_id, index=True)
     cpu_utilization = Column(Float)
     memory_utilization = Column(Float)
     network_io = Column(Float)
     cost = Column(Float)
     instance_count = Column(Integer, default=1)
     
+class MetricRollup(Base):
+    """Per-resource aggregates of the metrics table over 1m, 1h and 1d buckets"""
+    __tablename__ = "metric_rollups"
+    __table_args__ = (Index("ix_rollups_bucket", "resolution", "resource_id", "bucket_start", unique=True),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(String)
+    resource_id = Column(String)
+    bucket_start = Column(DateTime)
+    samples = Column(Integer)
+    cpu_min = Column(Float)
+    cpu_max = Column(Float)
+    cpu_avg = Column(Float)
+    cpu_p95 = Column(Float)
+    memory_min = Column(Float)
+    memory_max = Column(Float)
+    memory_avg = Column(Float)
+    memory_p95 = Column(Float)
+    network_min = Column(Float)
+    network_max = Column(Float)
+    network_avg = Column(Float)
+    network_p95 = Column(Float)
+    cost_avg = Column(Float)
+    # Mergeable quantile sketches (services.rollups), so merged buckets get their p95 from the combined data
+    cpu_sketch = Column(LargeBinary)
+    memory_sketch = Column(LargeBinary)
+    network_sketch = Column(LargeBinary)
+    
 class PredictionRecord(Base):
     __tablename__ = "predictions"
     
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    resource_id = Column(String, default=settings.default_resource_id, index=True)
     predicted_cpu = Column(Float)
     predicted_memory = Column(Float)
     recommended_action = Column(String)
@@ -33,16 +67,92 @@ class ActionHistory(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    resource_id = Column(String, default=settings.default_resource_id, index=True)
     action = Column(String)
     previous_instance_count = Column(Integer)
     new_instance_count = Column(Integer)
     reason = Column(String)
     cost_impact = Column(Float)
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+def _async_database_url(url):
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)"""
+    if settings.async_database_url:
+        return settings.async_database_url
+    for prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+def _engine_options(url, is_async=False):
+    if url.startswith("sqlite") and ":memory:" in url:
+        # In-memory SQLite lives in a single connection; pooling options don't apply
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        # aiosqlite defaults to NullPool (a new connection, and pragma round, per session)
+        "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": not url.startswith("sqlite"),
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers proceed during writes; NORMAL sync is durable in WAL mode and much cheaper than FULL"""
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new database file (or after VACUUM); lets compaction shrink the file
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Sync engine: schema setup, CLIs and worker threads
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: request handlers
+async_database_url = _async_database_url(settings.database_url)
+async_engine = create_async_engine(async_database_url, **_engine_options(async_database_url, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if settings.database_url.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+if telemetry.enabled:
+    telemetry.instrument_engine(engine, "sync")
+    telemetry.instrument_engine(async_engine.sync_engine, "async")
+
+def _add_missing_columns():
+    """create_all never alters existing tables, so add columns introduced since the DB was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing]
+            for column in missing:
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.default is not None and isinstance(column.default.arg, str):
+                    ddl += f" DEFAULT '{column.default.arg}'"
+                conn.execute(text(ddl))
+            if missing:
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+
 def init_db():
+    _add_missing_columns()
     Base.metadata.create_all(bind=engine)
 
 def get_db():
@@ -52,4 +162,8 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
@@ -1,16 +1,26 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.websockets import WebSocket
 from contextlib import asynccontextmanager
+from typing import Optional
 import asyncio
-import json
 from datetime import datetime
 
 from config import settings
-from database import init_db
-from routers import metrics, predictions, dashboard
-from utils.simulate_data import simulator
-from services.cost_calculator import CostCalculator
+from database import init_db, async_engine, SessionLocal
+from routers import metrics, predictions, dashboard, admin
+from model.registry import model_registry, watch_for_updates
+from services.ingest import ingest_buffer
+from services.compaction import compactor
+from services.recent import recent_metrics
+from services.scheduler import forecast_scheduler
+from services.broadcast import broadcast_hub
+from services import telemetry
+from services.profiler import ProfilerMiddleware
+
+def _log_warmup_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Model warm-up failed: {task.exception()}")
 
 # Initialize database on startup
 @asynccontextmanager
@@ -18,8 +28,34 @@ async def lifespan(app: FastAPI):
     # Startup
     init_db()
     print("Database initialized")
+    # Predictions read their lookback windows from memory; reload them before serving
+    with SessionLocal() as db:
+        resources = await asyncio.to_thread(recent_metrics.rehydrate, db)
+    print(f"Loaded recent metric windows for {resources} resources")
+    # Pick up models published by the training worker without a restart
+    reload_task = asyncio.create_task(watch_for_updates())
+    flush_task = asyncio.create_task(ingest_buffer.run())
+    # One producer serializes each tick's frames once for every /ws client
+    broadcast_task = asyncio.create_task(broadcast_hub.run())
+    background_tasks = [reload_task, flush_task, broadcast_task]
+    if settings.model_warmup_on_startup:
+        # Load the model off the event loop so the API starts serving immediately
+        warmup_task = asyncio.create_task(asyncio.to_thread(model_registry.warm_up))
+        warmup_task.add_done_callback(_log_warmup_failure)
+        background_tasks.append(warmup_task)
+    if settings.compaction_enabled:
+        # Prune rows past their retention in short batches and reclaim the space
+        background_tasks.append(asyncio.create_task(compactor.run()))
+    if settings.forecast_scheduler_enabled:
+        # Forecast every resource on a fixed cadence; read endpoints serve the published results
+        background_tasks.append(asyncio.create_task(forecast_scheduler.run()))
     yield
     # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    # Don't lose rows still waiting in the write-behind buffer, including batches awaiting a retry
+    await ingest_buffer.flush(retry_all=True)
+    await async_engine.dispose()
     print("Shutting down...")
 
 app = FastAPI(
@@ -38,10 +74,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.profiler_enabled:
+    # Profiles sampled requests (and any sent with the X-Profile header); see /api/admin/profiles
+    app.add_middleware(ProfilerMiddleware)
+
+if telemetry.enabled:
+    # Outermost, so request timings include every other middleware
+    app.add_middleware(telemetry.MetricsMiddleware)
+
 # Include routers
 app.include_router(metrics.router)
 app.include_router(predictions.router)
 app.include_router(dashboard.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def root():
@@ -52,43 +97,34 @@ def root():
         "endpoints": {
             "metrics": "/api/metrics",
             "predictions": "/api/predict",
-            "dashboard": "/api/dashboard"
+            "dashboard": "/api/dashboard",
+            "admin": "/api/admin"
         }
     }
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "model_ready": model_registry.is_loaded("lstm"),
+        "models": model_registry.status()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format); 404 unless METRICS_ENABLED"""
+    if not telemetry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set METRICS_ENABLED=true")
+    return Response(telemetry.registry.render(), media_type=telemetry.CONTENT_TYPE)
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    cost_calculator = CostCalculator()
-    
-    try:
-        while True:
-            # Get current metrics
-            metrics = simulator.get_current_metrics()
-            
-            # Calculate cost
-            current_cost = cost_calculator.calculate_current_cost(
-                metrics["cpu"], metrics["memory"], 1
-            )
-            
-            # Send data
-            data = {
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "cpu": round(metrics["cpu"], 2),
-                "memory": round(metrics["memory"], 2),
-                "network": round(metrics["network"], 2),
-                "cost": round(current_cost, 4)
-            }
-            
-            await websocket.send_json(data)
-            await asyncio.sleep(2)  # Update every 2 seconds
-            
-    except Exception as e:
-        print(f"WebSocket error: {e}")
-    finally:
-        await websocket.close()
\ No newline at end of file
+async def websocket_endpoint(websocket: WebSocket, resources: Optional[str] = None, encoding: str = "json",
+                             batch: bool = False, delta: bool = True):
+    """Stream metric frames: ?resources=a,b follows those resources (* for all), default the default resource
+
+    ?encoding=binary|msgpack switches to compact batched frames, delta-encoded unless delta=0;
+    ?batch=1 batches json frames too (see services.stream_encoding).
+    """
+    await broadcast_hub.serve(websocket, resources, encoding, batch, delta)
@@ -0,0 +1,83 @@
+import numpy as np
+from config import settings
+from services import telemetry
+
+class BasePredictor:
+    """Shared prediction API; subclasses only implement the raw forward pass"""
+    def __init__(self):
+        self.sequence_length = settings.sequence_length
+        self.horizon = 1
+    
+    def _forward(self, X):
+        """Run the model on a (N, sequence_length, 1) float32 batch and return (N, outputs)"""
+        raise NotImplementedError
+    
+    def _prepare_batch(self, series_list):
+        """Stack N series into a (N, sequence_length, 1) model input"""
+        if len(series_list) == 0:
+            return np.empty((0, self.sequence_length, 1), dtype=np.float32)
+        if isinstance(series_list, np.ndarray) and series_list.ndim >= 2:
+            # Already a dense batch; just keep the most recent window
+            X = series_list.reshape((len(series_list), -1))[:, -self.sequence_length:]
+            if X.shape[1] == self.sequence_length:
+                return X.astype(np.float32, copy=False).reshape((len(X), self.sequence_length, 1))
+            series_list = list(X)
+        
+        X = np.empty((len(series_list), self.sequence_length), dtype=np.float32)
+        for i, data in enumerate(series_list):
+            data = list(data)
+            if len(data) < self.sequence_length:
+                # Pad with average if not enough data
+                avg = np.mean(data)
+                data = [avg] * (self.sequence_length - len(data)) + data
+            X[i] = data[-self.sequence_length:]
+        return X.reshape((len(X), self.sequence_length, 1))
+    
+    def predict_batch(self, series_list):
+        """Predict the next value for N series (any mix of metrics/hosts) in one forward pass"""
+        X = self._prepare_batch(series_list)
+        if len(X) == 0:
+            return np.empty(0)
+        with telemetry.inference(self, len(X)):
+            predictions = self._forward(X)[:, 0]
+        return np.clip(predictions, 10, 95).astype(np.float64)
+    
+    def predict_horizon_batch(self, series_list):
+        """Forecast every step of the horizon for N series; returns an (N, horizon) array"""
+        X = self._prepare_batch(series_list)
+        if len(X) == 0:
+            return np.empty((0, self.horizon))
+        with telemetry.inference(self, len(X)):
+            forecast = self._forward(X)
+        return np.clip(forecast, 10, 95).astype(np.float64)
+    
+    def predict(self, cpu_data):
+        """Predict future CPU utilization"""
+        return float(self.predict_batch([cpu_data])[0])
+    
+    def predict_multiple(self, cpu_data, n_steps=5):
+        """Predict multiple future steps"""
+        predictions = []
+        current_seq = list(cpu_data[-self.sequence_length:])
+        
+        for _ in range(n_steps):
+            pred = self.predict(current_seq)
+            predictions.append(pred)
+            current_seq = current_seq[1:] + [pred]
+        
+        return predictions
+    
+    def get_prediction_confidence(self, cpu_data):
+        """Estimate prediction confidence based on data variance"""
+        if len(cpu_data) < 2:
+            return 0.5
+        
+        variance = np.var(cpu_data)
+        # Lower variance = higher confidence
+        confidence = max(0.3, min(0.95, 1.0 - (variance / 1000)))
+        return confidence
+    
+    def get_prediction_confidence_batch(self, windows):
+        """Vectorized get_prediction_confidence over an (N, window) array"""
+        variance = np.var(np.asarray(windows, dtype=np.float64), axis=1)
+        return np.clip(1.0 - variance / 1000, 0.3, 0.95)
@@ -0,0 +1,20 @@
+import numpy as np
+from config import settings
+from model.base import BasePredictor
+
+class EWMAPredictor(BasePredictor):
+    """Cheap stand-in served while no trained LSTM artifact is available"""
+    def __init__(self, horizon=1, alpha=None):
+        super().__init__()
+        self.horizon = horizon
+        # alpha=1.0 degenerates to "last value"
+        self.alpha = settings.fallback_ewma_alpha if alpha is None else alpha
+        self.model_path = None
+    
+    def _forward(self, X):
+        series = X[:, :, 0]
+        weights = self.alpha * (1 - self.alpha) ** np.arange(series.shape[1] - 1, -1, -1)
+        # The oldest sample carries the remaining weight so the weights sum to 1
+        weights[0] = (1 - self.alpha) ** (series.shape[1] - 1)
+        level = series @ weights
+        return np.repeat(level[:, None], self.horizon, axis=1)
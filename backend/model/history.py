@@ -0,0 +1,80 @@
+"""Stream training windows out of the metrics table with bounded memory.
+
+Rows are read resource by resource in keyset-paginated chunks (id > last_id ... LIMIT n),
+so the whole table is never loaded, and each chunk is turned into (X, y) windows with
+sliding_window_view, which yields views into the chunk instead of per-window copies.
+A window only ever holds consecutive samples of one resource.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select, func
+from config import settings
+from database import MetricRecord
+
+def latest_metric_id(session):
+    return session.execute(select(func.max(MetricRecord.id))).scalar() or 0
+
+def iter_metric_chunks(session, column="cpu_utilization", start_id=0, end_id=None, chunk_size=None):
+    """Yield (resource_id, float32 array) chunks of one metric column, resource by resource
+
+    Each resource's rows come in id order (keyset-paginated through the resource_id
+    index), so every chunk continues a single resource's series.
+    """
+    chunk_size = chunk_size or settings.history_chunk_size
+    values_column = getattr(MetricRecord, column)
+    query = select(MetricRecord.resource_id).where(MetricRecord.id > start_id)
+    if end_id is not None:
+        query = query.where(MetricRecord.id <= end_id)
+    resource_ids = session.execute(query.distinct().order_by(MetricRecord.resource_id)).scalars().all()
+    
+    for resource_id in resource_ids:
+        last_id = start_id
+        while True:
+            query = select(MetricRecord.id, values_column).where(
+                MetricRecord.resource_id == resource_id, MetricRecord.id > last_id
+            )
+            if end_id is not None:
+                query = query.where(MetricRecord.id <= end_id)
+            rows = session.execute(query.order_by(MetricRecord.id).limit(chunk_size)).all()
+            if not rows:
+                break
+            
+            ids, values = zip(*rows)
+            last_id = ids[-1]
+            yield resource_id, np.array(values, dtype=np.float32)
+
+def iter_training_windows(chunks, sequence_length=None, horizon=1):
+    """Turn a stream of (series key, value chunk) pairs into (X, y) training windows
+
+    Windows never span two series. The last sequence_length + horizon - 1 values of
+    each series are carried into its next chunk, so no window is lost at chunk
+    boundaries, even when chunks of different series are interleaved.
+    """
+    sequence_length = sequence_length or settings.sequence_length
+    window = sequence_length + horizon
+    carries = {}
+    
+    for key, chunk in chunks:
+        carry = carries.get(key)
+        values = np.concatenate([carry, chunk]) if carry is not None and len(carry) else chunk
+        if len(values) >= window:
+            windows = sliding_window_view(values, window)
+            X = windows[:, :sequence_length, np.newaxis]
+            y = windows[:, sequence_length] if horizon == 1 else windows[:, sequence_length:]
+            yield X, y
+        carries[key] = values[-(window - 1):]
+
+def iter_history_windows(session, sequence_length=None, horizon=1, start_id=0, end_id=None,
+                         columns=("cpu_utilization", "memory_utilization"), chunk_size=None):
+    """Training windows for every metric the model forecasts, streamed column by column"""
+    for column in columns:
+        chunks = iter_metric_chunks(session, column, start_id, end_id, chunk_size)
+        yield from iter_training_windows(chunks, sequence_length, horizon)
+
+def iter_archive_windows(archive_dir=None, sequence_length=None, horizon=1, start=None, end=None,
+                         columns=("cpu_utilization", "memory_utilization")):
+    """Training windows from the Parquet archive (services.archive), memory-mapped file by file"""
+    from services.archive import iter_archive_series
+    for column in columns:
+        chunks = iter_archive_series(column, archive_dir, start, end)
+        yield from iter_training_windows(chunks, sequence_length, horizon)
@@ -1,17 +1,28 @@
 import numpy as np
 import os
+import tempfile
+import tensorflow as tf
 from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.optimizers import Adam
 from config import settings
+from model.base import BasePredictor
+from model.numpy_engine import export_weights
+from model.training_data import generate_patterns, iter_pattern_batches
 
-class LSTMModel:
-    def __init__(self):
+class LSTMModel(BasePredictor):
+    def __init__(self, horizon=1, load=True):
+        super().__init__()
+        self.horizon = horizon
         self.model = None
-        self.model_path = os.path.join(settings.model_dir, "lstm_model.h5")
-        self.sequence_length = settings.sequence_length
+        self._infer = None
+        # horizon > 1 is the direct multi-step variant, stored next to the single-step model
+        filename = "lstm_model.h5" if horizon == 1 else f"lstm_model_h{horizon}.h5"
+        self.model_path = os.path.join(settings.model_dir, filename)
         os.makedirs(settings.model_dir, exist_ok=True)
-        self._load_or_create_model()
+        if load:
+            self._load_model()
     
     def _build_model(self, input_shape):
         """Build LSTM model with improved architecture"""
@@ -21,44 +32,25 @@ class LSTMModel:
             LSTM(32, activation='relu', return_sequences=False),
             Dropout(0.2),
             Dense(16, activation='relu'),
-            Dense(1)
+            Dense(self.horizon)  # One output per forecast step
         ])
         model.compile(optimizer='adam', loss='mse', metrics=['mae'])
         return model
     
-    def _generate_training_data(self, n_samples=500):
+    def _generate_training_data(self, n_samples=500, seed=None):
         """Generate more realistic training data with patterns"""
-        X, y = [], []
-        
-        for _ in range(n_samples):
-            # Generate sequences with different patterns
-            pattern_type = np.random.choice(['trend', 'seasonal', 'spike', 'stable'])
-            
-            if pattern_type == 'trend':
-                seq = np.linspace(40, 85, self.sequence_length) + np.random.normal(0, 5, self.sequence_length)
-                target = 90 + np.random.normal(0, 3)
-            elif pattern_type == 'seasonal':
-                seq = 60 + 20 * np.sin(np.linspace(0, 4*np.pi, self.sequence_length)) + np.random.normal(0, 5, self.sequence_length)
-                target = 60 + 20 * np.sin(4*np.pi + 0.5) + np.random.normal(0, 3)
-            elif pattern_type == 'spike':
-                seq = np.full(self.sequence_length, 50) + np.random.normal(0, 5, self.sequence_length)
-                seq[-3:] = seq[-3:] + 30  # Spike at the end
-                target = 85 + np.random.normal(0, 3)
-            else:  # stable
-                base = np.random.uniform(45, 65)
-                seq = np.full(self.sequence_length, base) + np.random.normal(0, 5, self.sequence_length)
-                target = base + np.random.normal(0, 3)
-            
-            # Clamp values
-            seq = np.clip(seq, 10, 95)
-            target = np.clip(target, 10, 95)
-            
-            X.append(seq)
-            y.append(target)
-        
-        X = np.array(X).reshape((len(X), self.sequence_length, 1))
-        y = np.array(y)
-        return X, y
+        return generate_patterns(n_samples, self.sequence_length, self.horizon, np.random.default_rng(seed))
+    
+    def training_dataset(self, batch_size=1024, n_batches=None, seed=None):
+        """tf.data pipeline over streamed synthetic batches, for datasets too large to hold in memory"""
+        y_shape = (None,) if self.horizon == 1 else (None, self.horizon)
+        return tf.data.Dataset.from_generator(
+            lambda: iter_pattern_batches(batch_size, n_batches, self.sequence_length, self.horizon, seed),
+            output_signature=(
+                tf.TensorSpec(shape=(None, self.sequence_length, 1), dtype=tf.float32),
+                tf.TensorSpec(shape=y_shape, dtype=tf.float32)
+            )
+        ).prefetch(tf.data.AUTOTUNE)
     
     def _train(self):
         """Train the model with better data"""
@@ -85,56 +77,87 @@ class LSTMModel:
             callbacks=[early_stopping]
         )
         
-        # Save model
-        self.model.save(self.model_path)
-        print(f"Model saved to {self.model_path}")
-        
+        self._publish()
         return history
     
-    def _load_or_create_model(self):
-        """Load existing model or create and train new one"""
-        if os.path.exists(self.model_path):
-            try:
-                self.model = load_model(self.model_path)
-                print(f"Loaded existing model from {self.model_path}")
-            except Exception as e:
-                print(f"Error loading model: {e}. Creating new model...")
-                self.model = self._build_model((self.sequence_length, 1))
-                self._train()
-        else:
-            print("No existing model found. Creating new model...")
+    def _publish(self):
+        """Save to a temp file and rename so a running API never loads a partial artifact"""
+        root, ext = os.path.splitext(self.model_path)
+        # A unique temp name per writer, so concurrent training runs never clobber each other
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(root), prefix=f"{os.path.basename(root)}.", suffix=f".tmp{ext}")
+        os.close(fd)
+        try:
+            self.model.save(tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.model_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        print(f"Model saved to {self.model_path}")
+        # Keep the TensorFlow-free serving artifact in sync with the Keras one
+        export_weights(self)
+    
+    def fine_tune(self, window_batches, epochs=None):
+        """Continue training on streamed (X, y) batches and publish the result
+
+        Starts from the loaded checkpoint when there is one, otherwise from a fresh model.
+        Returns the number of training windows seen.
+        """
+        if self.model is None:
             self.model = self._build_model((self.sequence_length, 1))
-            self._train()
+        else:
+            # Loaded models are not compiled; a low learning rate keeps fine-tuning incremental
+            self.model.compile(optimizer=Adam(learning_rate=settings.finetune_learning_rate), loss='mse', metrics=['mae'])
+        
+        n_windows = 0
+        for X, y in window_batches:
+            self.model.fit(X, y, epochs=epochs or settings.finetune_epochs, batch_size=32, verbose=0)
+            n_windows += len(X)
+            print(f"Fine-tuned on {n_windows} windows...")
+        
+        if n_windows:
+            self._publish()
+            self._infer = self._build_inference_fn()
+        return n_windows
     
-    def predict(self, cpu_data):
-        """Predict future CPU utilization"""
-        if len(cpu_data) < self.sequence_length:
-            # Pad with average if not enough data
-            avg = np.mean(cpu_data)
-            cpu_data = [avg] * (self.sequence_length - len(cpu_data)) + cpu_data
+    def _load_model(self):
+        """Load the published model artifact; training happens in model.train, never here"""
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"No trained model at {self.model_path}. Run `python -m model.train` to create one.")
         
-        X = np.array(cpu_data[-self.sequence_length:]).reshape((1, self.sequence_length, 1))
-        prediction = self.model.predict(X, verbose=0)[0][0]
-        return float(np.clip(prediction, 10, 95))
+        # Inference only; the optimizer state is not needed and Keras 3
+        # cannot deserialize the legacy compile config from .h5 files
+        self.model = load_model(self.model_path, compile=False)
+        print(f"Loaded existing model from {self.model_path}")
+        self._infer = self._build_inference_fn()
     
-    def predict_multiple(self, cpu_data, n_steps=5):
-        """Predict multiple future steps"""
-        predictions = []
-        current_seq = cpu_data[-self.sequence_length:]
+    def train(self):
+        """Build a fresh model, train it and publish the artifacts"""
+        self.model = self._build_model((self.sequence_length, 1))
+        history = self._train()
+        self._infer = self._build_inference_fn()
+        return history
+    
+    def _build_inference_fn(self):
+        """Trace the forward pass once so small batches skip model.predict's per-call setup"""
+        model = self.model
         
-        for _ in range(n_steps):
-            pred = self.predict(current_seq)
-            predictions.append(pred)
-            current_seq = current_seq[1:] + [pred]
+        @tf.function(
+            input_signature=[tf.TensorSpec(shape=(None, self.sequence_length, 1), dtype=tf.float32)],
+            reduce_retracing=True
+        )
+        def infer(X):
+            return model(X, training=False)
         
-        return predictions
+        # Trigger tracing now rather than on the first request
+        infer(tf.zeros((1, self.sequence_length, 1), dtype=tf.float32))
+        return infer
     
-    def get_prediction_confidence(self, cpu_data):
-        """Estimate prediction confidence based on data variance"""
-        if len(cpu_data) < 2:
-            return 0.5
-        
-        variance = np.var(cpu_data)
-        # Lower variance = higher confidence
-        confidence = max(0.3, min(0.95, 1.0 - (variance / 1000)))
-        return confidence
+    def _forward(self, X):
+        """Traced forward pass, fed in chunks so fleet-sized batches stay memory-bounded"""
+        if self._infer is None:
+            return self.model.predict(X, batch_size=min(len(X), 1024), verbose=0)
+        chunk = settings.inference_chunk_size
+        if len(X) <= chunk:
+            return self._infer(tf.constant(X)).numpy()
+        return np.concatenate([self._infer(tf.constant(X[i:i + chunk])).numpy() for i in range(0, len(X), chunk)])
@@ -0,0 +1,161 @@
+"""TensorFlow-free inference for the LSTMModel architecture.
+
+The export step writes the trained Keras weights to a compact .npz file, and
+NumpyLSTMEngine replays the forward pass (2 LSTM layers + 2 Dense layers) with
+NumPy only, so serving workers never have to import TensorFlow.
+
+Export from the backend directory with:
+    python -m model.numpy_engine
+"""
+import os
+import tempfile
+import numpy as np
+from config import settings
+from model.base import BasePredictor
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "hard_sigmoid": lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+}
+
+def default_weights_path(horizon=1):
+    filename = "lstm_weights.npz" if horizon == 1 else f"lstm_weights_h{horizon}.npz"
+    return os.path.join(settings.model_dir, filename)
+
+def _activation_name(fn):
+    name = getattr(fn, "__name__", str(fn))
+    if name not in _ACTIVATIONS:
+        raise ValueError(f"Unsupported activation for NumPy export: {name}")
+    return name
+
+def export_weights(lstm_model, path=None):
+    """Write the weights of a trained LSTMModel to a compressed .npz file"""
+    path = path or default_weights_path(lstm_model.horizon)
+    arrays = {}
+    layers = []
+    
+    for layer in lstm_model.model.layers:
+        kind = type(layer).__name__
+        if kind == "Dropout":
+            continue  # Inactive at inference time
+        
+        prefix = f"layer{len(layers)}"
+        if kind == "LSTM":
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            arrays[f"{prefix}_kernel"] = kernel.astype(np.float32)
+            arrays[f"{prefix}_recurrent_kernel"] = recurrent_kernel.astype(np.float32)
+            arrays[f"{prefix}_bias"] = bias.astype(np.float32)
+            layers.append(["lstm", _activation_name(layer.activation),
+                           _activation_name(layer.recurrent_activation),
+                           str(int(layer.return_sequences))])
+        elif kind == "Dense":
+            kernel, bias = layer.get_weights()
+            arrays[f"{prefix}_kernel"] = kernel.astype(np.float32)
+            arrays[f"{prefix}_bias"] = bias.astype(np.float32)
+            layers.append(["dense", _activation_name(layer.activation), "", ""])
+        else:
+            raise ValueError(f"Unsupported layer for NumPy export: {kind}")
+    
+    # Write to a temp file first so readers never see a half-written artifact
+    # (unique per writer, so concurrent exports never clobber each other)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, layers=np.array(layers), sequence_length=lstm_model.sequence_length, **arrays)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    print(f"NumPy weights exported to {path}")
+    return path
+
+class NumpyLSTMEngine(BasePredictor):
+    """Forward pass of the exported LSTM using NumPy only, vectorized over the batch"""
+    def __init__(self, path=None, horizon=1):
+        super().__init__()
+        self.model_path = path or default_weights_path(horizon)
+        with np.load(self.model_path) as data:
+            self.sequence_length = int(data["sequence_length"])
+            self.layers = []
+            for i, (kind, activation, recurrent_activation, return_sequences) in enumerate(data["layers"]):
+                prefix = f"layer{i}"
+                if kind == "lstm":
+                    self.layers.append((
+                        "lstm",
+                        data[f"{prefix}_kernel"],
+                        data[f"{prefix}_recurrent_kernel"],
+                        data[f"{prefix}_bias"],
+                        _ACTIVATIONS[activation],
+                        _ACTIVATIONS[recurrent_activation],
+                        return_sequences == "1"
+                    ))
+                else:
+                    self.layers.append(("dense", data[f"{prefix}_kernel"], data[f"{prefix}_bias"], _ACTIVATIONS[activation]))
+        # Width of the output layer: 1 for next-step models, prediction_horizon for direct multi-step
+        self.horizon = self.layers[-1][1].shape[1]
+        print(f"Loaded NumPy inference engine from {self.model_path}")
+    
+    @staticmethod
+    def _lstm(X, kernel, recurrent_kernel, bias, activation, recurrent_activation, return_sequences):
+        batch, timesteps, _ = X.shape
+        units = recurrent_kernel.shape[0]
+        # Input projections for every timestep in one 2-D matmul; only the recurrence is sequential
+        projected = (X.reshape(batch * timesteps, -1) @ kernel + bias).reshape(batch, timesteps, -1)
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        outputs = np.empty((batch, timesteps, units), dtype=np.float32) if return_sequences else None
+        
+        for t in range(timesteps):
+            z = projected[:, t] + h @ recurrent_kernel
+            # Keras gate order: input, forget, cell candidate, output
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            if return_sequences:
+                outputs[:, t] = h
+        
+        return outputs if return_sequences else h
+    
+    def _forward(self, X):
+        out = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer[0] == "lstm":
+                out = self._lstm(out, *layer[1:])
+            else:
+                _, kernel, bias, activation = layer
+                out = activation(out @ kernel + bias)
+        return out
+
+def check_parity(lstm_model, engine, n_samples=256, tolerance=1e-3, seed=0):
+    """Compare NumPy and Keras outputs on random windows; returns the max absolute difference"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(10, 95, (n_samples, lstm_model.sequence_length, 1)).astype(np.float32)
+    expected = lstm_model.model.predict(X, verbose=0)
+    actual = engine._forward(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        raise AssertionError(f"NumPy engine diverges from Keras: max abs diff {max_diff:.6f} > {tolerance}")
+    return max_diff
+
+if __name__ == "__main__":
+    import argparse
+    # Importing LSTMModel pulls in TensorFlow; only the export step needs it
+    from model.lstm_model import LSTMModel
+    
+    parser = argparse.ArgumentParser(description="Export LSTM weights for NumPy serving")
+    parser.add_argument("--horizon", type=int, default=1, help="Export the direct multi-step model with this horizon")
+    args = parser.parse_args()
+    
+    lstm_model = LSTMModel(horizon=args.horizon)  # Loads the published .h5
+    path = export_weights(lstm_model)
+    max_diff = check_parity(lstm_model, NumpyLSTMEngine(path))
+    print(f"Parity check passed (max abs diff {max_diff:.2e})")
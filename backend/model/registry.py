@@ -0,0 +1,236 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ModelRegistry:
+    """Process-wide registry that loads each model once and shares it across routers.
+
+    When a model's artifact is missing or unreadable the registry serves a fallback
+    predictor, optionally starts a background training worker, and hot-swaps the
+    real model in once the worker publishes a new artifact. A lock file per model in
+    model_dir makes sure only one API worker process spawns the training run; the others
+    just wait for the artifact to appear.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._models = {}
+        self._states = {}
+        self._versions = {}
+        self._generations = {}
+        self._training = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, artifact_path=None, fallback=None, train_args=None):
+        """Register a zero-argument factory used to build the model on first use
+
+        artifact_path: callable returning the file whose mtime identifies the published model
+        fallback: zero-argument factory for a predictor to serve while the model is unavailable
+        train_args: extra `python -m model.train` arguments for the background training worker
+        """
+        self._entries[name] = {
+            "factory": factory,
+            "artifact_path": artifact_path,
+            "fallback": fallback,
+            "train_args": train_args or [],
+        }
+
+    def _artifact_version(self, name):
+        artifact_path = self._entries[name]["artifact_path"]
+        if artifact_path is None:
+            return None
+        try:
+            return os.path.getmtime(artifact_path())
+        except OSError:
+            return None
+
+    def _load(self, name):
+        """Build a model, or its fallback if the artifact is unusable"""
+        entry = self._entries[name]
+        version = self._artifact_version(name)
+        try:
+            return entry["factory"](), "ready", version
+        except Exception as e:
+            if entry["fallback"] is None:
+                raise
+            print(f"Model '{name}' unavailable ({e}). Serving fallback predictor until a model is published.")
+            self._start_training(name)
+            return entry["fallback"](), "fallback", version
+
+    def get(self, name="lstm"):
+        """Return the shared model instance, loading it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is None:
+                if name not in self._entries:
+                    raise KeyError(f"Unknown model: {name}")
+                print(f"Loading model '{name}'...")
+                model, self._states[name], self._versions[name] = self._load(name)
+                self._models[name] = model
+                self._generations[name] = self._generations.get(name, 0) + 1
+        return model
+
+    def reload_if_changed(self):
+        """Hot-swap any loaded model whose artifact was republished since it was loaded"""
+        self._reap_training()
+        for name in list(self._models):
+            version = self._artifact_version(name)
+            if version is None or version == self._versions.get(name):
+                continue
+            try:
+                # Load outside the lock so requests keep using the current model meanwhile
+                model = self._entries[name]["factory"]()
+            except Exception as e:
+                print(f"Error reloading model '{name}': {e}")
+                self._versions[name] = version
+                continue
+            with self._lock:
+                # A single reference assignment: in-flight requests finish on the old model
+                self._models[name] = model
+                self._states[name] = "ready"
+                self._versions[name] = version
+                self._generations[name] = self._generations.get(name, 0) + 1
+            print(f"Model '{name}' hot-swapped to the newly published artifact")
+
+    def _lock_path(self, name):
+        return os.path.join(settings.model_dir, f"{name}.training.lock")
+
+    def _acquire_training_lock(self, name):
+        """Create the model's lock file exclusively; False if another process holds it"""
+        path = self._lock_path(name)
+        os.makedirs(settings.model_dir, exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(path)
+                except OSError:
+                    continue  # Released meanwhile
+                if age < settings.training_lock_timeout:
+                    return False
+                # Left behind by a worker that died mid-training
+                print(f"Taking over stale training lock for '{name}' ({age:.0f}s old)")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return False
+
+    def _release_training_lock(self, name):
+        try:
+            os.remove(self._lock_path(name))
+        except OSError:
+            pass
+
+    def _reap_training(self):
+        """Collect finished training workers and release their locks"""
+        for name, process in list(self._training.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            del self._training[name]
+            self._release_training_lock(name)
+            if returncode != 0:
+                print(f"Training worker for '{name}' exited with code {returncode}")
+
+    def _start_training(self, name):
+        """Launch `python -m model.train` in a separate process, at most one at a time per model
+
+        Only the worker process that takes the model's lock file spawns the run; the
+        others keep serving the fallback until reload_if_changed sees the new artifact.
+        """
+        if not settings.train_on_missing_model:
+            return
+        self._reap_training()
+        if name in self._training or not self._acquire_training_lock(name):
+            return
+
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+        command = [sys.executable, "-m", "model.train", *self._entries[name]["train_args"]]
+        print(f"Starting background training worker for '{name}': {' '.join(command)}")
+        try:
+            self._training[name] = subprocess.Popen(command, env=env)
+        except Exception:
+            self._release_training_lock(name)
+            raise
+
+    def is_loaded(self, name="lstm"):
+        """Check whether the real model (not a fallback) is warm, without triggering a load"""
+        return self._states.get(name) == "ready"
+
+    def generation(self, name="lstm"):
+        """Counter bumped whenever the served instance changes; 0 until the model is loaded"""
+        return self._generations.get(name, 0)
+
+    def warm_up(self, names=None):
+        """Eagerly load models, e.g. from a background task at startup"""
+        for name in names or list(self._entries):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error warming up model '{name}': {e}")
+
+    def status(self):
+        """Load state of every registered model: not_loaded, fallback or ready"""
+        return {name: self._states.get(name, "not_loaded") for name in self._entries}
+
+def _artifact_path(horizon=1):
+    if settings.inference_backend == "numpy":
+        from model.numpy_engine import default_weights_path
+        return default_weights_path(horizon)
+    filename = "lstm_model.h5" if horizon == 1 else f"lstm_model_h{horizon}.h5"
+    return os.path.join(settings.model_dir, filename)
+
+def _create_lstm_model(horizon=1):
+    if settings.inference_backend == "numpy":
+        from model.numpy_engine import NumpyLSTMEngine, default_weights_path
+        if os.path.exists(default_weights_path(horizon)):
+            return NumpyLSTMEngine(horizon=horizon)
+        print("No exported NumPy weights found. Falling back to the Keras model...")
+
+    # Imported lazily so TensorFlow is only loaded when a model is actually needed
+    from model.lstm_model import LSTMModel
+    return LSTMModel(horizon=horizon)
+
+def _create_fallback(horizon=1):
+    from model.fallback import EWMAPredictor
+    return EWMAPredictor(horizon=horizon)
+
+async def watch_for_updates(interval=None):
+    """Poll for newly published model artifacts and hot-swap them without a restart"""
+    interval = interval or settings.model_reload_interval
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(model_registry.reload_if_changed)
+        except Exception as e:
+            print(f"Error checking for model updates: {e}")
+
+# Global registry instance
+model_registry = ModelRegistry()
+model_registry.register(
+    "lstm",
+    _create_lstm_model,
+    artifact_path=_artifact_path,
+    fallback=_create_fallback
+)
+model_registry.register(
+    "lstm_horizon",
+    lambda: _create_lstm_model(settings.prediction_horizon),
+    artifact_path=lambda: _artifact_path(settings.prediction_horizon),
+    fallback=lambda: _create_fallback(settings.prediction_horizon),
+    train_args=["--horizon", str(settings.prediction_horizon)]
+)
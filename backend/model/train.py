@@ -0,0 +1,95 @@
+"""Train the LSTM forecaster and publish it for running API workers to hot-swap.
+
+Runs as a separate process so training never blocks API startup or requests.
+From the backend directory:
+    python -m model.train                     # next-step model on synthetic patterns
+    python -m model.train --horizon 5         # direct multi-step model
+    python -m model.train --source history    # fine-tune on new rows of the metrics table
+    python -m model.train --source archive    # fine-tune on the Parquet archive (services.archive)
+"""
+import argparse
+import json
+import os
+from model.lstm_model import LSTMModel
+
+def train_and_publish(horizon=1):
+    """Train a fresh model and atomically replace the published artifacts"""
+    lstm_model = LSTMModel(horizon=horizon, load=False)
+    lstm_model.train()
+    return lstm_model
+
+def _state_path(lstm_model):
+    return os.path.splitext(lstm_model.model_path)[0] + ".state.json"
+
+def fine_tune_on_history(horizon=1, from_scratch=False, chunk_size=None):
+    """Fine-tune the published checkpoint on metric rows it has not seen yet"""
+    from database import SessionLocal
+    from model.history import iter_history_windows, latest_metric_id
+
+    if from_scratch:
+        lstm_model = LSTMModel(horizon=horizon, load=False)
+    else:
+        try:
+            lstm_model = LSTMModel(horizon=horizon)  # Resume from the last checkpoint
+        except FileNotFoundError:
+            lstm_model = LSTMModel(horizon=horizon, load=False)
+
+    # High-water mark of metric rows already trained on
+    state_path = _state_path(lstm_model)
+    state = {}
+    if not from_scratch and lstm_model.model is not None and os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    start_id = state.get("last_metric_id", 0)
+
+    db = SessionLocal()
+    try:
+        # Bound the stream so rows ingested while training are left for the next run
+        end_id = latest_metric_id(db)
+        windows = iter_history_windows(db, lstm_model.sequence_length, horizon, start_id, end_id, chunk_size=chunk_size)
+        n_windows = lstm_model.fine_tune(windows)
+    finally:
+        db.close()
+
+    if n_windows:
+        with open(state_path, "w") as f:
+            json.dump({"last_metric_id": end_id}, f)
+    else:
+        print("No new metric history to train on")
+    return lstm_model
+
+def fine_tune_on_archive(horizon=1, archive_dir=None, from_scratch=False):
+    """Fine-tune on the Parquet archive, e.g. months of history already pruned from the DB"""
+    from model.history import iter_archive_windows
+
+    if from_scratch:
+        lstm_model = LSTMModel(horizon=horizon, load=False)
+    else:
+        try:
+            lstm_model = LSTMModel(horizon=horizon)  # Resume from the last checkpoint
+        except FileNotFoundError:
+            lstm_model = LSTMModel(horizon=horizon, load=False)
+    
+    if not lstm_model.fine_tune(iter_archive_windows(archive_dir, lstm_model.sequence_length, horizon)):
+        print("No archived metric history to train on")
+    return lstm_model
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the LSTM forecaster")
+    parser.add_argument("--horizon", type=int, default=1, help="Number of steps the output head forecasts")
+    parser.add_argument("--source", choices=["synthetic", "history", "archive"], default="synthetic",
+                        help="Train on synthetic patterns or fine-tune on the metrics table / Parquet archive")
+    parser.add_argument("--from-scratch", action="store_true", help="With --source history/archive, ignore the last checkpoint")
+    parser.add_argument("--archive-dir", help="With --source archive, the archive to read (default: settings.archive_dir)")
+    parser.add_argument("--chunk-size", type=int, help="Rows per chunk when streaming the metrics table")
+    args = parser.parse_args()
+
+    if args.source == "history":
+        fine_tune_on_history(args.horizon, args.from_scratch, args.chunk_size)
+    elif args.source == "archive":
+        fine_tune_on_archive(args.horizon, args.archive_dir, args.from_scratch)
+    else:
+        train_and_publish(args.horizon)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Vectorized synthetic training data for the LSTM forecaster.
+
+Samples are drawn from four pattern types (trend, seasonal, spike, stable). Each
+pattern type is generated for all of its samples at once with array ops, and
+iter_pattern_batches streams fixed-size batches so arbitrarily large synthetic
+datasets never have to be materialized.
+"""
+import numpy as np
+from config import settings
+
+PATTERNS = ("trend", "seasonal", "spike", "stable")
+
+def generate_patterns(n_samples, sequence_length=None, horizon=1, rng=None):
+    """Generate n_samples (X, y) pairs; X is (n, sequence_length, 1), y is (n,) or (n, horizon)"""
+    sequence_length = sequence_length or settings.sequence_length
+    rng = rng if rng is not None else np.random.default_rng()
+    steps = np.arange(1, horizon + 1)
+    
+    X = np.empty((n_samples, sequence_length), dtype=np.float32)
+    y = np.empty((n_samples, horizon), dtype=np.float32)
+    pattern_type = rng.integers(0, len(PATTERNS), n_samples)
+    
+    for index, name in enumerate(PATTERNS):
+        rows = np.flatnonzero(pattern_type == index)
+        k = len(rows)
+        if k == 0:
+            continue
+        seq_noise = rng.normal(0, 5, (k, sequence_length))
+        target_noise = rng.normal(0, 3, (k, horizon))
+        
+        if name == "trend":
+            slope = 45 / (sequence_length - 1)
+            seq = np.linspace(40, 85, sequence_length) + seq_noise
+            target = 85 + slope * steps + target_noise
+        elif name == "seasonal":
+            seq = 60 + 20 * np.sin(np.linspace(0, 4*np.pi, sequence_length)) + seq_noise
+            target = 60 + 20 * np.sin(4*np.pi + 0.5 * steps) + target_noise
+        elif name == "spike":
+            seq = 50 + seq_noise
+            seq[:, -3:] += 30  # Spike at the end
+            target = 85 + target_noise
+        else:  # stable
+            base = rng.uniform(45, 65, (k, 1))
+            seq = base + seq_noise
+            target = base + target_noise
+        
+        X[rows] = seq
+        y[rows] = target
+    
+    # Clamp values
+    np.clip(X, 10, 95, out=X)
+    np.clip(y, 10, 95, out=y)
+    
+    X = X.reshape((n_samples, sequence_length, 1))
+    if horizon == 1:
+        y = y.reshape(n_samples)
+    return X, y
+
+def iter_pattern_batches(batch_size=1024, n_batches=None, sequence_length=None, horizon=1, seed=None):
+    """Stream (X, y) batches; n_batches=None streams forever. The same seed yields the same stream."""
+    rng = np.random.default_rng(seed)
+    produced = 0
+    while n_batches is None or produced < n_batches:
+        yield generate_patterns(batch_size, sequence_length, horizon, rng)
+        produced += 1
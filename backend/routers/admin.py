@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from services.compaction import compactor
+from services.prediction_cache import prediction_cache
+from services.scheduler import forecast_scheduler
+from services.broadcast import broadcast_hub
+from services.profiler import request_profiler
+from schemas import BroadcastStats, CompactionStatus, PredictionCacheStats, ProfilerStatus, SchedulerStatus
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+@router.get("/compaction", response_model=CompactionStatus)
+async def get_compaction_status():
+    """Rows pruned and bytes reclaimed by the retention job"""
+    return compactor.report()
+
+@router.post("/compaction", response_model=CompactionStatus)
+async def run_compaction():
+    """Run a compaction cycle now instead of waiting for the next interval"""
+    await compactor.compact()
+    return compactor.report()
+
+@router.get("/prediction-cache", response_model=PredictionCacheStats)
+async def get_prediction_cache_stats():
+    """Hit/miss/eviction counters of the forecast cache"""
+    return prediction_cache.stats()
+
+@router.delete("/prediction-cache", response_model=PredictionCacheStats)
+async def clear_prediction_cache():
+    """Drop every cached forecast (counters are kept)"""
+    prediction_cache.clear()
+    return prediction_cache.stats()
+
+@router.get("/scheduler", response_model=SchedulerStatus)
+async def get_scheduler_status():
+    """Cycle time, lag and size of the background forecast scheduler"""
+    return forecast_scheduler.report()
+
+@router.get("/broadcast", response_model=BroadcastStats)
+async def get_broadcast_stats():
+    """Subscribers, fan-out time and dropped frames of the /ws hub"""
+    return broadcast_hub.stats()
+
+@router.get("/profiles", response_model=ProfilerStatus)
+async def get_profiles():
+    """Sampling settings and the slowest profiled requests, slowest first"""
+    return request_profiler.report()
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: int, format: str = "speedscope"):
+    """One request profile: ?format=speedscope (JSON for speedscope.app) or collapsed (flamegraph.pl)"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found (only the slowest are kept)")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', expected speedscope or collapsed")
+    return profile.speedscope()
+
+@router.delete("/profiles", response_model=ProfilerStatus)
+async def clear_profiles():
+    """Drop every retained profile (counters are kept)"""
+    request_profiler.clear()
+    return request_profiler.report()
@@ -1,51 +1,44 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db, MetricRecord
-from sqlalchemy import desc
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, MetricRecord
+from model.registry import model_registry
+from routers.predictions import prediction_payload
 from utils.simulate_data import simulator
-from model.lstm_model import LSTMModel
-from services.action_engine import ActionEngine
 from services.cost_calculator import CostCalculator
-from schemas import DashboardStats
+from services.forecasting import predict_resource
+from services.recent import recent_metrics, CPU, MEMORY, NETWORK
+from services.scheduler import forecast_scheduler
+from services.telemetry import stage
+from schemas import ActionResponse, DashboardOverview, DashboardStats
 from config import settings
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
-lstm_model = LSTMModel()
-action_engine = ActionEngine()
 cost_calculator = CostCalculator()
 
-@router.get("/stats", response_model=DashboardStats)
-def get_dashboard_stats(db: Session = Depends(get_db)):
-    """Get comprehensive dashboard statistics"""
-    # Get current metrics
-    current_metrics = simulator.get_current_metrics()
-    
-    # Get recent history for prediction
-    recent_records = db.query(MetricRecord).order_by(desc(MetricRecord.timestamp)).limit(settings.sequence_length).all()
-    
-    if len(recent_records) < settings.sequence_length:
-        cpu_data = simulator.get_mock_cpu_data(settings.sequence_length)
-        memory_data = simulator.get_mock_memory_data(settings.sequence_length)
-    else:
-        cpu_data = [r.cpu_utilization for r in reversed(recent_records)]
-        memory_data = [r.memory_utilization for r in reversed(recent_records)]
-    
-    # Make predictions
-    predicted_cpu = lstm_model.predict(cpu_data)
-    predicted_memory = lstm_model.predict(memory_data)
-    confidence = lstm_model.get_prediction_confidence(cpu_data)
-    
-    # Get action recommendation
-    current_instances = recent_records[0].instance_count if recent_records else 1
-    action_data = action_engine.get_action(predicted_cpu, predicted_memory, current_instances, confidence)
-    
+_EPOCH = datetime(1970, 1, 1)
+_ETAG_CACHE_SIZE = 1024
+# (resource_id, history_limit) -> (inputs, ETag) of the last overview built, least recently used first
+_overview_etags = OrderedDict()
+
+def stats_payload(current_metrics, prediction):
+    """DashboardStats body for the current metric values and a predict_resource result"""
+    predicted_cpu, predicted_memory = prediction["predicted_cpu"], prediction["predicted_memory"]
+    current_instances, action_data = prediction["current_instances"], prediction["action"]
+
     # Calculate costs
-    current_cost = cost_calculator.calculate_current_cost(
-        current_metrics["cpu"], current_metrics["memory"], current_instances
-    )
-    monthly_cost = cost_calculator.calculate_monthly_cost(current_cost)
-    
+    with stage("dashboard", "cost"):
+        current_cost = cost_calculator.calculate_current_cost(
+            current_metrics["cpu"], current_metrics["memory"], current_instances
+        )
+        monthly_cost = cost_calculator.calculate_monthly_cost(current_cost)
+
     return {
         "current_cpu": round(current_metrics["cpu"], 2),
         "current_memory": round(current_metrics["memory"], 2),
@@ -59,4 +52,131 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
         "savings_percentage": round(action_data["cost_impact"]["savings_percentage"], 2)
     }
 
+def _current_values(latest):
+    """cpu/memory/network dict of a recent_metrics.latest() sample"""
+    values = latest[3]
+    return {"cpu": values[CPU], "memory": values[MEMORY], "network": values[NETWORK]}
+
+@router.get("/stats", response_model=DashboardStats)
+async def get_dashboard_stats(resource_id: str = settings.default_resource_id):
+    """Get comprehensive dashboard statistics
+
+    Current values are the resource's newest ingested sample, like /overview; only the
+    default (demo) resource falls back to the simulator while it has no data.
+    """
+    with stage("dashboard", "current_metrics"):
+        latest = recent_metrics.latest(resource_id)
+        if latest is not None:
+            current_metrics = _current_values(latest)
+        elif resource_id == settings.default_resource_id:
+            current_metrics = simulator.get_current_metrics()
+        else:
+            raise HTTPException(status_code=404, detail=f"No metrics for resource '{resource_id}'")
+
+    # Forecast and action for the latest window, shared with /api/predict through the cache
+    with stage("dashboard", "forecast"):
+        prediction = await predict_resource(resource_id)
+
+    return stats_payload(current_metrics, prediction)
+
+def _overview_inputs(resource_id):
+    """Everything an overview is computed from, and the resource's newest sample (or None)
+
+    Equal inputs mean an equal response, so a matching If-None-Match can be answered
+    before any work is done.
+    """
+    latest = recent_metrics.latest(resource_id)
+    snapshot = forecast_scheduler.snapshot
+    inputs = (
+        model_registry.generation("lstm"),
+        snapshot.timestamp if snapshot is not None else None,
+        latest[0] if latest is not None else None,
+    )
+    if latest is None or latest[1] < settings.sequence_length:
+        # Short or missing windows are forecast from simulated data, which moves every step
+        inputs += (int(time.time() // simulator.step_seconds),)
+    return inputs, latest
+
+def _etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    return any(tag.strip() in ("*", etag, "W/" + etag) for tag in if_none_match.split(","))
+
+def _not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+async def _recent_history(db, resource_id, limit):
+    """Latest raw samples of a resource, newest first (the overview's only DB query)"""
+    if limit <= 0:
+        return []
+    result = await db.execute(
+        select(MetricRecord.timestamp, MetricRecord.cpu_utilization, MetricRecord.memory_utilization,
+               MetricRecord.network_io, MetricRecord.cost)
+        .where(MetricRecord.resource_id == resource_id)
+        .order_by(desc(MetricRecord.timestamp))
+        .limit(limit)
+    )
+    return [
+        {
+            "timestamp": timestamp.isoformat(),
+            "resource_id": resource_id,
+            "cpu": cpu,
+            "memory": memory,
+            "network": network,
+            "cost": cost,
+            "resolution": "raw"
+        }
+        for timestamp, cpu, memory, network, cost in result.all()
+    ]
+
+@router.get("/overview", response_model=DashboardOverview)
+async def get_dashboard_overview(request: Request, resource_id: str = settings.default_resource_id,
+                                 history_limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """Stats, prediction, action and recent history for one dashboard refresh
+
+    One DB query (the latest history_limit raw samples; 0 skips it) and one forecast,
+    shared with /api/predict through the cache. Current values come from the newest
+    ingested sample, or the simulator for a resource without data. Responses carry an
+    ETag; a poll whose If-None-Match still matches gets a 304, without either step
+    when nothing it depends on has changed.
+    """
+    history_limit = max(0, min(history_limit, settings.history_max_points))
+    key = (resource_id, history_limit)
+    inputs, latest = _overview_inputs(resource_id)
+    if_none_match = request.headers.get("if-none-match")
+    known = _overview_etags.get(key)
+    if known is not None and known[0] == inputs and if_none_match and _etag_matches(if_none_match, known[1]):
+        return _not_modified(known[1])
+
+    with stage("overview", "load"):
+        history, prediction = await asyncio.gather(
+            _recent_history(db, resource_id, history_limit), predict_resource(resource_id)
+        )
+    if latest is not None:
+        as_of = _EPOCH + timedelta(microseconds=latest[2])
+        current_metrics = _current_values(latest)
+    else:
+        as_of = _EPOCH + timedelta(seconds=int(time.time() // simulator.step_seconds) * simulator.step_seconds)
+        current_metrics = simulator.get_current_metrics()
+
+    with stage("overview", "render"):
+        timestamp = as_of.isoformat()
+        action_data = prediction["action"]
+        overview = DashboardOverview(
+            timestamp=timestamp,
+            resource_id=resource_id,
+            stats=stats_payload(current_metrics, prediction),
+            prediction=prediction_payload(prediction, timestamp),
+            action={field: action_data[field] for field in ActionResponse.model_fields},
+            history=history,
+        )
+        body = overview.model_dump_json().encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
 
+    _overview_etags[key] = (inputs, etag)
+    _overview_etags.move_to_end(key)
+    while len(_overview_etags) > _ETAG_CACHE_SIZE:
+        _overview_etags.popitem(last=False)
+    # Recomputed but unchanged (e.g. a new scheduler cycle over the same data)
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
 from datetime import datetime, timedelta
-from typing import List
-from database import get_db, MetricRecord, PredictionRecord
+from typing import List, Optional
+from database import get_async_db, MetricRecord, PredictionRecord
 from utils.simulate_data import simulator
-from schemas import MetricResponse, PredictionResponse
+from schemas import MetricResponse, MetricHistoryResponse, PredictionResponse, MetricIngest, IngestResponse, naive_utc
+from services.ingest import to_metric_rows, write_metrics, write_metrics_batch, ingest_buffer
+from services.recent import recent_metrics
+from services.rollups import RESOLUTIONS, METRICS, pick_resolution, query_rollups
+from config import settings
 
 router = APIRouter(prefix="/api/metrics", tags=["metrics"])
 
 @router.get("/current", response_model=MetricResponse)
-def get_current_metrics(db: Session = Depends(get_db)):
+async def get_current_metrics(resource_id: str = settings.default_resource_id, db: AsyncSession = Depends(get_async_db)):
     """Get current real-time metrics"""
     from services.cost_calculator import CostCalculator
     
@@ -19,42 +24,155 @@ def get_current_metrics(db: Session = Depends(get_db)):
     cost = cost_calc.calculate_current_cost(metrics["cpu"], metrics["memory"], 1)
     
     # Save to database
-    record = MetricRecord(
-        cpu_utilization=metrics["cpu"],
-        memory_utilization=metrics["memory"],
-        network_io=metrics["network"],
-        cost=cost
-    )
-    db.add(record)
-    db.commit()
+    row = {
+        "resource_id": resource_id,
+        "timestamp": datetime.utcnow(),
+        "cpu_utilization": metrics["cpu"],
+        "memory_utilization": metrics["memory"],
+        "network_io": metrics["network"],
+        "cost": cost
+    }
+    await write_metrics(db, [row])
+    await db.commit()
+    recent_metrics.extend([row])
     
     return {
         "timestamp": metrics["timestamp"],
+        "resource_id": resource_id,
         "cpu": metrics["cpu"],
         "memory": metrics["memory"],
         "network": metrics["network"],
         "cost": cost
     }
 
-@router.get("/history", response_model=List[MetricResponse])
-def get_metric_history(limit: int = 100, db: Session = Depends(get_db)):
-    """Get historical metrics"""
-    records = db.query(MetricRecord).order_by(desc(MetricRecord.timestamp)).limit(limit).all()
+async def _store_rows(rows, buffered):
+    if buffered:
+        await ingest_buffer.add(rows)
+    else:
+        await write_metrics_batch(rows)
+
+@router.post("/ingest", response_model=IngestResponse)
+async def ingest_metrics(items: List[MetricIngest], buffered: bool = False):
+    """Bulk-ingest a JSON array of metric samples in one transaction (or via the write-behind buffer)"""
+    rows = to_metric_rows(items)
+    await _store_rows(rows, buffered)
+    return {"accepted": len(rows), "buffered": buffered}
+
+@router.post("/ingest/ndjson", response_model=IngestResponse)
+async def ingest_metrics_ndjson(request: Request, buffered: bool = False):
+    """Stream newline-delimited JSON samples; rows are written every ingest_batch_size lines
+
+    Lines longer than ingest_max_line_bytes are rejected with a 413.
+    """
+    accepted = 0
+    batch = []
+    remainder = b""
+    line_number = 0
+    
+    def too_long(number):
+        return HTTPException(
+            status_code=413,
+            detail=f"Line {number} exceeds {settings.ingest_max_line_bytes} bytes ({accepted} rows already stored)"
+        )
+    
+    async def parse(lines):
+        nonlocal accepted, batch, line_number
+        for line in lines:
+            line_number += 1
+            if len(line) > settings.ingest_max_line_bytes:
+                raise too_long(line_number)
+            if not line.strip():
+                continue
+            try:
+                batch.append(MetricIngest.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Invalid sample on line {line_number} ({accepted} rows already stored): {e.errors()[0]['msg']}"
+                )
+            if len(batch) >= settings.ingest_batch_size:
+                await _store_rows(to_metric_rows(batch), buffered)
+                accepted += len(batch)
+                batch = []
+    
+    async for chunk in request.stream():
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        await parse(lines)
+        # A line without a newline would otherwise buffer the whole body
+        if len(remainder) > settings.ingest_max_line_bytes:
+            raise too_long(line_number + 1)
+    await parse([remainder])
+    if batch:
+        await _store_rows(to_metric_rows(batch), buffered)
+        accepted += len(batch)
+    
+    return {"accepted": accepted, "buffered": buffered}
+
+@router.get("/history", response_model=List[MetricHistoryResponse])
+async def get_metric_history(limit: Optional[int] = None, resource_id: str = settings.default_resource_id,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             resolution: str = "auto", db: AsyncSession = Depends(get_async_db)):
+    """Get historical metrics, newest first
+
+    resolution: raw, 1m, 1h, 1d or auto. With a start time, auto serves raw rows when the
+    range holds at most history_target_points samples and otherwise the finest rollup that
+    fits, so a 30-day range returns ~720 hourly buckets. Without one, the latest `limit`
+    rows (default 100) are returned.
+    """
+    if resolution not in ("auto", "raw", *RESOLUTIONS):
+        raise HTTPException(status_code=400, detail=f"Unknown resolution '{resolution}'")
+    start, end = naive_utc(start), naive_utc(end)
+    if start is None:
+        limit = limit or 100
+        if resolution == "auto":
+            resolution = "raw"
+    elif resolution == "auto":
+        resolution = await pick_resolution(db, resource_id, start, end or datetime.utcnow())
+    limit = min(limit or settings.history_max_points, settings.history_max_points)
+    
+    if resolution != "raw":
+        buckets = await query_rollups(db, resolution, resource_id, start, end, limit)
+        return [
+            {
+                "timestamp": b.bucket_start.isoformat(),
+                "resource_id": b.resource_id,
+                "cpu": b.cpu_avg,
+                "memory": b.memory_avg,
+                "network": b.network_avg,
+                "cost": b.cost_avg,
+                "resolution": resolution,
+                "samples": b.samples,
+                **{f"{m}_{a}": getattr(b, f"{m}_{a}") for m in METRICS for a in ("min", "max", "p95")}
+            }
+            for b in buckets
+        ]
+    
+    query = select(MetricRecord).where(MetricRecord.resource_id == resource_id)
+    if start is not None:
+        query = query.where(MetricRecord.timestamp >= start)
+    if end is not None:
+        query = query.where(MetricRecord.timestamp < end)
+    result = await db.execute(query.order_by(desc(MetricRecord.timestamp)).limit(limit))
+    records = result.scalars().all()
     return [
         {
             "timestamp": r.timestamp.isoformat(),
+            "resource_id": r.resource_id,
             "cpu": r.cpu_utilization,
             "memory": r.memory_utilization,
             "network": r.network_io,
-            "cost": r.cost
+            "cost": r.cost,
+            "resolution": "raw"
         }
         for r in records
     ]
 
 @router.get("/predictions", response_model=List[PredictionResponse])
-def get_predictions(limit: int = 50, db: Session = Depends(get_db)):
+async def get_predictions(limit: int = 50, db: AsyncSession = Depends(get_async_db)):
     """Get prediction history"""
-    records = db.query(PredictionRecord).order_by(desc(PredictionRecord.timestamp)).limit(limit).all()
+    result = await db.execute(select(PredictionRecord).order_by(desc(PredictionRecord.timestamp)).limit(limit))
+    records = result.scalars().all()
     return [
         {
             "timestamp": r.timestamp.isoformat(),
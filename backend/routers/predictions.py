@@ -1,70 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db, PredictionRecord, MetricRecord
-from sqlalchemy import desc
+import asyncio
+from typing import Optional
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, PredictionRecord
 from datetime import datetime
-from utils.simulate_data import simulator
-from model.lstm_model import LSTMModel
+from model.registry import model_registry
 from services.action_engine import ActionEngine
 from services.cost_calculator import CostCalculator
-from schemas import PredictionResponse, ActionResponse
+from services.fleet import evaluate_fleet
+from services.forecasting import load_recent_window, forecast_horizon, predict_resource
+from services.recent import recent_metrics
+from services.scheduler import forecast_scheduler
+from services.telemetry import stage
+from schemas import PredictionResponse, ForecastResponse, FleetPredictionResponse, ActionResponse
 from config import settings
 
 router = APIRouter(prefix="/api/predict", tags=["predictions"])
 
 # Initialize services
-lstm_model = LSTMModel()
 action_engine = ActionEngine()
 cost_calculator = CostCalculator()
 
-@router.get("/", response_model=PredictionResponse)
-def get_prediction(db: Session = Depends(get_db)):
-    """Get current prediction and recommendation"""
-    # Get recent CPU data
-    recent_records = db.query(MetricRecord).order_by(desc(MetricRecord.timestamp)).limit(settings.sequence_length).all()
-    
-    if len(recent_records) < settings.sequence_length:
-        # Not enough data, generate mock data
-        cpu_data = simulator.get_mock_cpu_data(settings.sequence_length)
-        memory_data = simulator.get_mock_memory_data(settings.sequence_length)
-    else:
-        cpu_data = [r.cpu_utilization for r in reversed(recent_records)]
-        memory_data = [r.memory_utilization for r in reversed(recent_records)]
-    
-    # Make predictions
-    predicted_cpu = lstm_model.predict(cpu_data)
-    predicted_memory = lstm_model.predict(memory_data)
-    confidence = lstm_model.get_prediction_confidence(cpu_data)
-    
-    # Get current instance count (default to 1)
-    current_instances = recent_records[0].instance_count if recent_records else 1
-    
-    # Get action recommendation
-    action_data = action_engine.get_action(predicted_cpu, predicted_memory, current_instances, confidence)
+def prediction_payload(prediction, timestamp):
+    """PredictionResponse body for a predict_resource result"""
+    cpu_data, memory_data = prediction["cpu_data"], prediction["memory_data"]
+    current_instances = prediction["current_instances"]
+    predicted_cpu, predicted_memory = prediction["predicted_cpu"], prediction["predicted_memory"]
+    confidence, action_data = prediction["confidence"], prediction["action"]
     
     # Calculate costs
-    current_cost = cost_calculator.calculate_current_cost(
-        cpu_data[-1], memory_data[-1], current_instances
-    )
-    predicted_cost = cost_calculator.calculate_predicted_cost(
-        predicted_cpu, predicted_memory, action_data["recommended_instances"]
-    )
-    
-    # Save prediction to database
-    prediction_record = PredictionRecord(
-        predicted_cpu=predicted_cpu,
-        predicted_memory=predicted_memory,
-        recommended_action=action_data["action"],
-        confidence=confidence,
-        cost_savings=action_data["cost_impact"]["potential_savings"]
-    )
-    db.add(prediction_record)
-    db.commit()
+    with stage("prediction", "cost"):
+        current_cost = cost_calculator.calculate_current_cost(
+            cpu_data[-1], memory_data[-1], current_instances
+        )
+        predicted_cost = cost_calculator.calculate_predicted_cost(
+            predicted_cpu, predicted_memory, action_data["recommended_instances"]
+        )
     
     return {
-        "timestamp": datetime.utcnow().isoformat(),
-        "cpu_history": cpu_data,
-        "memory_history": memory_data,
+        "timestamp": timestamp,
+        "cpu_history": cpu_data.tolist(),
+        "memory_history": memory_data.tolist(),
         "predicted_cpu": round(predicted_cpu, 2),
         "predicted_memory": round(predicted_memory, 2),
         "recommended_action": action_data["action"],
@@ -75,17 +52,104 @@ def get_prediction(db: Session = Depends(get_db)):
         "cost_savings": round(action_data["cost_impact"]["potential_savings"], 4)
     }
 
+@router.get("/", response_model=PredictionResponse)
+async def get_prediction(resource_id: str = settings.default_resource_id, db: AsyncSession = Depends(get_async_db)):
+    """Get current prediction and recommendation"""
+    # Forecast and action for the latest window, recomputed only when a new sample arrives
+    with stage("prediction", "forecast"):
+        prediction = await predict_resource(resource_id)
+    action_data = prediction["action"]
+    
+    # Save prediction to database (scheduled forecasts are stored in batches by the scheduler)
+    if not prediction["scheduled"]:
+        prediction_record = PredictionRecord(
+            resource_id=resource_id,
+            predicted_cpu=prediction["predicted_cpu"],
+            predicted_memory=prediction["predicted_memory"],
+            recommended_action=action_data["action"],
+            confidence=prediction["confidence"],
+            cost_savings=action_data["cost_impact"]["potential_savings"]
+        )
+        with stage("prediction", "record_commit"):
+            db.add(prediction_record)
+            await db.commit()
+    
+    return prediction_payload(prediction, datetime.utcnow().isoformat())
+
+@router.get("/horizon", response_model=ForecastResponse)
+async def get_horizon_forecast(current_instances: Optional[int] = None, resource_id: str = settings.default_resource_id):
+    """Forecast the full prediction horizon in a single forward pass
+
+    current_instances defaults to the resource's latest reported instance count.
+    """
+    cpu_data, memory_data, window_instances = load_recent_window(resource_id)
+    if current_instances is None:
+        current_instances = window_instances
+    cpu_forecast, memory_forecast, confidence = await asyncio.to_thread(forecast_horizon, cpu_data, memory_data)
+    
+    action_data = action_engine.get_trajectory_action(
+        cpu_forecast, memory_forecast, current_instances, confidence
+    )
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "horizon": len(cpu_forecast),
+        "cpu_history": cpu_data.tolist(),
+        "memory_history": memory_data.tolist(),
+        "cpu_forecast": [round(v, 2) for v in cpu_forecast],
+        "memory_forecast": [round(v, 2) for v in memory_forecast],
+        "recommended_action": action_data["action"],
+        "confidence": round(confidence, 2),
+        "action_details": action_data
+    }
+
+@router.get("/fleet", response_model=FleetPredictionResponse)
+async def get_fleet_predictions():
+    """Predictions and scaling actions for every resource in one call (columnar)"""
+    snapshot = forecast_scheduler.snapshot
+    if snapshot is not None:
+        # The scheduler's latest cycle already covers the whole fleet
+        resource_ids, results = snapshot.resource_ids, snapshot.results
+    else:
+        resource_ids, cpu_windows, memory_windows, instance_counts = recent_metrics.fleet_windows()
+        lstm_model = await asyncio.to_thread(model_registry.get, "lstm")
+        results = await asyncio.to_thread(evaluate_fleet, lstm_model, cpu_windows, memory_windows, instance_counts)
+    cost_impact = results["cost_impact"]
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "count": len(resource_ids),
+        "resource_ids": resource_ids,
+        "predicted_cpu": np.round(results["predicted_cpu"], 2).tolist(),
+        "predicted_memory": np.round(results["predicted_memory"], 2).tolist(),
+        "confidence": results["confidence"].tolist(),
+        "recommended_action": results["action"].tolist(),
+        "current_instances": results["current_instances"].tolist(),
+        "recommended_instances": results["recommended_instances"].tolist(),
+        "urgency": results["urgency"].tolist(),
+        "current_cost": cost_impact["current_cost"].tolist(),
+        "new_cost": cost_impact["new_cost"].tolist(),
+        "optimal_instances": cost_impact["optimal_instances"].tolist(),
+        "potential_savings": cost_impact["potential_savings"].tolist(),
+        "savings_percentage": cost_impact["savings_percentage"].tolist()
+    }
+
 @router.get("/action", response_model=ActionResponse)
-def get_action_recommendation(current_instances: int = 1, db: Session = Depends(get_db)):
-    """Get detailed action recommendation"""
-    # Get prediction first
-    prediction = get_prediction(db)
+async def get_action_recommendation(current_instances: Optional[int] = None, resource_id: str = settings.default_resource_id):
+    """Get detailed action recommendation
+
+    current_instances defaults to the resource's latest reported instance count.
+    """
+    # Get prediction first (shared with /api/predict through the cache)
+    prediction = await predict_resource(resource_id)
+    if current_instances is None:
+        current_instances = prediction["current_instances"]
     
     action_data = action_engine.get_action(
-        prediction["predicted_cpu"],
-        prediction["predicted_memory"],
+        round(prediction["predicted_cpu"], 2),
+        round(prediction["predicted_memory"], 2),
         current_instances,
-        prediction["confidence"]
+        round(prediction["confidence"], 2)
     )
     
     return {
@@ -97,4 +161,3 @@ def get_action_recommendation(current_instances: int = 1, db: Session = Depends(
         "cost_impact": action_data["cost_impact"],
         "confidence": action_data["confidence"]
     }
-
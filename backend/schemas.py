@@ -1,13 +1,54 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+def naive_utc(value):
+    """Timestamps are stored as naive UTC; convert aware ones (e.g. ISO 8601 "Z") to that"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class MetricResponse(BaseModel):
     timestamp: Optional[str] = None
+    resource_id: Optional[str] = None
     cpu: float
     memory: float
     network: float
     cost: Optional[float] = 0.0
 
+class MetricHistoryResponse(MetricResponse):
+    # Rollup buckets report cpu/memory/network/cost as bucket averages
+    resolution: Optional[str] = None
+    samples: Optional[int] = None
+    cpu_min: Optional[float] = None
+    cpu_max: Optional[float] = None
+    cpu_p95: Optional[float] = None
+    memory_min: Optional[float] = None
+    memory_max: Optional[float] = None
+    memory_p95: Optional[float] = None
+    network_min: Optional[float] = None
+    network_max: Optional[float] = None
+    network_p95: Optional[float] = None
+
+class MetricIngest(BaseModel):
+    resource_id: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    # NaN/Infinity would poison rollups and prediction windows, so they are rejected here
+    cpu: float = Field(allow_inf_nan=False)
+    memory: float = Field(allow_inf_nan=False)
+    network: float = Field(0.0, allow_inf_nan=False)
+    cost: Optional[float] = Field(None, allow_inf_nan=False)
+    instance_count: int = 1
+
+    @field_validator("timestamp")
+    @classmethod
+    def _naive_timestamp(cls, value):
+        return naive_utc(value)
+
+class IngestResponse(BaseModel):
+    accepted: int
+    buffered: bool
+
 class PredictionResponse(BaseModel):
     timestamp: str
     cpu_history: List[float]
@@ -21,6 +62,35 @@ class PredictionResponse(BaseModel):
     predicted_cost: float
     cost_savings: float
 
+class ForecastResponse(BaseModel):
+    timestamp: str
+    horizon: int
+    cpu_history: List[float]
+    memory_history: List[float]
+    cpu_forecast: List[float]
+    memory_forecast: List[float]
+    recommended_action: str
+    confidence: float
+    action_details: dict
+
+class FleetPredictionResponse(BaseModel):
+    """Columnar results: index i of every list belongs to resource_ids[i]"""
+    timestamp: str
+    count: int
+    resource_ids: List[str]
+    predicted_cpu: List[float]
+    predicted_memory: List[float]
+    confidence: List[float]
+    recommended_action: List[str]
+    current_instances: List[int]
+    recommended_instances: List[int]
+    urgency: List[str]
+    current_cost: List[float]
+    new_cost: List[float]
+    optimal_instances: List[int]
+    potential_savings: List[float]
+    savings_percentage: List[float]
+
 class ActionResponse(BaseModel):
     action: str
     current_instances: int
@@ -42,4 +112,86 @@ class DashboardStats(BaseModel):
     potential_savings: float
     savings_percentage: float
 
+class DashboardOverview(BaseModel):
+    timestamp: str  # Time of the newest sample the response is built from
+    resource_id: str
+    stats: DashboardStats
+    prediction: PredictionResponse
+    action: ActionResponse
+    history: List[MetricHistoryResponse]  # Latest raw samples, newest first
+
+
+
+class CompactionRun(BaseModel):
+    timestamp: str
+    duration_seconds: float
+    rows_pruned: Dict[str, int]
+    bytes_reclaimed: Optional[int] = None
+    database_size_bytes: Optional[int] = None
+
+class CompactionStatus(BaseModel):
+    runs: int
+    total_rows_pruned: int
+    total_bytes_reclaimed: int
+    last_run: Optional[CompactionRun] = None
+
+class SchedulerStatus(BaseModel):
+    interval_seconds: float
+    cycles: int
+    skipped_cycles: int
+    resources: int
+    last_run: Optional[str] = None
+    snapshot_age_seconds: Optional[float] = None
+    last_cycle_seconds: Optional[float] = None
+    avg_cycle_seconds: Optional[float] = None
+    max_cycle_seconds: float
+    last_lag_seconds: Optional[float] = None
+    max_lag_seconds: float
+    records_persisted: int
+    last_error: Optional[str] = None
+
+class BroadcastStats(BaseModel):
+    subscribers: int
+    encodings: Dict[str, int]
+    resources: int
+    interval_seconds: float
+    queue_size: int
+    keyframe_interval: int
+    ticks: int
+    frames_serialized: int
+    messages_sent: int
+    bytes_sent: int
+    messages_dropped: int
+    last_tick_seconds: Optional[float] = None
+
+class ProfileSummary(BaseModel):
+    id: int
+    method: str
+    path: str
+    status: int
+    reason: str
+    started_at: str
+    duration_ms: float
+    samples: int
+
+class ProfilerStatus(BaseModel):
+    enabled: bool
+    sample_rate: float
+    interval_seconds: float
+    max_profiles: int
+    header: str
+    profiled_requests: int
+    skipped_requests: int
+    active: int
+    profiles: List[ProfileSummary]
 
+class PredictionCacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    coalesced: int
+    evictions: int
+    expirations: int
+    hit_rate: Optional[float] = None
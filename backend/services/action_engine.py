@@ -1,6 +1,15 @@
+import numpy as np
 from config import settings
-from services.cost_calculator import CostCalculator
-from typing import Dict, Tuple
+from services.cost_calculator import CostCalculator, round_like_python
+from typing import Dict, List, Tuple
+
+MAX_INSTANCES = 10  # Cap for Scale Up recommendations
+
+REASON_TEMPLATES = {
+    "Scale Up": "High utilization predicted ({:.1f}%). Scaling up to handle increased load.",
+    "Scale Down": "Low utilization predicted ({:.1f}%). Scaling down to reduce costs.",
+    "Maintain": "Utilization within optimal range ({:.1f}%). Current configuration is appropriate."
+}
 
 class ActionEngine:
     def __init__(self):
@@ -19,17 +28,17 @@ class ActionEngine:
         avg_utilization = (predicted_cpu + predicted_memory) / 2
         
         if avg_utilization > effective_up_threshold:
-            new_instances = min(current_instances + 1, 10)  # Cap at 10 instances
+            new_instances = min(current_instances + 1, MAX_INSTANCES)
             action = "Scale Up"
-            reason = f"High utilization predicted ({avg_utilization:.1f}%). Scaling up to handle increased load."
+            reason = REASON_TEMPLATES[action].format(avg_utilization)
         elif avg_utilization < effective_down_threshold and current_instances > 1:
             new_instances = max(1, current_instances - 1)
             action = "Scale Down"
-            reason = f"Low utilization predicted ({avg_utilization:.1f}%). Scaling down to reduce costs."
+            reason = REASON_TEMPLATES[action].format(avg_utilization)
         else:
             new_instances = current_instances
             action = "Maintain"
-            reason = f"Utilization within optimal range ({avg_utilization:.1f}%). Current configuration is appropriate."
+            reason = REASON_TEMPLATES[action].format(avg_utilization)
         
         cost_impact = self.cost_calculator.calculate_scaling_cost_impact(
             current_instances, new_instances, avg_utilization
@@ -45,5 +54,72 @@ class ActionEngine:
             "cost_impact": cost_impact,
             "urgency": "high" if abs(avg_utilization - 65) > 20 else "medium" if abs(avg_utilization - 65) > 10 else "low"
         }
+    
+    def get_trajectory_action(self, cpu_forecast: List[float], memory_forecast: List[float],
+                              current_instances: int = 1, confidence: float = 0.7) -> Dict:
+        """Recommend an action from a multi-step forecast, sized for its peak step"""
+        # Scaling down ahead of a forecast spike is worse than holding capacity a little longer
+        step_utilization = [(cpu + memory) / 2 for cpu, memory in zip(cpu_forecast, memory_forecast)]
+        peak_step = max(range(len(step_utilization)), key=step_utilization.__getitem__)
+        
+        action = self.get_action(cpu_forecast[peak_step], memory_forecast[peak_step], current_instances, confidence)
+        action["peak_step"] = peak_step + 1
+        return action
+    
+    def get_actions(self, predicted_cpu, predicted_memory, current_instances=1, confidence=0.7,
+                    with_reasons: bool = False) -> Dict:
+        """Vectorized get_action over arrays of resources
 
-
+        Returns the same fields as get_action, each as an array (cost_impact is a dict of
+        arrays). Reason strings are only built when with_reasons is set, as they cost a
+        Python-level format per resource.
+        """
+        predicted_cpu = np.asarray(predicted_cpu, dtype=np.float64)
+        predicted_memory = np.asarray(predicted_memory, dtype=np.float64)
+        current_instances = np.broadcast_to(np.asarray(current_instances, dtype=np.int64), predicted_cpu.shape)
+        confidence = np.broadcast_to(np.asarray(confidence, dtype=np.float64), predicted_cpu.shape)
+        
+        # Same decision rules as get_action, evaluated for every resource at once
+        effective_up_threshold = self.scale_up_threshold + (1 - confidence) * 10
+        effective_down_threshold = self.scale_down_threshold - (1 - confidence) * 10
+        avg_utilization = (predicted_cpu + predicted_memory) / 2
+        
+        scale_up = avg_utilization > effective_up_threshold
+        scale_down = ~scale_up & (avg_utilization < effective_down_threshold) & (current_instances > 1)
+        new_instances = np.where(
+            scale_up, np.minimum(current_instances + 1, MAX_INSTANCES),
+            np.where(scale_down, np.maximum(1, current_instances - 1), current_instances)
+        )
+        action = np.where(scale_up, "Scale Up", np.where(scale_down, "Scale Down", "Maintain"))
+        
+        distance = np.abs(avg_utilization - 65)
+        urgency = np.where(distance > 20, "high", np.where(distance > 10, "medium", "low"))
+        
+        cost_impact = self.cost_calculator.calculate_scaling_cost_impact_batch(
+            current_instances, new_instances, avg_utilization
+        )
+        
+        actions = {
+            "action": action,
+            "current_instances": current_instances,
+            "recommended_instances": new_instances,
+            "predicted_utilization": round_like_python(avg_utilization, 2),
+            "confidence": round_like_python(confidence, 2),
+            "cost_impact": cost_impact,
+            "urgency": urgency
+        }
+        if with_reasons:
+            actions["reason"] = np.array([
+                REASON_TEMPLATES[name].format(value) for name, value in zip(action.tolist(), avg_utilization.tolist())
+            ])
+        return actions
+    
+    @staticmethod
+    def action_at(actions: Dict, i: int) -> Dict:
+        """Resource i of a get_actions(..., with_reasons=True) result, shaped like get_action's"""
+        row = {name: actions[name][i].item() for name in (
+            "action", "current_instances", "recommended_instances", "reason", "predicted_utilization", "confidence"
+        )}
+        row["cost_impact"] = {name: values[i].item() for name, values in actions["cost_impact"].items()}
+        row["urgency"] = actions["urgency"][i].item()
+        return row
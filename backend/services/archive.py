@@ -0,0 +1,252 @@
+"""Columnar Parquet archive of the metrics table, partitioned by day.
+
+Layout: <archive_dir>/metrics/date=YYYY-MM-DD/part-<first id>.parquet (zstd-compressed).
+Export streams the table in keyset-paginated chunks straight into per-day Parquet
+writers, so memory stays bounded by one chunk; the reader memory-maps the files back
+into NumPy arrays for retraining and backtests.
+
+A day can end up with overlapping part files, e.g. an export that starts mid-day, or a
+compaction archive followed by an export of the same range. Readers therefore read a
+day's parts together and keep one row per id, in id order.
+
+pyarrow is optional and only imported when the archive is used. From the backend directory:
+    python -m services.archive export [--start 2024-01-01] [--end 2024-04-01] [--out DIR]
+    python -m services.archive info [--out DIR]
+"""
+import argparse
+import glob
+import os
+import time
+from datetime import datetime, date
+import numpy as np
+from sqlalchemy import select, type_coerce, String
+from config import settings
+from database import MetricRecord
+
+COLUMNS = ["id", "resource_id", "timestamp", "cpu_utilization", "memory_utilization", "network_io", "cost", "instance_count"]
+TABLE_DIR = "metrics"
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The metrics archive needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("resource_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("cpu_utilization", pa.float64()),
+        ("memory_utilization", pa.float64()),
+        ("network_io", pa.float64()),
+        ("cost", pa.float64()),
+        ("instance_count", pa.int32()),
+    ])
+
+# NumPy record layout of a fetched row; converting whole chunks at once is ~3x faster than per-column lists
+_ROW_DTYPE = np.dtype([
+    ("id", np.int64), ("resource_id", object), ("timestamp", object), ("cpu_utilization", np.float64),
+    ("memory_utilization", np.float64), ("network_io", np.float64), ("cost", np.float64), ("instance_count", np.int32),
+])
+
+def _to_table(pa, rows):
+    """Row tuples in COLUMNS order -> Arrow table, converting whole columns at once"""
+    records = np.array(rows, dtype=_ROW_DTYPE)
+    schema = _schema(pa)
+    arrays = []
+    for field in schema:
+        array = pa.array(records[field.name])
+        # SQLite hands back timestamps as ISO strings; Arrow parses the whole column in C
+        arrays.append(array if array.type == field.type else array.cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def _partition_dir(archive_dir, day):
+    return os.path.join(archive_dir, TABLE_DIR, f"date={day}")
+
+def _split_by_day(pa, table):
+    """Yield (day, table slice) per calendar day of the timestamp column"""
+    days = table.column("timestamp").to_numpy().astype("datetime64[D]")
+    for day in np.unique(days):
+        mask = days == day
+        yield str(day), table if mask.all() else table.filter(pa.array(mask))
+
+class _DayWriters:
+    """One Parquet writer per day partition, written to a temp name and renamed on close"""
+    def __init__(self, pa, archive_dir, compression="zstd"):
+        self.pa = pa
+        self.archive_dir = archive_dir
+        self.compression = compression
+        self._writers = {}
+
+    def write(self, table):
+        for day, part in _split_by_day(self.pa, table):
+            entry = self._writers.get(day)
+            if entry is None:
+                directory = _partition_dir(self.archive_dir, day)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"part-{part.column('id')[0].as_py():012d}.parquet")
+                writer = self.pa.parquet.ParquetWriter(path + ".tmp", part.schema, compression=self.compression)
+                entry = self._writers[day] = (writer, path)
+            entry[0].write_table(part)
+
+    def close(self):
+        paths = []
+        for writer, path in self._writers.values():
+            writer.close()
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+        self._writers = {}
+        return paths
+
+def write_metric_rows(rows, archive_dir=None):
+    """Archive metrics-table Rows, one file per day; returns the paths written
+
+    Files are named after their first row id, so retrying the same batch overwrites
+    instead of duplicating it.
+    """
+    pa = _require_pyarrow()
+    writers = _DayWriters(pa, archive_dir or settings.archive_dir)
+    writers.write(_to_table(pa, [tuple(row._mapping[name] for name in COLUMNS) for row in rows]))
+    return writers.close()
+
+def export_metrics(archive_dir=None, start=None, end=None, chunk_size=None):
+    """Stream the metrics table into the day-partitioned archive; returns (rows, files)"""
+    from database import engine
+    pa = _require_pyarrow()
+    archive_dir = archive_dir or settings.archive_dir
+    chunk_size = chunk_size or settings.history_chunk_size
+    table = MetricRecord.__table__
+    # Skip per-value datetime parsing; _to_table converts the column in one pass
+    columns = [type_coerce(table.c[name], String) if name == "timestamp" else table.c[name] for name in COLUMNS]
+
+    writers = _DayWriters(pa, archive_dir)
+    exported = 0
+    last_id = 0
+    try:
+        with engine.connect() as conn:
+            while True:
+                query = select(*columns).where(table.c.id > last_id)
+                if start is not None:
+                    query = query.where(table.c.timestamp >= start)
+                if end is not None:
+                    query = query.where(table.c.timestamp < end)
+                # Plain DBAPI tuples: no Row objects or result processors (timestamps stay strings)
+                rows = conn.execute(query.order_by(table.c.id).limit(chunk_size)).cursor.fetchall()
+                if not rows:
+                    break
+                writers.write(_to_table(pa, rows))
+                last_id = rows[-1][0]
+                exported += len(rows)
+    finally:
+        paths = writers.close()
+    return exported, paths
+
+def _archive_days(archive_dir=None, start=None, end=None):
+    """Part files per day partition overlapping [start, end), as lists in day and id order"""
+    archive_dir = archive_dir or settings.archive_dir
+    start_day = start.date() if isinstance(start, datetime) else start
+    end_day = end.date() if isinstance(end, datetime) else end
+    days = []
+    for directory in sorted(glob.glob(os.path.join(archive_dir, TABLE_DIR, "date=*"))):
+        day = date.fromisoformat(os.path.basename(directory)[len("date="):])
+        if (start_day is None or day >= start_day) and (end_day is None or day <= end_day):
+            paths = sorted(glob.glob(os.path.join(directory, "part-*.parquet")))
+            if paths:
+                days.append(paths)
+    return days
+
+def archive_files(archive_dir=None, start=None, end=None):
+    """Archive files whose day partition overlaps [start, end), in day and id order"""
+    return [path for paths in _archive_days(archive_dir, start, end) for path in paths]
+
+def _read_file(pa, path, columns, start, end, resource_id):
+    needed = list(dict.fromkeys([*columns, *(["timestamp"] if start or end else []), *(["resource_id"] if resource_id else [])]))
+    # memory_map: pages come straight from the OS page cache instead of being read into buffers
+    table = pa.parquet.read_table(path, columns=needed, memory_map=True)
+    pc = pa.compute
+    mask = None
+    for condition in (
+        pc.greater_equal(table["timestamp"], pa.scalar(start, pa.timestamp("us"))) if start else None,
+        pc.less(table["timestamp"], pa.scalar(end, pa.timestamp("us"))) if end else None,
+        pc.equal(table["resource_id"], resource_id) if resource_id else None,
+    ):
+        if condition is not None:
+            mask = condition if mask is None else pc.and_(mask, condition)
+    if mask is not None:
+        table = table.filter(mask)
+    return table.select(columns)
+
+def _read_day(pa, paths, columns, start, end, resource_id):
+    """One day partition's rows; overlapping part files are merged to one row per id, in id order"""
+    if len(paths) == 1:
+        return _read_file(pa, paths[0], columns, start, end, resource_id)
+    with_id = list(dict.fromkeys(["id", *columns]))
+    table = pa.concat_tables([_read_file(pa, path, with_id, start, end, resource_id) for path in paths])
+    _, first = np.unique(table.column("id").to_numpy(), return_index=True)
+    return table.take(pa.array(first)).select(columns)
+
+def iter_archive_chunks(column="cpu_utilization", archive_dir=None, start=None, end=None, resource_id=None):
+    """Yield one column as float32 arrays, day by day"""
+    pa = _require_pyarrow()
+    for paths in _archive_days(archive_dir, start, end):
+        table = _read_day(pa, paths, [column], start, end, resource_id)
+        if table.num_rows:
+            yield table.column(column).to_numpy().astype(np.float32, copy=False)
+
+def iter_archive_series(column="cpu_utilization", archive_dir=None, start=None, end=None):
+    """Yield (resource_id, float32 array) per resource per day, in archive order
+
+    Feeds model.history.iter_training_windows, which stitches each resource's chunks
+    back together across days.
+    """
+    pa = _require_pyarrow()
+    for paths in _archive_days(archive_dir, start, end):
+        table = _read_day(pa, paths, ["resource_id", column], start, end, None)
+        if not table.num_rows:
+            continue
+        resource_ids = table.column("resource_id").to_numpy(zero_copy_only=False)
+        values = table.column(column).to_numpy().astype(np.float32, copy=False)
+        keys, inverse = np.unique(resource_ids, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")  # Group by resource, keep each one's row order
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for i, resource_id in enumerate(keys):
+            yield resource_id, values[order[bounds[i]:bounds[i + 1]]]
+
+def read_archive(columns=("timestamp", "cpu_utilization", "memory_utilization"), archive_dir=None,
+                 start=None, end=None, resource_id=None):
+    """Load archived columns as NumPy arrays (timestamps as datetime64[us], strings as objects)"""
+    pa = _require_pyarrow()
+    columns = list(columns)
+    tables = [_read_day(pa, paths, columns, start, end, resource_id) for paths in _archive_days(archive_dir, start, end)]
+    if not tables:
+        schema = _schema(pa)
+        return {name: pa.array([], type=schema.field(name).type).to_numpy(zero_copy_only=False) for name in columns}
+    table = pa.concat_tables(tables)
+    return {name: table.column(name).to_numpy() for name in columns}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the metrics table to a day-partitioned Parquet archive")
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("--out", help="Archive directory (default: settings.archive_dir)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Only rows at or after this time")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Only rows before this time")
+    parser.add_argument("--chunk-size", type=int, help="Rows read per query")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        started = time.perf_counter()
+        rows, paths = export_metrics(args.out, args.start, args.end, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {rows} rows to {len(paths)} files in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    else:
+        paths = archive_files(args.out)
+        size = sum(os.path.getsize(path) for path in paths)
+        rows = sum(_require_pyarrow().parquet.ParquetFile(path).metadata.num_rows for path in paths)
+        print(f"{len(paths)} files, {rows} rows, {size / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
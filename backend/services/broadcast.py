@@ -0,0 +1,365 @@
+"""Fan-out hub behind the /ws real-time stream.
+
+A single producer task collects one update per resource per tick: resources with a
+new sample in the ring buffers (services.recent) since the last tick. Until real
+samples arrive for the default resource, it falls back to the simulator, advanced
+once per tick. Each update is encoded once per wire format in use
+(services.stream_encoding), and clients with the same subscription share the frame
+built from those records.
+
+Clients pick a format with ?encoding=json|binary|msgpack. json keeps the original
+one-object-per-message stream, or sends one array per tick with batch=1. The compact
+formats batch every tick into one frame. Unless delta=0, they send each resource's
+change since its previous update, with a keyframe of full values on connect and
+every ws_keyframe_interval ticks.
+
+Each client has a bounded queue that drops its oldest frames when the client can't
+keep up, so a slow socket never holds back the producer or other clients. A delta
+stream can't skip a frame, so on overflow it discards its whole queue and resyncs
+from a keyframe. By default a client follows the default resource. It can pass
+?resources=a,b (or *) and change the set later with {"subscribe": [...]},
+{"unsubscribe": [...]} or {"resources": [...]} messages.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from fastapi import WebSocket, WebSocketDisconnect
+from config import settings
+from services import telemetry
+from services.cost_calculator import CostCalculator
+from services.recent import recent_metrics, CPU, MEMORY, NETWORK, INSTANCES
+from services.stream_encoding import get_encoding, quantize
+from utils.simulate_data import simulator
+
+ALL_RESOURCES = "*"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+cost_calculator = CostCalculator()
+
+def parse_resources(value):
+    """Subscription from a query string or message: None means every resource"""
+    if value is None:
+        return {settings.default_resource_id}
+    if isinstance(value, str):
+        value = [part.strip() for part in value.split(",") if part.strip()]
+    value = set(value)
+    return None if ALL_RESOURCES in value else value
+
+def _select(resources, records):
+    """Records (in a {resource_id: record} dict) for the resources a subscriber follows"""
+    if resources is None:
+        return list(records.values())
+    if len(resources) <= len(records):
+        return [records[r] for r in resources if r in records]
+    return [record for resource_id, record in records.items() if resource_id in resources]
+
+class Subscriber:
+    """One connected client: its resource filter, wire format and bounded, drop-oldest send queue"""
+    __slots__ = ("resources", "key", "encoding", "batch", "delta", "queue", "ready", "dropped", "resync")
+
+    def __init__(self, resources, queue_size, encoding, batch=False, delta=False):
+        self.set_resources(resources)
+        self.encoding = encoding
+        self.batch = batch or encoding.binary  # Compact formats always send one frame per tick
+        self.delta = delta and encoding.binary
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.resync = False  # Delta stream lost frames: send a keyframe next tick
+
+    def set_resources(self, resources):
+        self.resources = resources  # Set of resource ids, or None for every resource
+        self.key = None if resources is None else frozenset(resources)  # Subscribers with equal keys share frames
+
+    def push(self, message):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1  # deque(maxlen) discards the oldest entry on append
+        self.queue.append(message)
+        self.ready.set()
+
+    def reset(self):
+        """Discard every queued frame, since later deltas build on the oldest, and ask for a keyframe"""
+        self.dropped += len(self.queue)
+        self.queue.clear()
+        self.resync = True
+
+class BroadcastHub:
+    """Single producer, per-client queues; one encoding per update and format however many clients"""
+    def __init__(self, interval=None, queue_size=None, keyframe_interval=None):
+        self.interval = interval or settings.ws_interval
+        self.queue_size = queue_size or settings.ws_queue_size
+        self.keyframe_interval = keyframe_interval or settings.ws_keyframe_interval
+        self._subscribers = set()
+        self._latest = {}  # resource_id -> latest quantized sample, replayed to new subscribers
+        self._numbers = {}  # resource_id -> stable number that compact records refer to
+        self._full_records = {}  # encoding name -> {resource_id: (sample, full record)}
+        self._versions = {}  # resource_id -> ring-buffer version of the latest sample
+        self.ticks = 0
+        self.frames_serialized = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.last_tick_seconds = None
+        self._dropped_by_closed = 0
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def subscribe(self, resources, encoding="json", batch=False, delta=True):
+        """Add a client; raises ValueError/RuntimeError for an unknown or unavailable encoding"""
+        subscriber = Subscriber(resources, self.queue_size, get_encoding(encoding), batch, delta)
+        self._subscribers.add(subscriber)
+        self._replay(subscriber, resources, keyframe=True)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.discard(subscriber)
+            self._dropped_by_closed += subscriber.dropped
+
+    def update(self, subscriber, resources, mode="subscribe"):
+        """Change a subscription (mode: subscribe, unsubscribe or replace)
+
+        Newly added resources get their latest value right away, in full.
+        """
+        current = subscriber.resources
+        if mode == "replace":
+            new = resources
+        elif mode == "subscribe":
+            new = None if current is None or resources is None else current | resources
+        elif resources is None:
+            new = set()
+        elif current is None:
+            return  # Can't subtract from "everything"; clients send an explicit list instead
+        else:
+            new = current - resources
+        subscriber.set_resources(new)
+        if current is not None:
+            self._replay(subscriber, None if new is None else new - current)
+
+    def _number(self, resource_id):
+        number = self._numbers.get(resource_id)
+        if number is None:
+            number = self._numbers[resource_id] = len(self._numbers)
+        return number
+
+    def _full_record(self, encoding, resource_id):
+        """Full record of a resource's latest sample, encoded at most once per sample"""
+        cache = self._full_records.setdefault(encoding.name, {})
+        sample = self._latest[resource_id]
+        entry = cache.get(resource_id)
+        if entry is None or entry[0] is not sample:
+            entry = cache[resource_id] = (sample, encoding.full(self._number(resource_id), resource_id, sample))
+            self.frames_serialized += 1
+        return entry[1]
+
+    def _replay(self, subscriber, resources, keyframe=False):
+        latest = self._latest
+        keys = latest.keys() if resources is None else [r for r in resources if r in latest]
+        records = [self._full_record(subscriber.encoding, resource_id) for resource_id in list(keys)]
+        if not subscriber.batch:
+            for record in records:
+                subscriber.push(record)
+        elif records:
+            subscriber.push(subscriber.encoding.frame(records, keyframe))
+
+    def collect(self):
+        """This tick's updates: resources with new samples, plus the simulated default
+
+        Returns {resource_id: (previous sample or None, sample)}.
+        """
+        samples = {}
+        for resource_id, version, micros, values in recent_metrics.changed_since(self._versions):
+            self._versions[resource_id] = version
+            cpu, memory, instances = values[CPU], values[MEMORY], int(values[INSTANCES])
+            samples[resource_id] = quantize(
+                micros, cpu, memory, values[NETWORK], cost_calculator.calculate_current_cost(cpu, memory, instances)
+            )
+        default = settings.default_resource_id
+        if default not in recent_metrics:
+            # Demo mode: nothing ingested for the default resource, so simulate it
+            metrics = simulator.get_current_metrics()
+            micros = (datetime.utcnow() - _EPOCH) // _MICROSECOND
+            samples[default] = quantize(
+                micros, metrics["cpu"], metrics["memory"], metrics["network"],
+                cost_calculator.calculate_current_cost(metrics["cpu"], metrics["memory"], 1)
+            )
+        updates = {resource_id: (self._latest.get(resource_id), sample) for resource_id, sample in samples.items()}
+        self._latest.update(samples)
+        return updates
+
+    def _records(self, encoding, updates, delta):
+        """{resource_id: record} for this tick: deltas where possible if delta, else full values"""
+        records = {}
+        for resource_id, (previous, sample) in updates.items():
+            record = None
+            if delta and previous is not None:
+                record = encoding.delta(self._number(resource_id), previous, sample)
+                self.frames_serialized += record is not None
+            records[resource_id] = record if record is not None else self._full_record(encoding, resource_id)
+        return records
+
+    def publish(self, updates, keyframe=False):
+        """Queue this tick's frames to every subscriber whose filter matches
+
+        keyframe: send delta subscribers full values for everything they follow.
+        """
+        records = {}  # (encoding, delta) -> {resource_id: record}
+        frames = {}  # (encoding, kind, subscription) -> frame shared by identical subscribers
+        for subscriber in self._subscribers:
+            encoding = subscriber.encoding
+            if subscriber.delta:
+                if len(subscriber.queue) == subscriber.queue.maxlen:
+                    subscriber.reset()
+                if keyframe or subscriber.resync:
+                    subscriber.resync = False
+                    memo = (encoding.name, "key", subscriber.key)
+                    frame = frames.get(memo)
+                    if frame is None:
+                        resources = self._latest.keys() if subscriber.resources is None else subscriber.resources
+                        frame = frames[memo] = encoding.frame(
+                            [self._full_record(encoding, r) for r in resources if r in self._latest], True
+                        )
+                    subscriber.push(frame)
+                    continue
+            if not updates:
+                continue
+            kind = (encoding.name, subscriber.delta)
+            tick_records = records.get(kind)
+            if tick_records is None:
+                tick_records = records[kind] = self._records(encoding, updates, subscriber.delta)
+            if not subscriber.batch:
+                for record in _select(subscriber.resources, tick_records):
+                    subscriber.push(record)
+                continue
+            memo = (*kind, subscriber.key)
+            frame = frames.get(memo)
+            if frame is None:
+                selected = _select(subscriber.resources, tick_records)
+                frame = frames[memo] = encoding.frame(selected) if selected else None
+            if frame is not None:
+                subscriber.push(frame)
+        self.frames_serialized += sum(frame is not None for frame in frames.values())
+
+    async def run(self):
+        """Producer task: one collect + publish per interval while anyone is listening"""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                continue
+            started = time.perf_counter()
+            try:
+                self.publish(self.collect(), keyframe=(self.ticks + 1) % self.keyframe_interval == 0)
+            except Exception as e:
+                print(f"Error broadcasting metrics: {e}")
+            self.ticks += 1
+            self.last_tick_seconds = time.perf_counter() - started
+
+    async def _send_loop(self, websocket, subscriber):
+        queue = subscriber.queue
+        send = websocket.send_bytes if subscriber.encoding.binary else websocket.send_text
+        while True:
+            await subscriber.ready.wait()
+            subscriber.ready.clear()
+            while queue:
+                message = queue.popleft()
+                await send(message)
+                self.messages_sent += 1
+                self.bytes_sent += len(message)
+
+    async def _receive_loop(self, websocket, subscriber):
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except (ValueError, KeyError):
+                continue  # Not a JSON text frame
+            if not isinstance(message, dict):
+                continue
+            for mode, key in (("replace", "resources"), ("subscribe", "subscribe"), ("unsubscribe", "unsubscribe")):
+                if key in message:
+                    self.update(subscriber, parse_resources(message[key] or []), mode)
+
+    async def serve(self, websocket: WebSocket, resources=None, encoding="json", batch=False, delta=True):
+        """Run one client connection until it disconnects or a send fails"""
+        await websocket.accept()
+        try:
+            subscriber = self.subscribe(parse_resources(resources), encoding, batch, delta)
+        except (ValueError, RuntimeError) as e:
+            await websocket.close(code=1003, reason=str(e))
+            return
+        tasks = [
+            asyncio.create_task(self._send_loop(websocket, subscriber)),
+            asyncio.create_task(self._receive_loop(websocket, subscriber)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None and not isinstance(error, WebSocketDisconnect):
+                    print(f"WebSocket error: {error}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.unsubscribe(subscriber)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        encodings = {}
+        for subscriber in self._subscribers:
+            name = subscriber.encoding.name + ("+delta" if subscriber.delta else "+batch" if subscriber.batch else "")
+            encodings[name] = encodings.get(name, 0) + 1
+        return {
+            "subscribers": len(self._subscribers),
+            "encodings": encodings,
+            "resources": len(self._latest),
+            "interval_seconds": self.interval,
+            "queue_size": self.queue_size,
+            "keyframe_interval": self.keyframe_interval,
+            "ticks": self.ticks,
+            "frames_serialized": self.frames_serialized,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "messages_dropped": self._dropped_by_closed + sum(s.dropped for s in self._subscribers),
+            "last_tick_seconds": round(self.last_tick_seconds, 6) if self.last_tick_seconds is not None else None,
+        }
+
+    def metric_families(self):
+        """Prometheus gauges and counters for the stream, read at scrape time"""
+        stats = self.stats()
+        subscribers = telemetry.Family("optimizer_ws_subscribers", "gauge", "Connected /ws clients by wire format")
+        for name, count in sorted(stats["encodings"].items()):
+            subscribers.add(count, format=name)
+        depths = [len(subscriber.queue) for subscriber in self._subscribers]
+        families = [
+            subscribers,
+            telemetry.Family("optimizer_ws_queued_frames", "gauge", "Frames waiting in client send queues")
+            .add(sum(depths)),
+            telemetry.Family("optimizer_ws_queue_depth_max", "gauge", "Deepest client send queue")
+            .add(max(depths, default=0)),
+            telemetry.Family("optimizer_ws_queue_capacity", "gauge", "Frames a client queue holds before dropping")
+            .add(self.queue_size),
+            telemetry.Family("optimizer_ws_ticks_total", "counter", "Broadcast ticks").add(self.ticks),
+            telemetry.Family("optimizer_ws_frames_serialized_total", "counter", "Frames encoded by the producer")
+            .add(self.frames_serialized),
+            telemetry.Family("optimizer_ws_messages_sent_total", "counter", "Messages written to clients")
+            .add(self.messages_sent),
+            telemetry.Family("optimizer_ws_bytes_sent_total", "counter", "Payload bytes written to clients")
+            .add(self.bytes_sent),
+            telemetry.Family("optimizer_ws_messages_dropped_total", "counter", "Frames dropped from full client queues")
+            .add(stats["messages_dropped"]),
+        ]
+        if self.last_tick_seconds is not None:
+            families.append(telemetry.Family("optimizer_ws_last_tick_seconds", "gauge", "Producer time of the last tick")
+                            .add(self.last_tick_seconds))
+        return families
+
+# Global hub: the producer runs from main.py's lifespan, /ws connections subscribe to it
+broadcast_hub = BroadcastHub()
+telemetry.registry.register_collector(broadcast_hub.metric_families)
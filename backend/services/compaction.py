@@ -0,0 +1,203 @@
+"""Retention and compaction for the metrics, rollup, predictions and action_history tables.
+
+Expired rows are deleted in bounded batches, each in its own short transaction, so
+ingestion and request handlers are never locked out for long. With compaction_archive
+set, expired raw metrics are written to the Parquet archive (services.archive) first.
+On SQLite each cycle ends with an incremental vacuum that returns freed pages to the
+filesystem.
+
+Run one cycle by hand, from the backend directory:
+    python -m services.compaction            # prune + incremental vacuum
+    python -m services.compaction --vacuum   # also convert an existing DB to incremental auto-vacuum
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from config import settings
+from database import AsyncSessionLocal, async_engine, MetricRecord, MetricRollup, PredictionRecord, ActionHistory
+
+# Breather between delete batches so queued writers get the lock
+_BATCH_PAUSE = 0.05
+
+def _rollup_covered(metrics):
+    """Raw rows at or after their own resource's oldest 1d rollup bucket
+
+    Older raw rows have no aggregated copy (e.g. data recorded before rollups existed and
+    never backfilled), so they are kept until the rollups are rebuilt. A resource without
+    rollups compares against NULL, which keeps all of its rows.
+    """
+    oldest_bucket = select(func.min(MetricRollup.bucket_start)).where(
+        MetricRollup.resolution == "1d", MetricRollup.resource_id == metrics.c.resource_id
+    ).scalar_subquery()
+    return metrics.c.timestamp >= oldest_bucket
+
+def retention_policies():
+    """(name, table, time column, extra filter, retention days) for every pruned table"""
+    rollups = MetricRollup.__table__
+    return [
+        ("metrics", MetricRecord.__table__, MetricRecord.__table__.c.timestamp, _rollup_covered(MetricRecord.__table__),
+         settings.metrics_retention_days),
+        ("metric_rollups_1m", rollups, rollups.c.bucket_start, rollups.c.resolution == "1m",
+         settings.rollup_1m_retention_days),
+        ("predictions", PredictionRecord.__table__, PredictionRecord.__table__.c.timestamp, None,
+         settings.predictions_retention_days),
+        ("action_history", ActionHistory.__table__, ActionHistory.__table__.c.timestamp, None,
+         settings.action_history_retention_days),
+    ]
+
+async def _sqlite_pragma(conn, name):
+    return (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+
+class Compactor:
+    """Background retention job; keeps a report of the last cycle and running totals"""
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or settings.compaction_batch_size
+        self.interval = interval or settings.compaction_interval
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.total_rows_pruned = 0
+        self.total_bytes_reclaimed = 0
+        self.last_report = None
+
+    @property
+    def is_sqlite(self):
+        return async_engine.dialect.name == "sqlite"
+
+    async def prune(self, table, time_column, cutoff, extra_filter=None, archive=None):
+        """Delete rows older than cutoff, batch_size rows per transaction
+
+        archive: optional callable given each batch of full rows before they are deleted
+        """
+        pruned = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                if archive is None:
+                    expired = select(table.c.id).where(time_column < cutoff)
+                    if extra_filter is not None:
+                        expired = expired.where(extra_filter)
+                    result = await db.execute(
+                        delete(table).where(table.c.id.in_(expired.limit(self.batch_size).scalar_subquery()))
+                    )
+                    deleted = result.rowcount
+                else:
+                    expired = select(table).where(time_column < cutoff)
+                    if extra_filter is not None:
+                        expired = expired.where(extra_filter)
+                    rows = (await db.execute(expired.order_by(table.c.id).limit(self.batch_size))).all()
+                    if rows:
+                        # Written (atomically) before the delete commits, so a failure never loses rows
+                        await asyncio.to_thread(archive, rows)
+                        await db.execute(delete(table).where(table.c.id.in_([row.id for row in rows])))
+                    deleted = len(rows)
+                await db.commit()
+            pruned += deleted
+            if deleted < self.batch_size:
+                return pruned
+            await asyncio.sleep(_BATCH_PAUSE)
+
+    async def database_size(self):
+        """Bytes in use by the database file (SQLite only)"""
+        if not self.is_sqlite:
+            return None
+        async with async_engine.connect() as conn:
+            return await _sqlite_pragma(conn, "page_count") * await _sqlite_pragma(conn, "page_size")
+
+    async def incremental_vacuum(self):
+        """Release free pages in compaction_vacuum_pages steps; a no-op unless auto_vacuum=INCREMENTAL"""
+        if not self.is_sqlite:
+            return
+        async with async_engine.connect() as conn:
+            if await _sqlite_pragma(conn, "auto_vacuum") != 2:
+                if await _sqlite_pragma(conn, "freelist_count"):
+                    print("Database was created without incremental auto-vacuum; free pages are reused but "
+                          "the file won't shrink until `python -m services.compaction --vacuum` is run")
+                return
+            raw = await conn.get_raw_connection()
+            while await _sqlite_pragma(conn, "freelist_count"):
+                # The pragma frees one page per sqlite3_step and execute() steps once;
+                # executescript runs it to completion
+                await raw.driver_connection.executescript(
+                    f"PRAGMA incremental_vacuum({int(settings.compaction_vacuum_pages)});"
+                )
+                await asyncio.sleep(_BATCH_PAUSE)
+
+    async def compact(self):
+        """One cycle: prune every table past its retention, then vacuum"""
+        async with self._lock:
+            started = time.perf_counter()
+            size_before = await self.database_size()
+            now = datetime.utcnow()
+
+            rows_pruned = {}
+            for name, table, time_column, extra_filter, days in retention_policies():
+                if days and days > 0:
+                    cutoff = now - timedelta(days=days)
+                    archive = None
+                    if name == "metrics" and settings.compaction_archive:
+                        from services.archive import write_metric_rows
+                        archive = write_metric_rows
+                    rows_pruned[name] = await self.prune(table, time_column, cutoff, extra_filter, archive)
+            await self.incremental_vacuum()
+
+            size_after = await self.database_size()
+            bytes_reclaimed = max(size_before - size_after, 0) if size_before is not None else None
+            self.runs += 1
+            self.total_rows_pruned += sum(rows_pruned.values())
+            self.total_bytes_reclaimed += bytes_reclaimed or 0
+            self.last_report = {
+                "timestamp": now.isoformat(),
+                "duration_seconds": round(time.perf_counter() - started, 3),
+                "rows_pruned": rows_pruned,
+                "bytes_reclaimed": bytes_reclaimed,
+                "database_size_bytes": size_after,
+            }
+            print(f"Compaction pruned {sum(rows_pruned.values())} rows {rows_pruned}, reclaimed {bytes_reclaimed or 0} bytes")
+            return self.last_report
+
+    def report(self):
+        return {
+            "runs": self.runs,
+            "total_rows_pruned": self.total_rows_pruned,
+            "total_bytes_reclaimed": self.total_bytes_reclaimed,
+            "last_run": self.last_report,
+        }
+
+    async def run(self):
+        """Background task: compact every compaction_interval seconds"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                print(f"Error during compaction: {e}")
+
+async def enable_incremental_vacuum():
+    """Switch an existing SQLite DB to auto_vacuum=INCREMENTAL; the full VACUUM rewrites the file once"""
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        await conn.commit()
+        await conn.exec_driver_sql("VACUUM")
+
+# Global compactor shared by the lifespan task and the admin endpoints
+compactor = Compactor()
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune expired rows and reclaim space")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Convert the SQLite DB to incremental auto-vacuum with a one-off full VACUUM")
+    args = parser.parse_args()
+
+    from database import init_db
+    init_db()
+
+    async def run():
+        if args.vacuum and compactor.is_sqlite:
+            await enable_incremental_vacuum()
+        print(await compactor.compact())
+        await async_engine.dispose()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
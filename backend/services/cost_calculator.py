@@ -1,6 +1,18 @@
+import numpy as np
 from config import settings
 from typing import Dict
 
+def round_like_python(values, ndigits):
+    """np.round, with near-tie elements re-rounded by round() so batch results match the scalar code exactly"""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, ndigits)
+    # np.round scales by 10**ndigits first, which can flip values sitting on a .5 boundary
+    scaled = values * 10.0 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, ndigits) for value in values[near_tie].tolist()]
+    return rounded
+
 class CostCalculator:
     def __init__(self):
         self.instance_cost_per_hour = settings.instance_cost_per_hour
@@ -37,6 +49,34 @@ class CostCalculator:
             "savings_percentage": round((potential_savings / current_cost * 100) if current_cost > 0 else 0, 2)
         }
     
+    def calculate_scaling_cost_impact_batch(self, current_instances, new_instances, avg_utilization) -> Dict[str, np.ndarray]:
+        """Vectorized calculate_scaling_cost_impact; returns each field as an array"""
+        current_instances = np.asarray(current_instances, dtype=np.int64)
+        new_instances = np.asarray(new_instances, dtype=np.int64)
+        avg_utilization = np.asarray(avg_utilization, dtype=np.float64)
+        
+        current_cost = self.calculate_current_cost(avg_utilization, avg_utilization, current_instances)
+        new_cost = self.calculate_current_cost(avg_utilization, avg_utilization, new_instances)
+        cost_difference = new_cost - current_cost
+        
+        # int() truncates toward zero, as in the scalar version
+        optimal_instances = np.maximum(1, np.trunc(current_instances * (avg_utilization / 70)).astype(np.int64))
+        optimal_cost = self.calculate_current_cost(avg_utilization, avg_utilization, optimal_instances)
+        potential_savings = current_cost - optimal_cost
+        
+        safe_cost = np.where(current_cost > 0, current_cost, 1)
+        savings_percentage = np.where(current_cost > 0, potential_savings / safe_cost * 100, 0)
+        
+        return {
+            "current_cost": round_like_python(current_cost, 4),
+            "new_cost": round_like_python(new_cost, 4),
+            "cost_difference": round_like_python(cost_difference, 4),
+            "optimal_instances": optimal_instances,
+            "optimal_cost": round_like_python(optimal_cost, 4),
+            "potential_savings": round_like_python(potential_savings, 4),
+            "savings_percentage": round_like_python(savings_percentage, 2)
+        }
+    
     def calculate_monthly_cost(self, hourly_cost: float) -> float:
         """Calculate monthly cost from hourly"""
         return hourly_cost * 24 * 30
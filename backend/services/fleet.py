@@ -0,0 +1,16 @@
+import numpy as np
+from services.action_engine import ActionEngine
+
+action_engine = ActionEngine()
+
+def evaluate_fleet(lstm_model, cpu_windows, memory_windows, instance_counts, with_reasons=False):
+    """Forecast and recommend actions for every resource with one model call"""
+    n_resources = len(cpu_windows)
+    predictions = lstm_model.predict_batch(np.concatenate([cpu_windows, memory_windows]))
+    predicted_cpu, predicted_memory = predictions[:n_resources], predictions[n_resources:]
+    confidence = lstm_model.get_prediction_confidence_batch(cpu_windows)
+    
+    actions = action_engine.get_actions(predicted_cpu, predicted_memory, instance_counts, confidence, with_reasons)
+    actions["predicted_cpu"] = predicted_cpu
+    actions["predicted_memory"] = predicted_memory
+    return actions
@@ -0,0 +1,88 @@
+import asyncio
+import numpy as np
+from config import settings
+from model.registry import model_registry
+from services.action_engine import ActionEngine
+from services.prediction_cache import prediction_cache
+from services.recent import recent_metrics
+from services.scheduler import forecast_scheduler
+from services.telemetry import stage
+from utils.simulate_data import simulator
+
+action_engine = ActionEngine()
+
+def _recent_window(resource_id):
+    """load_recent_window plus the ring-buffer version of the window (None when simulated)"""
+    snapshot = recent_metrics.snapshot(resource_id, settings.sequence_length)
+    current_instances = snapshot[1] if snapshot else 1
+    if snapshot is None or snapshot[0].shape[1] < settings.sequence_length:
+        # Not enough data, generate mock data
+        cpu_data = np.array(simulator.get_mock_cpu_data(settings.sequence_length), dtype=np.float64)
+        memory_data = np.array(simulator.get_mock_memory_data(settings.sequence_length), dtype=np.float64)
+        return cpu_data, memory_data, current_instances, None
+    cpu_data, memory_data = snapshot[0]
+    return cpu_data, memory_data, current_instances, snapshot[2]
+
+def load_recent_window(resource_id=None):
+    """Latest sequence_length CPU/memory samples for a resource, oldest first
+
+    Served from the in-memory ring buffers (services.recent); never queries the DB.
+    Falls back to simulated data until the resource has a full window.
+    Returns (cpu_data, memory_data, current_instances) with the data as float64 arrays.
+    """
+    return _recent_window(resource_id or settings.default_resource_id)[:3]
+
+def forecast_next(cpu_data, memory_data, model_name="lstm"):
+    """Predict CPU and memory in a single model call; returns (cpu, memory, confidence)"""
+    lstm_model = model_registry.get(model_name)
+    predicted_cpu, predicted_memory = map(float, lstm_model.predict_batch(np.stack([cpu_data, memory_data])))
+    return predicted_cpu, predicted_memory, lstm_model.get_prediction_confidence(cpu_data)
+
+async def forecast_next_async(cpu_data, memory_data, model_name="lstm"):
+    """forecast_next off the event loop, so inference (or a first model load) never blocks it"""
+    return await asyncio.to_thread(forecast_next, cpu_data, memory_data, model_name)
+
+def forecast_horizon(cpu_data, memory_data, model_name="lstm_horizon"):
+    """Direct multi-step forecast: one (2, horizon) output instead of horizon recursive calls"""
+    horizon_model = model_registry.get(model_name)
+    cpu_forecast, memory_forecast = horizon_model.predict_horizon_batch(np.stack([cpu_data, memory_data]))
+    return cpu_forecast.tolist(), memory_forecast.tolist(), horizon_model.get_prediction_confidence(cpu_data)
+
+async def predict_resource(resource_id=None, model_name="lstm"):
+    """Window, forecast and recommended action for a resource
+
+    Served from the forecast scheduler's latest snapshot when it covers the resource,
+    otherwise computed here through prediction_cache. Returns a dict with cpu_data,
+    memory_data, current_instances, predicted_cpu, predicted_memory, confidence, action
+    and scheduled. The result is shared between requests and must not be mutated.
+    Simulated windows are never cached.
+    """
+    resource_id = resource_id or settings.default_resource_id
+    if model_name == "lstm":
+        with stage("forecast", "snapshot_lookup"):
+            published = forecast_scheduler.lookup(resource_id)
+        if published is not None:
+            return published
+    with stage("forecast", "window"):
+        cpu_data, memory_data, current_instances, version = _recent_window(resource_id)
+
+    async def compute():
+        with stage("forecast", "model"):
+            predicted_cpu, predicted_memory, confidence = await forecast_next_async(cpu_data, memory_data, model_name)
+        with stage("forecast", "action"):
+            action_data = action_engine.get_action(predicted_cpu, predicted_memory, current_instances, confidence)
+        return {
+            "cpu_data": cpu_data,
+            "memory_data": memory_data,
+            "current_instances": current_instances,
+            "predicted_cpu": predicted_cpu,
+            "predicted_memory": predicted_memory,
+            "confidence": confidence,
+            "action": action_data,
+            "scheduled": False,
+        }
+
+    if version is None:
+        return await compute()
+    key = (model_name, model_registry.generation(model_name), resource_id, version)
+    return await prediction_cache.get_or_compute(key, compute)
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from config import settings
+from database import AsyncSessionLocal, MetricRecord
+from services.cost_calculator import CostCalculator
+from services.rollups import update_rollups
+from services.recent import recent_metrics
+
+cost_calculator = CostCalculator()
+
+def to_metric_rows(items):
+    """Convert MetricIngest items into insert-ready dicts with every column filled"""
+    now = datetime.utcnow()
+    rows = []
+    for item in items:
+        instance_count = item.instance_count or 1
+        rows.append({
+            "resource_id": item.resource_id or settings.default_resource_id,
+            "timestamp": item.timestamp or now,
+            "cpu_utilization": item.cpu,
+            "memory_utilization": item.memory,
+            "network_io": item.network,
+            "cost": item.cost if item.cost is not None else cost_calculator.calculate_current_cost(item.cpu, item.memory, instance_count),
+            "instance_count": instance_count
+        })
+    return rows
+
+async def write_metrics(session, rows):
+    """Bulk insert rows with a single executemany and refresh the rollups they touch
+
+    The caller owns the transaction.
+    """
+    if rows:
+        await session.execute(insert(MetricRecord), rows)
+        await update_rollups(session, rows)
+    return len(rows)
+
+async def write_metrics_batch(rows):
+    """Insert one batch in its own transaction"""
+    async with AsyncSessionLocal() as db:
+        try:
+            written = await write_metrics(db, rows)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    # Only committed rows reach the prediction windows, so a retried batch isn't counted twice
+    recent_metrics.extend(rows)
+    return written
+
+class WriteBehindBuffer:
+    """Collects ingested rows and flushes them in bulk when the buffer fills or ages out
+
+    Rows only arrive through to_metric_rows, already validated and normalized by
+    MetricIngest. A batch whose write still fails is set aside and retried on its own,
+    with backoff, so new rows never pile onto it; after max_attempts it is dropped and
+    counted in rows_dropped instead of being retried forever.
+    """
+    def __init__(self, max_rows=None, flush_interval=None, max_attempts=None):
+        self.max_rows = max_rows or settings.ingest_buffer_max_rows
+        self.flush_interval = flush_interval or settings.ingest_flush_interval
+        self.max_attempts = max_attempts or settings.ingest_flush_max_attempts
+        self._rows = []
+        self._oldest = None
+        self._failed = []  # (rows, attempts, monotonic time of the next retry) per failed batch
+        self._flush_lock = asyncio.Lock()
+        self.rows_flushed = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+    
+    @property
+    def pending(self):
+        return len(self._rows) + sum(len(rows) for rows, _, _ in self._failed)
+    
+    async def add(self, rows):
+        """Queue rows; flushes inline once max_rows are pending, which also bounds memory"""
+        if not self._rows:
+            self._oldest = time.monotonic()
+        self._rows.extend(rows)
+        if len(self._rows) >= self.max_rows:
+            await self.flush()
+    
+    def _write_failed(self, rows, attempts, error):
+        if attempts >= self.max_attempts:
+            self.rows_dropped += len(rows)
+            print(f"Dropping {len(rows)} buffered metric rows after {attempts} failed writes: {error}")
+        else:
+            print(f"Error flushing ingest buffer ({len(rows)} rows, attempt {attempts}): {error}")
+            # Back off exponentially: 2, 4, 8... flush intervals
+            self._failed.append((rows, attempts, time.monotonic() + self.flush_interval * 2 ** attempts))
+    
+    async def _write(self, rows, attempts):
+        try:
+            written = await write_metrics_batch(rows)
+        except Exception as e:
+            self._write_failed(rows, attempts + 1, e)
+            return 0
+        self.rows_flushed += written
+        self.flushes += 1
+        return written
+    
+    async def flush(self, retry_all=False):
+        """Write queued rows, plus failed batches that are due for a retry (all of them with retry_all)
+
+        Failures are logged and kept for retry rather than raised. Returns the rows written.
+        """
+        async with self._flush_lock:
+            now = time.monotonic()
+            due, waiting = [], []
+            for batch in self._failed:
+                (due if retry_all or batch[2] <= now else waiting).append(batch)
+            self._failed = waiting
+            written = 0
+            for rows, attempts, _ in due:
+                written += await self._write(rows, attempts)
+            if self._rows:
+                # Swap the buffer first so new rows keep arriving while this batch is written
+                rows, self._rows, self._oldest = self._rows, [], None
+                written += await self._write(rows, 0)
+            return written
+    
+    def _flush_due(self):
+        now = time.monotonic()
+        if self._oldest is not None and now - self._oldest >= self.flush_interval:
+            return True
+        return any(retry_at <= now for _, _, retry_at in self._failed)
+    
+    async def run(self):
+        """Background task: flush rows that have waited longer than flush_interval and retry failed batches"""
+        while True:
+            await asyncio.sleep(self.flush_interval / 2)
+            if self._flush_due():
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"Error flushing ingest buffer: {e}")
+
+# Global write-behind buffer shared by the ingestion endpoints
+ingest_buffer = WriteBehindBuffer()
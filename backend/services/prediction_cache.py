@@ -0,0 +1,107 @@
+"""Bounded LRU cache of forecast results with a TTL.
+
+Dashboards poll the same resources far more often than new samples arrive, so most
+forecasts would recompute an identical window. Entries are keyed on the model's
+load generation and the resource's ring-buffer version (services.recent). A new
+sample or a hot-swapped model therefore changes the key, and stale entries simply
+age out. Concurrent misses for the same key share a single computation.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from config import settings
+from services import telemetry
+
+class PredictionCache:
+    """LRU + TTL cache of forecast results with hit/miss/eviction counters"""
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = settings.prediction_cache_size if max_entries is None else max_entries
+        self.ttl = settings.prediction_cache_ttl if ttl is None else ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._pending = {}  # key -> task computing it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached value or None; expired entries are dropped on access"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _finish(self, key, task):
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached value for key, or await compute() once and cache its result"""
+        if not self.enabled:
+            return await compute()
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._pending[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # shield: one cancelled request must not cancel the computation other requests await
+        return await asyncio.shield(task)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+        }
+
+    def metric_families(self):
+        """Prometheus view of the counters, read at scrape time"""
+        return [
+            telemetry.Family("optimizer_prediction_cache_lookups_total", "counter", "Forecast cache lookups by result")
+            .add(self.hits, result="hit").add(self.misses, result="miss").add(self.coalesced, result="coalesced"),
+            telemetry.Family("optimizer_prediction_cache_removals_total", "counter", "Forecast cache entries dropped")
+            .add(self.evictions, reason="evicted").add(self.expirations, reason="expired"),
+            telemetry.Family("optimizer_prediction_cache_entries", "gauge", "Forecasts currently cached")
+            .add(len(self._entries)),
+        ]
+
+# Global cache shared by the prediction and dashboard endpoints
+prediction_cache = PredictionCache()
+telemetry.registry.register_collector(prediction_cache.metric_families)
@@ -0,0 +1,321 @@
+"""Opt-in sampling profiler for individual HTTP requests.
+
+ProfilerMiddleware (installed when settings.profiler_enabled) profiles a random
+profiler_sample_rate fraction of requests, plus any request that carries the
+profiler_header (X-Profile: 1 by default). Any other request skips the profiler after
+one random draw and a header scan.
+
+A single sampler thread wakes every profiler_interval seconds while profiled
+requests are in flight. For each such request it records one stack, weighted by the
+wall time since the previous sample:
+- If the request's task (or a task it awaits) is running on the event loop, the
+  stack is the loop thread's stack from that task's coroutine down.
+- Otherwise the request is suspended. The stack is its chain of awaiting coroutines,
+  ending in a "[await ...]" frame naming what it waits on. Work handed to worker
+  threads (asyncio.to_thread) therefore shows up as time awaiting that future.
+- Code running in a greenlet (SQLAlchemy's async ORM) has a stack that isn't linked
+  to the coroutine that started it. It is recorded under a "[greenlet]" frame.
+
+Finished profiles go into a bounded buffer that keeps the profiler_max_profiles
+slowest requests. The admin API serves them as collapsed stacks (flamegraph.pl,
+speedscope, inferno) or as speedscope JSON.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from config import settings
+
+MAX_CONCURRENT = 8  # Profiled requests in flight at once; further requests run unprofiled
+
+def _short_path(filename):
+    head, sep, tail = filename.rpartition("site-packages" + os.sep)
+    if sep:
+        return tail
+    relative = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return filename if relative.startswith("..") else relative
+
+def _code_name(code):
+    # co_qualname (Class.method) is Python 3.11+; older interpreters only have the bare name
+    return getattr(code, "co_qualname", code.co_name)
+
+def _frame_name(frame):
+    """Display name of a stack entry: a code object, or a pseudo-frame string"""
+    if isinstance(frame, str):
+        return frame
+    return f"{_code_name(frame)} ({_short_path(frame.co_filename)}:{frame.co_firstlineno})"
+
+def _await_chain(task):
+    """Code objects of a task's coroutine chain, outermost first, following awaited tasks
+
+    Returns (codes, starts, leaf): starts maps each task on the chain to the index of
+    its outermost coroutine in codes, and leaf names the awaited object that ends the chain.
+    """
+    codes, starts, leaf = [], {task: 0}, None
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        if isinstance(awaitable, asyncio.Task):
+            task = awaitable
+            starts[task] = len(codes)
+            awaitable = task.get_coro()
+            continue
+        code = getattr(awaitable, "cr_code", None) or getattr(awaitable, "gi_code", None)
+        if code is None:
+            # A future's iterator: the task records the future itself, which may be another task
+            waiter = getattr(task, "_fut_waiter", None)
+            if isinstance(waiter, asyncio.Task) and waiter not in starts:
+                awaitable = waiter
+                continue
+            leaf = f"[await {type(waiter if waiter is not None else awaitable).__name__}]"
+            break
+        codes.append(code)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return codes, starts, leaf
+
+class _Session:
+    """Samples being collected for one in-flight request"""
+    __slots__ = ("task", "loop", "thread_id", "stacks", "samples")
+
+    def __init__(self, task, loop, thread_id):
+        self.task = task
+        self.loop = loop
+        self.thread_id = thread_id
+        self.stacks = {}  # tuple of frames (outermost first) -> [samples, seconds]
+        self.samples = 0
+
+    def sample(self, frames, weight):
+        codes, starts, leaf = _await_chain(self.task)
+        running = asyncio.current_task(self.loop)
+        start = starts.get(running)
+        frame = frames.get(self.thread_id) if start is not None else None
+        if frame is not None:
+            # On CPU: the loop thread's stack down from the running task's coroutine
+            root = running.get_coro()
+            root_frame = getattr(root, "cr_frame", None) or getattr(root, "gi_frame", None)
+            tail = []
+            while frame is not None and frame is not root_frame:
+                tail.append(frame.f_code)
+                frame = frame.f_back
+            if frame is not None:
+                tail.append(frame.f_code)
+                stack = tuple(codes[:start]) + tuple(reversed(tail))
+            else:
+                # A greenlet's stack (SQLAlchemy's async ORM) doesn't link back to the coroutine that switched to it
+                stack = tuple(codes) + ("[greenlet]",) + tuple(reversed(tail))
+        else:
+            stack = tuple(codes) + ((leaf,) if leaf else ())
+        entry = self.stacks.get(stack)
+        if entry is None:
+            self.stacks[stack] = [1, weight]
+        else:
+            entry[0] += 1
+            entry[1] += weight
+        self.samples += 1
+
+class Profile:
+    """A finished request profile: request details plus weighted stacks"""
+    def __init__(self, profile_id, method, path, status, reason, started_at, duration, stacks, samples):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.status = status
+        self.reason = reason  # "header" or "sampled"
+        self.started_at = started_at
+        self.duration = duration
+        self.stacks = stacks
+        self.samples = samples
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": self.samples,
+        }
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format: one "outer;...;inner <samples>" line per stack"""
+        lines = [";".join(_frame_name(frame) for frame in stack) + f" {count}"
+                 for stack, (count, _) in self.stacks.items() if stack]
+        return "\n".join(sorted(lines)) + "\n"
+
+    def speedscope(self):
+        """speedscope's file format: one sampled profile, weights in milliseconds"""
+        indexes, frames, samples, weights = {}, [], [], []
+        for stack, (_, seconds) in self.stacks.items():
+            sample = []
+            for frame in stack:
+                index = indexes.get(frame)
+                if index is None:
+                    index = indexes[frame] = len(frames)
+                    if isinstance(frame, str):
+                        frames.append({"name": frame})
+                    else:
+                        frames.append({"name": _code_name(frame), "file": _short_path(frame.co_filename),
+                                       "line": frame.co_firstlineno})
+                sample.append(index)
+            samples.append(sample)
+            weights.append(round(seconds * 1000, 3))
+        name = f"{self.method} {self.path} ({self.duration * 1000:.1f} ms)"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "cloud-resource-optimizer",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+class Profiler:
+    """Sampler thread plus a bounded buffer of the slowest request profiles"""
+    def __init__(self, interval=None, max_profiles=None, sample_rate=None, header=None):
+        self.interval = interval or settings.profiler_interval
+        self.max_profiles = max_profiles or settings.profiler_max_profiles
+        self.sample_rate = settings.profiler_sample_rate if sample_rate is None else sample_rate
+        self.header = (header or settings.profiler_header).lower().encode("latin-1")
+        self._ids = itertools.count(1)
+        self._active = {}  # profile id -> _Session
+        self._slowest = []  # min-heap of (duration, id, Profile)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.profiled = 0
+        self.skipped = 0
+
+    def should_profile(self, scope):
+        """None, "header" or "sampled"; the only work an unprofiled request pays for"""
+        for name, value in scope["headers"]:
+            if name == self.header and value not in (b"", b"0", b"false"):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def start(self):
+        """Begin sampling the current task; returns a profile id, or None when too many are running"""
+        with self._lock:
+            if len(self._active) >= MAX_CONCURRENT:
+                self.skipped += 1
+                return None
+            profile_id = next(self._ids)
+            self._active[profile_id] = _Session(asyncio.current_task(), asyncio.get_running_loop(), threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return profile_id
+
+    def stop(self, profile_id, method, path, status, reason, started_at, duration):
+        with self._lock:
+            session = self._active.pop(profile_id)
+            self.profiled += 1
+            profile = Profile(profile_id, method, path, status, reason, started_at, duration,
+                              session.stacks, session.samples)
+            entry = (duration, profile_id, profile)
+            if len(self._slowest) < self.max_profiles:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wakeup.clear()
+            if idle:
+                self._wakeup.wait()
+                last = time.perf_counter()
+                continue
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            weight, last = now - last, now
+            frames = sys._current_frames()
+            with self._lock:
+                sessions = list(self._active.values())
+            for session in sessions:
+                try:
+                    session.sample(frames, weight)
+                except Exception:
+                    pass  # The task moved on mid-walk; the next sample will catch it
+            del frames
+
+    def profiles(self):
+        """Retained profiles, slowest first"""
+        with self._lock:
+            return [profile for _, _, profile in sorted(self._slowest, reverse=True)]
+
+    def get(self, profile_id):
+        with self._lock:
+            for _, retained_id, profile in self._slowest:
+                if retained_id == profile_id:
+                    return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._slowest.clear()
+
+    def report(self):
+        return {
+            "enabled": settings.profiler_enabled,
+            "sample_rate": self.sample_rate,
+            "interval_seconds": self.interval,
+            "max_profiles": self.max_profiles,
+            "header": self.header.decode("latin-1"),
+            "profiled_requests": self.profiled,
+            "skipped_requests": self.skipped,
+            "active": len(self._active),
+            "profiles": [profile.summary() for profile in self.profiles()],
+        }
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware: profiles sampled requests and tags their responses with X-Profile-Id"""
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        reason = self.profiler.should_profile(scope)
+        if reason is None:
+            return await self.app(scope, receive, send)
+        profile_id = self.profiler.start()
+        if profile_id is None:
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", str(profile_id).encode())]
+            await send(message)
+
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.stop(profile_id, scope["method"], scope["path"], status[0], reason, started_at,
+                               time.perf_counter() - started)
+
+# Global profiler: main.py installs the middleware, the admin API reads the profiles
+request_profiler = Profiler()
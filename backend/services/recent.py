@@ -0,0 +1,218 @@
+"""In-memory windows of the latest samples per resource, so predictions never query the DB.
+
+Every resource gets a fixed-size NumPy ring buffer. The ingest path appends rows once
+they are committed, and the buffers are rehydrated from the metrics table at startup.
+Each sample is written twice, at i and i + capacity. The latest window is therefore
+always one contiguous slice, and it is handed out as a view instead of being
+reassembled from a wrapped ring.
+"""
+import itertools
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, desc
+from config import settings
+from database import MetricRecord
+
+FIELDS = ("cpu_utilization", "memory_utilization", "network_io", "instance_count")
+CPU, MEMORY, NETWORK, INSTANCES = range(len(FIELDS))
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_versions = itertools.count(1)
+
+def _epoch_micros(timestamps):
+    return np.fromiter(((t - _EPOCH) // _MICROSECOND for t in timestamps), dtype=np.int64, count=len(timestamps))
+
+class RingBuffer:
+    """Latest `capacity` samples of every field, oldest first, with their timestamps"""
+    def __init__(self, capacity, n_fields=len(FIELDS)):
+        self.capacity = capacity
+        self._values = np.zeros((n_fields, 2 * capacity))
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._count = 0  # Samples ever written; sample i lives at i % capacity (and + capacity)
+        self.version = 0  # Changes on every append; unique across buffers, so it identifies the window
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def latest_time(self):
+        return self._times[(self._count - 1) % self.capacity] if self._count else None
+
+    def latest(self):
+        """(epoch microseconds, [value per field]) of the newest sample"""
+        i = (self._count - 1) % self.capacity
+        return int(self._times[i]), self._values[:, i].tolist()
+
+    def _slice(self, n=None):
+        size = len(self)
+        n = size if n is None else min(n, size)
+        start = (self._count - n) % self.capacity
+        return slice(start, start + n)
+
+    def window(self, field, n=None):
+        """View of the latest n values of one field; valid until the next write"""
+        return self._values[field, self._slice(n)]
+
+    def windows(self, fields, n=None):
+        """(len(fields), n) view over adjacent fields, e.g. windows(slice(CPU, MEMORY + 1))"""
+        return self._values[fields, self._slice(n)]
+
+    def _write(self, times, values):
+        positions = (self._count + np.arange(len(times))) % self.capacity
+        for offset in (0, self.capacity):
+            self._times[positions + offset] = times
+            self._values[:, positions + offset] = values
+        self._count += len(times)
+
+    def extend(self, times, values):
+        """Append samples: times is (k,) epoch microseconds, values is (n_fields, k), both time-ordered"""
+        if not len(times):
+            return
+        self.version = next(_versions)
+        if self._count and times[0] < self.latest_time:
+            # Late rows: merge them into the current window and keep the newest capacity samples
+            current = self._slice()
+            times = np.concatenate([self._times[current], times])
+            values = np.concatenate([self._values[:, current], values], axis=1)
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[:, order]
+            self._count = 0
+        self._write(times[-self.capacity:], values[:, -self.capacity:])
+
+class RecentMetrics:
+    """One RingBuffer per resource, filled on ingest and rehydrated from the DB"""
+    def __init__(self, capacity=None):
+        self.capacity = capacity or settings.sequence_length
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, resource_id):
+        return resource_id in self._buffers
+
+    @property
+    def resource_ids(self):
+        return list(self._buffers)
+
+    def get(self, resource_id):
+        return self._buffers.get(resource_id)
+
+    def _extend_columns(self, resource_ids, timestamps, values):
+        """Append column arrays, grouped per resource and time-ordered within each group"""
+        resources, codes = np.unique(np.asarray(resource_ids, dtype=object), return_inverse=True)
+        times = _epoch_micros(timestamps)
+        order = np.lexsort((times, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(resources) + 1))
+        with self._lock:
+            for resource_id, start, end in zip(resources.tolist(), bounds[:-1], bounds[1:]):
+                buffer = self._buffers.get(resource_id)
+                if buffer is None:
+                    buffer = self._buffers[resource_id] = RingBuffer(self.capacity)
+                group = order[start:end]
+                buffer.extend(times[group], values[:, group])
+
+    def extend(self, rows):
+        """Append committed metrics-table insert dicts (see services.ingest.to_metric_rows)"""
+        if not rows:
+            return
+        values = np.array([
+            [row["cpu_utilization"], row["memory_utilization"], row.get("network_io") or 0.0, row.get("instance_count") or 1]
+            for row in rows
+        ], dtype=np.float64).T
+        self._extend_columns([row["resource_id"] for row in rows], [row["timestamp"] for row in rows], values)
+
+    def snapshot(self, resource_id, n=None):
+        """Copy of a resource's latest CPU/memory window, its instance count and buffer version
+
+        Returns ((2, n) array, instances, version), or None for an unknown resource. One small
+        copy, because ingestion may overwrite the ring while a worker thread is still running
+        inference on the window.
+        """
+        with self._lock:
+            buffer = self._buffers.get(resource_id)
+            if buffer is None or not len(buffer):
+                return None
+            return buffer.windows(slice(CPU, MEMORY + 1), n).copy(), int(buffer.window(INSTANCES, 1)[0]), buffer.version
+
+    def latest(self, resource_id):
+        """(version, sample count, epoch microseconds, [value per field]) of a resource's newest sample, or None"""
+        with self._lock:
+            buffer = self._buffers.get(resource_id)
+            if buffer is None or not len(buffer):
+                return None
+            return (buffer.version, len(buffer), *buffer.latest())
+
+    def changed_since(self, versions):
+        """Latest sample of every resource whose buffer version differs from versions[resource_id]
+
+        Returns [(resource_id, version, epoch microseconds, [value per field])].
+        """
+        with self._lock:
+            return [
+                (resource_id, buffer.version, *buffer.latest())
+                for resource_id, buffer in self._buffers.items()
+                if len(buffer) and versions.get(resource_id) != buffer.version
+            ]
+
+    def fleet_windows(self, n=None, with_counts=False, with_versions=False):
+        """Latest n samples of every resource, oldest first, as (R, n) window arrays
+
+        Returns (resource_ids, cpu_windows, memory_windows, instance_counts), sorted by
+        resource id, with each resource's latest instance count.
+
+        with_counts: also return each resource's number of real (unpadded) samples
+        with_versions: also return each resource's buffer version (after the counts)
+        """
+        n = n or settings.sequence_length
+        with self._lock:
+            resource_ids = sorted(resource_id for resource_id, buffer in self._buffers.items() if len(buffer))
+            cpu_windows = np.empty((len(resource_ids), n))
+            memory_windows = np.empty((len(resource_ids), n))
+            instance_counts = np.empty(len(resource_ids), dtype=np.int64)
+            sample_counts = np.empty(len(resource_ids), dtype=np.int64)
+            versions = np.empty(len(resource_ids), dtype=np.int64)
+            for i, resource_id in enumerate(resource_ids):
+                buffer = self._buffers[resource_id]
+                sample_counts[i] = min(len(buffer), n)
+                versions[i] = buffer.version
+                for field, windows in ((CPU, cpu_windows), (MEMORY, memory_windows)):
+                    window = buffer.window(field, n)
+                    windows[i, n - len(window):] = window
+                    # Pad short histories with their mean, like LSTMModel.predict does
+                    windows[i, :n - len(window)] = window.mean()
+                instance_counts[i] = buffer.window(INSTANCES, 1)[0]
+        result = (resource_ids, cpu_windows, memory_windows, instance_counts)
+        if with_counts:
+            result += (sample_counts,)
+        if with_versions:
+            result += (versions,)
+        return result
+
+    def rehydrate(self, db):
+        """Reload every resource's latest window from the metrics table (sync Session or Connection)
+
+        One indexed LIMIT query per resource, via ix_metrics_resource_timestamp, instead of a
+        window function over the whole table.
+        """
+        resource_ids = db.execute(select(MetricRecord.resource_id).distinct()).scalars().all()
+        columns = [MetricRecord.resource_id, MetricRecord.timestamp, *(getattr(MetricRecord, name) for name in FIELDS)]
+        rows = []
+        for resource_id in resource_ids:
+            rows.extend(db.execute(
+                select(*columns)
+                .where(MetricRecord.resource_id == resource_id)
+                .order_by(desc(MetricRecord.timestamp))
+                .limit(self.capacity)
+            ).all())
+        with self._lock:
+            self._buffers = {}
+        if rows:
+            resource_column, timestamps, *fields = zip(*rows)
+            values = np.array([[v if v is not None else default for v in field]
+                               for field, default in zip(fields, (0.0, 0.0, 0.0, 1))], dtype=np.float64)
+            self._extend_columns(resource_column, timestamps, values)
+        return len(resource_ids)
+
+# Global buffers shared by the ingest path and the prediction endpoints
+recent_metrics = RecentMetrics()
@@ -0,0 +1,406 @@
+"""Time-bucketed rollups of the metrics table: 1-minute, 1-hour and 1-day buckets.
+
+Rollups are maintained incrementally on ingest. Each batch is aggregated at every
+resolution and merged into the stored buckets it touches: samples, min, max and the
+sample-weighted averages combine associatively, so only one stored row per touched bucket
+is read, never its children. The cost of a batch depends on the batch alone, not on the
+table or how far into the hour or day it falls, and a 30-day chart is served from ~720
+hourly rows instead of every raw sample.
+
+min/max/avg/samples are exact. p95 is exact for a bucket filled by one batch. Every
+bucket also stores a quantile sketch per metric: sample counts in logarithmic bins whose
+width is 2% of their value, so any value is known to within 1%. Sketches merge by adding
+counts, and a merged bucket takes its p95 from the merged sketch, clamped to its exact
+min/max. The error is the 1% bin error plus at most one step between neighbouring samples.
+Buckets written before sketches existed stand in as their avg (90% of their samples)
+and p95 (10%) until they are rebuilt.
+
+Rebuild rollups from the raw table (e.g. for rows stored before they existed), from
+the backend directory. Buckets whose raw rows were pruned by retention are kept:
+    python -m services.rollups
+"""
+import argparse
+import asyncio
+import numpy as np
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, func, tuple_, desc
+from sqlalchemy.orm import defer
+from config import settings
+from database import MetricRecord, MetricRollup
+
+# Rollup resolutions, finest first, with their bucket width in seconds
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+RAW_COLUMNS = {
+    "cpu": MetricRecord.cpu_utilization,
+    "memory": MetricRecord.memory_utilization,
+    "network": MetricRecord.network_io,
+}
+METRICS = tuple(RAW_COLUMNS)
+AGGREGATES = ("min", "max", "avg", "p95")
+_AGGREGATE_COLUMNS = ["samples", *(f"{m}_{a}" for m in METRICS for a in AGGREGATES), "cost_avg"]
+_SKETCH_COLUMNS = [f"{m}_sketch" for m in METRICS]
+_STORED_COLUMNS = _AGGREGATE_COLUMNS + _SKETCH_COLUMNS
+
+# Quantile sketch bins: bin k holds values in (GAMMA**(k-1), GAMMA**k], all within 1% of its midpoint
+_SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + _SKETCH_ACCURACY) / (1 - _SKETCH_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+_SKETCH_MIN_VALUE = 1e-3  # Values at or below this (e.g. an idle 0% CPU) share the zero bin
+_ZERO_KEY = -32768
+_SKETCH_DTYPE = np.dtype([("key", "<i2"), ("count", "<u4")])
+_DENSE_SKETCH_SLOTS = 4_000_000  # Largest groups x bins table merged without sorting
+
+# Bound the size of generated IN clauses
+_KEYS_PER_STATEMENT = 500
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+def _epoch_seconds(timestamps):
+    # Plain datetime arithmetic is ~4x faster than NumPy's per-object datetime64 conversion
+    return np.fromiter(((t - _EPOCH) // _SECOND for t in timestamps), dtype=np.int64, count=len(timestamps))
+
+def _to_datetimes(seconds):
+    return np.asarray(seconds, dtype=np.int64).astype("datetime64[s]").tolist()
+
+def _group(resource_ids, buckets):
+    """Group ids for (resource_id, bucket) pairs, plus the unique pairs in group order"""
+    resources, resource_codes = np.unique(resource_ids, return_inverse=True)
+    keys, group_ids = np.unique(np.stack([resource_codes, buckets], axis=1), axis=0, return_inverse=True)
+    return group_ids.ravel(), resources[keys[:, 0]], keys[:, 1]
+
+def _group_bounds(group_ids, n_groups):
+    counts = np.bincount(group_ids, minlength=n_groups)
+    ends = np.cumsum(counts)
+    return ends - counts, counts
+
+def _sketch_keys(values):
+    keys = np.full(len(values), _ZERO_KEY, dtype=np.int64)
+    positive = values > _SKETCH_MIN_VALUE
+    keys[positive] = np.clip(np.ceil(np.log(values[positive]) / _LOG_GAMMA), _ZERO_KEY + 1, 32767)
+    return keys
+
+def _sketch_values(keys):
+    """Bin midpoints: within _SKETCH_ACCURACY of every value in the bin"""
+    return np.where(keys == _ZERO_KEY, 0.0, 2 * _GAMMA ** keys.astype(np.float64) / (_GAMMA + 1))
+
+def _merge_sketch_entries(group_ids, keys, counts):
+    """Sum counts per (group, key); returns group ids, keys and counts sorted by group, then key"""
+    zero = keys == _ZERO_KEY
+    low = keys[~zero].min() if not zero.all() else 0
+    span = (keys[~zero].max() - low + 2) if not zero.all() else 1
+    n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+    if n_groups * span <= _DENSE_SKETCH_SLOTS:
+        # Dense slots (0 is the zero bin): one bincount, no sort
+        summed = np.bincount(group_ids * span + np.where(zero, 0, keys - low + 1), weights=counts)
+        flat = np.flatnonzero(summed)
+        groups, slots = np.divmod(flat, span)
+        return groups, np.where(slots == 0, _ZERO_KEY, slots + low - 1), summed[flat].astype(np.int64)
+    combined = group_ids.astype(np.int64) << 16 | (keys - _ZERO_KEY)
+    unique, inverse = np.unique(combined, return_inverse=True)
+    summed = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+    return unique >> 16, (unique & 0xFFFF) + _ZERO_KEY, summed
+
+def _encode_sketches(groups, keys, counts, n_groups):
+    """One sketch blob per group from merged entries"""
+    entries = np.empty(len(keys), dtype=_SKETCH_DTYPE)
+    entries["key"], entries["count"] = keys, counts
+    bounds = np.searchsorted(groups, np.arange(n_groups + 1))
+    return [entries[start:end].tobytes() for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+def _sketch_p95(groups, keys, counts, n_groups):
+    """Per group, the bin holding the sample at NumPy's 95th percentile rank"""
+    totals = np.bincount(groups, weights=counts, minlength=n_groups)
+    begin = np.cumsum(totals) - totals
+    index = np.searchsorted(np.cumsum(counts), begin + 0.95 * (totals - 1), side="right")
+    return _sketch_values(keys[index])
+
+def _raw_aggregates(group_ids, n_groups, values):
+    """min/max/avg, exact p95 (NumPy's linear interpolation) and a quantile sketch of values per group"""
+    sorted_values = values[np.lexsort((values, group_ids))]
+    starts, counts = _group_bounds(group_ids, n_groups)
+    position = starts + 0.95 * (counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    p95 = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+    return {
+        "min": sorted_values[starts],
+        "max": sorted_values[starts + counts - 1],
+        "avg": np.bincount(group_ids, weights=values, minlength=n_groups) / counts,
+        "p95": p95,
+        "sketch": _encode_sketches(*_merge_sketch_entries(group_ids, _sketch_keys(values), np.ones(len(values))),
+                                   n_groups),
+    }
+
+def _sketch_entries(group_ids, child, metric):
+    """Every (group, key, count) entry of the children's sketches
+
+    A child stored before sketches existed stands in as its avg (90% of its samples) and p95 (10%).
+    """
+    sketches = child[f"{metric}_sketch"]
+    stored = np.array([sketch is not None for sketch in sketches], dtype=bool)
+    entries = np.frombuffer(b"".join(sketch for sketch in sketches if sketch is not None), dtype=_SKETCH_DTYPE)
+    lengths = np.array([len(sketch) // _SKETCH_DTYPE.itemsize for sketch in sketches if sketch is not None], dtype=np.int64)
+    groups = [np.repeat(group_ids[stored], lengths)]
+    keys = [entries["key"].astype(np.int64)]
+    counts = [entries["count"].astype(np.float64)]
+    if not stored.all():
+        legacy = ~stored
+        samples = child["samples"][legacy]
+        tail = np.round(0.1 * samples)
+        groups.append(np.concatenate([group_ids[legacy], group_ids[legacy]]))
+        keys.append(_sketch_keys(np.concatenate([child[f"{metric}_avg"][legacy], child[f"{metric}_p95"][legacy]])))
+        counts.append(np.concatenate([samples - tail, tail]))
+    return np.concatenate(groups), np.concatenate(keys), np.concatenate(counts)
+
+def _rollup_aggregates(group_ids, n_groups, child):
+    """Combine rollup buckets (finer children, or parts of one bucket) into buckets of the grouping"""
+    order = np.argsort(group_ids, kind="stable")
+    starts, counts = _group_bounds(group_ids, n_groups)
+    # A bucket with a single child is that child, exact p95 included; merged buckets take it from the sketch
+    single = counts == 1
+    weights = child["samples"].astype(np.float64)
+    samples = np.bincount(group_ids, weights=weights, minlength=n_groups)
+
+    aggregates = {"samples": samples.astype(np.int64)}
+    for metric in METRICS:
+        minimum = np.minimum.reduceat(child[f"{metric}_min"][order], starts)
+        maximum = np.maximum.reduceat(child[f"{metric}_max"][order], starts)
+        merged = _merge_sketch_entries(*_sketch_entries(group_ids, child, metric))
+        aggregates[metric] = {
+            "min": minimum,
+            "max": maximum,
+            "avg": np.bincount(group_ids, weights=child[f"{metric}_avg"] * weights, minlength=n_groups) / samples,
+            "p95": np.where(single, child[f"{metric}_p95"][order][starts],
+                            np.clip(_sketch_p95(*merged, n_groups), minimum, maximum)),
+            "sketch": _encode_sketches(*merged, n_groups),
+        }
+    aggregates["cost_avg"] = np.bincount(group_ids, weights=child["cost_avg"] * weights, minlength=n_groups) / samples
+    return aggregates
+
+_ROLLUP_COLUMNS = [MetricRollup.resource_id, MetricRollup.bucket_start,
+                   *(getattr(MetricRollup, name) for name in _STORED_COLUMNS)]
+
+async def _load_buckets(session, resolution, keys_resource, keys_bucket):
+    """Stored rollup rows for exactly these (resource_id, bucket) keys"""
+    keys = list(zip(keys_resource.tolist(), _to_datetimes(keys_bucket)))
+    rows = []
+    for i in range(0, len(keys), _KEYS_PER_STATEMENT):
+        query = select(*_ROLLUP_COLUMNS).where(
+            MetricRollup.resolution == resolution,
+            tuple_(MetricRollup.resource_id, MetricRollup.bucket_start).in_(keys[i:i + _KEYS_PER_STATEMENT])
+        )
+        rows.extend((await session.execute(query)).all())
+    return rows
+
+def _aggregate_raw(rows, width):
+    resource_ids, timestamps, cpu, memory, network, cost = zip(*rows)
+    buckets = _epoch_seconds(timestamps) // width * width
+    group_ids, keys_resource, keys_bucket = _group(np.array(resource_ids, dtype=object), buckets)
+    n_groups = len(keys_bucket)
+
+    aggregates = {"samples": np.bincount(group_ids, minlength=n_groups)}
+    for metric, values in zip(METRICS, (cpu, memory, network)):
+        aggregates[metric] = _raw_aggregates(group_ids, n_groups, np.array(values, dtype=np.float64))
+    cost = np.array([c if c is not None else 0.0 for c in cost], dtype=np.float64)
+    aggregates["cost_avg"] = np.bincount(group_ids, weights=cost, minlength=n_groups) / aggregates["samples"]
+    return keys_resource, keys_bucket, aggregates
+
+def _aggregate_children(rows, width):
+    columns = list(zip(*rows))
+    child = {name: np.array(values, dtype=np.float64) for name, values in zip(_AGGREGATE_COLUMNS, columns[2:])}
+    child.update(zip(_SKETCH_COLUMNS, columns[2 + len(_AGGREGATE_COLUMNS):]))
+    buckets = _epoch_seconds(columns[1]) // width * width
+    group_ids, keys_resource, keys_bucket = _group(np.array(columns[0], dtype=object), buckets)
+    return keys_resource, keys_bucket, _rollup_aggregates(group_ids, len(keys_bucket), child)
+
+def _upsert(dialect_name):
+    """INSERT ... ON CONFLICT (bucket key) DO UPDATE, for the dialects that support it"""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    statement = dialect_insert(MetricRollup.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=["resolution", "resource_id", "bucket_start"],
+        set_={name: statement.excluded[name] for name in _STORED_COLUMNS}
+    )
+
+def _bucket_rows(keys_resource, keys_bucket, aggregates):
+    """Aggregates as tuples in _ROLLUP_COLUMNS order"""
+    return list(zip(
+        keys_resource.tolist(),
+        _to_datetimes(keys_bucket),
+        aggregates["samples"].tolist(),
+        *(aggregates[metric][aggregate].tolist() for metric in METRICS for aggregate in AGGREGATES),
+        aggregates["cost_avg"].tolist(),
+        *(aggregates[metric]["sketch"] for metric in METRICS),
+    ))
+
+async def _replace_buckets(session, resolution, keys_resource, keys_bucket, aggregates):
+    """Write the recomputed buckets over any existing ones (the caller owns the transaction)"""
+    names = ["resource_id", "bucket_start", *_STORED_COLUMNS]
+    rows = [
+        {"resolution": resolution, **dict(zip(names, values))}
+        for values in _bucket_rows(keys_resource, keys_bucket, aggregates)
+    ]
+
+    upsert = _upsert(session.bind.dialect.name)
+    if upsert is None:
+        keys = [(row["resource_id"], row["bucket_start"]) for row in rows]
+        for i in range(0, len(keys), _KEYS_PER_STATEMENT):
+            await session.execute(delete(MetricRollup.__table__).where(
+                MetricRollup.resolution == resolution,
+                tuple_(MetricRollup.resource_id, MetricRollup.bucket_start).in_(keys[i:i + _KEYS_PER_STATEMENT])
+            ))
+        upsert = insert(MetricRollup.__table__)
+    # Core statement on the table: a plain executemany without ORM bulk-save bookkeeping
+    await session.execute(upsert, rows)
+
+async def update_rollups(session, rows):
+    """Fold freshly inserted raw rows into the rollups
+
+    rows: metrics-table insert dicts (resource_id, timestamp, cpu_utilization,
+    memory_utilization, network_io, cost). Runs in the caller's transaction.
+    """
+    if not rows:
+        return
+    batch = [
+        (row["resource_id"], row["timestamp"], row["cpu_utilization"], row["memory_utilization"], row["network_io"], row["cost"])
+        for row in rows
+    ]
+    for resolution in RESOLUTIONS:
+        await _merge_batch(session, resolution, batch)
+
+async def _merge_batch(session, resolution, batch):
+    """Aggregate (resource_id, timestamp, cpu, memory, network, cost) tuples into one resolution's buckets"""
+    width = RESOLUTIONS[resolution]
+    keys_resource, keys_bucket, aggregates = _aggregate_raw(batch, width)
+    # Merge into the buckets earlier batches already started: one stored row per touched bucket
+    stored = await _load_buckets(session, resolution, keys_resource, keys_bucket)
+    if stored:
+        merged = _bucket_rows(keys_resource, keys_bucket, aggregates) + stored
+        keys_resource, keys_bucket, aggregates = _aggregate_children(merged, width)
+    await _replace_buckets(session, resolution, keys_resource, keys_bucket, aggregates)
+
+async def count_raw(session, resource_id, start, end, cap):
+    """Number of raw rows in [start, end), counting no further than cap"""
+    query = select(MetricRecord.id).where(MetricRecord.resource_id == resource_id, MetricRecord.timestamp >= start)
+    if end is not None:
+        query = query.where(MetricRecord.timestamp < end)
+    return (await session.execute(select(func.count()).select_from(query.limit(cap).subquery()))).scalar()
+
+async def pick_resolution(session, resource_id, start, end, target_points=None):
+    """Raw rows if the range holds at most target_points samples, else the finest rollup that fits
+
+    Ranges reaching past the raw-metrics retention are always served from rollups.
+    """
+    target_points = target_points or settings.history_target_points
+    retention = settings.metrics_retention_days
+    raw_complete = not retention or retention <= 0 or start >= datetime.utcnow() - timedelta(days=retention)
+    if raw_complete and await count_raw(session, resource_id, start, end, target_points + 1) <= target_points:
+        return "raw"
+    span = (end - start).total_seconds()
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= target_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+async def query_rollups(session, resolution, resource_id, start=None, end=None, limit=None):
+    """Rollup buckets for one resource, newest first"""
+    query = select(MetricRollup).options(*(defer(getattr(MetricRollup, name)) for name in _SKETCH_COLUMNS)).where(
+        MetricRollup.resolution == resolution, MetricRollup.resource_id == resource_id
+    )
+    if start is not None:
+        query = query.where(MetricRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(MetricRollup.bucket_start < end)
+    result = await session.execute(query.order_by(desc(MetricRollup.bucket_start)).limit(limit))
+    return result.scalars().all()
+
+async def _rebuild_starts(db):
+    """Per resolution, resource_id -> first bucket start to rebuild from the raw rows
+
+    Raw retention prunes the oldest rows, so buckets before a resource's oldest raw row
+    hold history that can no longer be recomputed and are left alone. The bucket holding
+    that row is kept as well when older buckets exist, since pruning may have cut through it.
+    """
+    oldest_raw = dict((await db.execute(
+        select(MetricRecord.resource_id, func.min(MetricRecord.timestamp)).group_by(MetricRecord.resource_id)
+    )).all())
+    oldest_bucket = {
+        (resource_id, resolution): bucket_start
+        for resource_id, resolution, bucket_start in (await db.execute(
+            select(MetricRollup.resource_id, MetricRollup.resolution, func.min(MetricRollup.bucket_start))
+            .group_by(MetricRollup.resource_id, MetricRollup.resolution)
+        )).all()
+    }
+    starts = {}
+    for resolution, width in RESOLUTIONS.items():
+        starts[resolution] = {}
+        for resource_id, oldest in oldest_raw.items():
+            first = _EPOCH + (oldest - _EPOCH) // timedelta(seconds=width) * timedelta(seconds=width)
+            older = oldest_bucket.get((resource_id, resolution))
+            if older is not None and older < first:
+                first += timedelta(seconds=width)
+            starts[resolution][resource_id] = first
+    return starts
+
+async def rebuild_rollups(chunk_size=None):
+    """Recompute rollups from the metrics table, streamed in keyset-paginated chunks
+
+    Only buckets the remaining raw rows fully cover are rebuilt (see _rebuild_starts), so
+    history whose raw rows were pruned by retention survives.
+    """
+    from database import AsyncSessionLocal
+    chunk_size = chunk_size or settings.history_chunk_size
+    columns = [MetricRecord.id, MetricRecord.resource_id, MetricRecord.timestamp, *RAW_COLUMNS.values(), MetricRecord.cost]
+    
+    async with AsyncSessionLocal() as db:
+        starts = await _rebuild_starts(db)
+        for resolution, firsts in starts.items():
+            for resource_id, first in firsts.items():
+                await db.execute(delete(MetricRollup.__table__).where(
+                    MetricRollup.resolution == resolution,
+                    MetricRollup.resource_id == resource_id,
+                    MetricRollup.bucket_start >= first
+                ))
+        await db.commit()
+    
+    last_id = 0
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(*columns).where(MetricRecord.id > last_id).order_by(MetricRecord.id).limit(chunk_size)
+            )).all()
+            if not rows:
+                break
+            for resolution, firsts in starts.items():
+                batch = [row[1:] for row in rows if row.resource_id in firsts and row.timestamp >= firsts[row.resource_id]]
+                if batch:
+                    await _merge_batch(db, resolution, batch)
+            await db.commit()
+        last_id = rows[-1].id
+        total += len(rows)
+        print(f"Rolled up {total} metric rows")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild metric rollups from the raw metrics table")
+    parser.add_argument("--chunk-size", type=int, help="Raw rows per transaction")
+    args = parser.parse_args()
+
+    from database import init_db, async_engine
+    init_db()
+
+    async def run():
+        await rebuild_rollups(args.chunk_size)
+        await async_engine.dispose()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
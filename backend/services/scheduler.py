@@ -0,0 +1,197 @@
+"""Background forecasting on a fixed cadence, so request handlers only look results up.
+
+Every forecast_interval seconds the scheduler takes every resource's window from the
+ring buffers (services.recent), forecasts and picks actions for all of them in one
+model call (services.fleet.evaluate_fleet, in a worker thread), and publishes the
+arrays as a ForecastSnapshot. PredictionRecords are then stored with a single
+executemany, only for resources whose window (ring-buffer version) or model changed
+since their last stored record, so an idle fleet doesn't add rows every cycle. Cycles run on a fixed grid: the lag is how late a cycle started,
+and overrunning cycles skip ticks instead of queueing them up.
+"""
+import asyncio
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from config import settings
+from database import AsyncSessionLocal, PredictionRecord
+from model.registry import model_registry
+from services.action_engine import ActionEngine
+from services.fleet import evaluate_fleet
+from services.recent import recent_metrics
+from services.telemetry import stage
+
+class ForecastSnapshot:
+    """Results of one cycle for every resource, as arrays indexed by resource"""
+    def __init__(self, timestamp, resource_ids, cpu_windows, memory_windows, sample_counts, results,
+                 versions=None, generation=None):
+        self.timestamp = timestamp
+        self.resource_ids = resource_ids
+        self.index = {resource_id: i for i, resource_id in enumerate(resource_ids)}
+        self.cpu_windows = cpu_windows
+        self.memory_windows = memory_windows
+        self.sample_counts = sample_counts
+        self.results = results
+        self.versions = versions  # Ring-buffer version of each window
+        self.generation = generation  # Model generation that produced the results
+
+    def __len__(self):
+        return len(self.resource_ids)
+
+    def lookup(self, resource_id):
+        """Result shaped like forecasting.predict_resource's, or None
+
+        Resources whose window is still short get None, so callers fall back to the
+        per-request path (which forecasts simulated data for them, not a padded window).
+        """
+        i = self.index.get(resource_id)
+        if i is None or self.sample_counts[i] < self.cpu_windows.shape[1]:
+            return None
+        results = self.results
+        return {
+            "cpu_data": self.cpu_windows[i],
+            "memory_data": self.memory_windows[i],
+            "current_instances": int(results["current_instances"][i]),
+            "predicted_cpu": float(results["predicted_cpu"][i]),
+            "predicted_memory": float(results["predicted_memory"][i]),
+            "confidence": float(results["confidence"][i]),
+            "action": ActionEngine.action_at(results, i),
+            "scheduled": True,
+        }
+
+def _record_rows(snapshot, indices):
+    """PredictionRecord insert dicts for the snapshot's resources at the given indices"""
+    results = snapshot.results
+    return [
+        {
+            "resource_id": resource_id,
+            "timestamp": snapshot.timestamp,
+            "predicted_cpu": cpu,
+            "predicted_memory": memory,
+            "recommended_action": action,
+            "confidence": confidence,
+            "cost_savings": savings,
+        }
+        for resource_id, cpu, memory, action, confidence, savings in zip(
+            [snapshot.resource_ids[i] for i in indices],
+            results["predicted_cpu"][indices].tolist(),
+            results["predicted_memory"][indices].tolist(),
+            results["action"][indices].tolist(),
+            results["confidence"][indices].tolist(),
+            results["cost_impact"]["potential_savings"][indices].tolist(),
+        )
+    ]
+
+class ForecastScheduler:
+    """Recomputes every resource's forecast each interval and publishes the latest snapshot"""
+    def __init__(self, interval=None, persist=None):
+        self.interval = interval or settings.forecast_interval
+        self.persist = settings.forecast_persist if persist is None else persist
+        self.snapshot = None
+        self.cycles = 0
+        self.skipped_cycles = 0
+        self.records_persisted = 0
+        self._persisted_versions = {}  # resource_id -> buffer version of its last stored record
+        self._persisted_generation = None
+        self.last_cycle_seconds = None
+        self.max_cycle_seconds = 0.0
+        self.total_cycle_seconds = 0.0
+        self.last_lag_seconds = None
+        self.max_lag_seconds = 0.0
+        self.last_error = None
+
+    def lookup(self, resource_id):
+        """O(1) read of the latest published forecast for a resource, or None"""
+        snapshot = self.snapshot
+        return snapshot.lookup(resource_id) if snapshot is not None else None
+
+    def _evaluate(self):
+        resource_ids, cpu_windows, memory_windows, instance_counts, sample_counts, versions = (
+            recent_metrics.fleet_windows(with_counts=True, with_versions=True)
+        )
+        lstm_model = model_registry.get("lstm")
+        generation = model_registry.generation("lstm")
+        results = evaluate_fleet(lstm_model, cpu_windows, memory_windows, instance_counts, with_reasons=True)
+        return ForecastSnapshot(datetime.utcnow(), resource_ids, cpu_windows, memory_windows, sample_counts, results,
+                                versions, generation)
+
+    def _changed(self, snapshot):
+        """Indices of resources whose window or model changed since their last stored record"""
+        if snapshot.generation != self._persisted_generation:
+            # A new model forecasts every window differently
+            self._persisted_versions = {}
+            self._persisted_generation = snapshot.generation
+        persisted = self._persisted_versions
+        return [i for i, (resource_id, version) in enumerate(zip(snapshot.resource_ids, snapshot.versions.tolist()))
+                if persisted.get(resource_id) != version]
+
+    async def run_cycle(self):
+        """Forecast every resource, publish the snapshot, then persist the changed forecasts"""
+        started = time.perf_counter()
+        with stage("scheduler", "evaluate"):
+            snapshot = await asyncio.to_thread(self._evaluate)
+        # A single reference assignment: readers see the old snapshot or the new one, never a mix
+        self.snapshot = snapshot
+        changed = self._changed(snapshot) if self.persist else []
+        if changed:
+            with stage("scheduler", "persist"):
+                rows = _record_rows(snapshot, changed)
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(PredictionRecord), rows)
+                    await db.commit()
+            for row, i in zip(rows, changed):
+                self._persisted_versions[row["resource_id"]] = int(snapshot.versions[i])
+            self.records_persisted += len(rows)
+
+        elapsed = time.perf_counter() - started
+        self.cycles += 1
+        self.last_cycle_seconds = elapsed
+        self.max_cycle_seconds = max(self.max_cycle_seconds, elapsed)
+        self.total_cycle_seconds += elapsed
+        return snapshot
+
+    def report(self):
+        snapshot = self.snapshot
+        return {
+            "interval_seconds": self.interval,
+            "cycles": self.cycles,
+            "skipped_cycles": self.skipped_cycles,
+            "resources": len(snapshot) if snapshot is not None else 0,
+            "last_run": snapshot.timestamp.isoformat() if snapshot is not None else None,
+            "snapshot_age_seconds": round((datetime.utcnow() - snapshot.timestamp).total_seconds(), 3)
+            if snapshot is not None else None,
+            "last_cycle_seconds": round(self.last_cycle_seconds, 4) if self.last_cycle_seconds is not None else None,
+            "avg_cycle_seconds": round(self.total_cycle_seconds / self.cycles, 4) if self.cycles else None,
+            "max_cycle_seconds": round(self.max_cycle_seconds, 4),
+            "last_lag_seconds": round(self.last_lag_seconds, 4) if self.last_lag_seconds is not None else None,
+            "max_lag_seconds": round(self.max_lag_seconds, 4),
+            "records_persisted": self.records_persisted,
+            "last_error": self.last_error,
+        }
+
+    async def run(self):
+        """Background task: one cycle per interval on a fixed grid, starting immediately"""
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while True:
+            delay = next_run - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = max(loop.time() - next_run, 0.0)
+            self.last_lag_seconds = lag
+            self.max_lag_seconds = max(self.max_lag_seconds, lag)
+            try:
+                await self.run_cycle()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error in forecast cycle: {e}")
+            next_run += self.interval
+            behind = loop.time() - next_run
+            if behind > self.interval:
+                # Overran by whole intervals: drop those ticks rather than running them back to back
+                skipped = int(behind // self.interval)
+                self.skipped_cycles += skipped
+                next_run += skipped * self.interval
+
+# Global scheduler started from main.py's lifespan and read by the prediction endpoints
+forecast_scheduler = ForecastScheduler()
@@ -0,0 +1,171 @@
+"""Wire formats for the /ws stream.
+
+json is the original format: one object per resource per message or, with batch=1,
+one JSON array per tick. The compact encodings always batch a tick into one frame.
+They send values as integers at fixed scales (SCALES), and each record is either a
+full value or a delta against the resource's previous update:
+
+binary, little-endian struct:
+    frame header   <BBI         version, flags (1 = keyframe), record count
+    full record    <BIqiiiiH    0, resource number, epoch ms, cpu, memory, network, cost,
+                                name length; then the UTF-8 resource id
+    delta record   <BIihhhh     1, resource number, ms since the previous update, and the
+                                change in cpu, memory, network, cost
+msgpack:
+    frame          [flags, [record, ...]]
+    full record    [0, resource number, resource id, epoch ms, cpu, memory, network, cost]
+    delta record   [1, resource number, ms since the previous update, dcpu, dmemory, dnetwork, dcost]
+
+Divide values by SCALES. Resource numbers stay stable for the server's lifetime; full
+records carry the resource id, deltas refer to it by number. A keyframe holds a full
+record for every subscribed resource, so a client can always (re)start from one.
+StreamDecoder is a reference client. msgpack is optional and only imported when a
+client asks for it.
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+
+SCALES = (100, 100, 100, 10000)  # cpu, memory, network, cost
+FULL, DELTA = 0, 1
+KEYFRAME = 1
+VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_HEADER = struct.Struct("<BBI")
+_FULL = struct.Struct("<BIqiiiiH")
+_DELTA = struct.Struct("<BIihhhh")
+
+def quantize(micros, cpu, memory, network, cost):
+    """Sample tuple shared by every encoding: (epoch microseconds, *values as scaled ints)"""
+    return (micros, *(int(round(value * scale)) for value, scale in zip((cpu, memory, network, cost), SCALES)))
+
+def _require_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("The msgpack stream encoding needs msgpack: pip install msgpack")
+    return msgpack
+
+class JsonEncoding:
+    """The original frames: a JSON object per resource, always sent in full"""
+    name = "json"
+    binary = False
+
+    def full(self, number, resource_id, sample):
+        micros, cpu, memory, network, cost = sample
+        return json.dumps({
+            "timestamp": (_EPOCH + timedelta(microseconds=micros)).isoformat() + "Z",
+            "resource_id": resource_id,
+            "cpu": cpu / SCALES[0],
+            "memory": memory / SCALES[1],
+            "network": network / SCALES[2],
+            "cost": cost / SCALES[3],
+        }, separators=(",", ":"))
+
+    def delta(self, number, previous, sample):
+        return None
+
+    def frame(self, records, keyframe=False):
+        return "[" + ",".join(records) + "]"
+
+class BinaryEncoding:
+    """Packed struct records (see the module docstring for the layout)"""
+    name = "binary"
+    binary = True
+
+    def full(self, number, resource_id, sample):
+        name = resource_id.encode()
+        return _FULL.pack(FULL, number, sample[0] // 1000, *sample[1:], len(name)) + name
+
+    def delta(self, number, previous, sample):
+        try:
+            return _DELTA.pack(
+                DELTA, number, sample[0] // 1000 - previous[0] // 1000,
+                *(value - old for value, old in zip(sample[1:], previous[1:]))
+            )
+        except struct.error:
+            return None  # A change too large for the delta fields: the caller sends it in full
+
+    def frame(self, records, keyframe=False):
+        return _HEADER.pack(VERSION, KEYFRAME if keyframe else 0, len(records)) + b"".join(records)
+
+class MsgpackEncoding:
+    """msgpack arrays; records are packed once and spliced into each frame"""
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        self._msgpack = _require_msgpack()
+        self._packer = self._msgpack.Packer()
+
+    def full(self, number, resource_id, sample):
+        return self._packer.pack([FULL, number, resource_id, sample[0] // 1000, *sample[1:]])
+
+    def delta(self, number, previous, sample):
+        return self._packer.pack([
+            DELTA, number, sample[0] // 1000 - previous[0] // 1000,
+            *(value - old for value, old in zip(sample[1:], previous[1:]))
+        ])
+
+    def frame(self, records, keyframe=False):
+        packer = self._packer
+        return (packer.pack_array_header(2) + packer.pack(KEYFRAME if keyframe else 0)
+                + packer.pack_array_header(len(records)) + b"".join(records))
+
+ENCODINGS = {"json": JsonEncoding, "binary": BinaryEncoding, "msgpack": MsgpackEncoding}
+_instances = {}
+
+def get_encoding(name):
+    """Shared encoder by name; ValueError if unknown, RuntimeError if its library is missing"""
+    encoding = _instances.get(name)
+    if encoding is None:
+        if name not in ENCODINGS:
+            raise ValueError(f"Unknown stream encoding '{name}', expected one of {', '.join(ENCODINGS)}")
+        encoding = _instances[name] = ENCODINGS[name]()
+    return encoding
+
+def _binary_records(frame):
+    version, flags, count = _HEADER.unpack_from(frame, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary stream version {version}")
+    offset, records = _HEADER.size, []
+    for _ in range(count):
+        if frame[offset] == FULL:
+            kind, number, millis, *values, length = _FULL.unpack_from(frame, offset)
+            offset += _FULL.size
+            name = bytes(frame[offset:offset + length]).decode()
+            offset += length
+            records.append([kind, number, name, millis, *values])
+        else:
+            records.append(list(_DELTA.unpack_from(frame, offset)))
+            offset += _DELTA.size
+    return flags, records
+
+class StreamDecoder:
+    """Rebuilds values from a compact stream: feed it frames in order"""
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.names = {}  # resource number -> resource id
+        self.state = {}  # resource id -> [epoch ms, *scaled values]
+
+    def apply(self, frame):
+        """Decode one frame; returns {resource_id: (epoch ms, cpu, memory, network, cost)} it updated"""
+        if self.encoding == "binary":
+            flags, records = _binary_records(frame)
+        else:
+            flags, records = _require_msgpack().unpackb(frame)
+        if flags & KEYFRAME:
+            self.state.clear()
+        updated = {}
+        for record in records:
+            if record[0] == FULL:
+                _, number, resource_id, *state = record
+                self.names[number] = resource_id
+            else:
+                _, number, *change = record
+                resource_id = self.names[number]  # KeyError: a delta before its full record
+                state = [old + step for old, step in zip(self.state[resource_id], change)]
+            self.state[resource_id] = state
+            updated[resource_id] = (state[0], *(value / scale for value, scale in zip(state[1:], SCALES)))
+        return updated
@@ -0,0 +1,307 @@
+"""Hot-path timings and counters, exposed in Prometheus text format on GET /metrics.
+
+Instrumented code asks this module for a timer, e.g. ``with stage("prediction", "forecast"):``,
+``with inference(model, batch_size):``. While settings.metrics_enabled is off, those calls
+return one shared no-op context manager, and neither the DB query listeners
+(instrument_engine) nor the HTTP middleware is installed, so a disabled build pays
+one flag check per timed block. Components that already keep counters (the prediction
+cache, the /ws hub) register a collector instead. A collector reads those counters
+only when /metrics is scraped, so they cost nothing per request.
+"""
+import threading
+import time
+from bisect import bisect_left
+from config import settings
+
+enabled = settings.metrics_enabled
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response appends the charset
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+class _NullTimer:
+    """Shared do-nothing context manager handed out while metrics are disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("_observe", "_started")
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._started)
+        return False
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self.observe)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        rows, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            rows.append((name + "_bucket", labels + (("le", _format_value(float(bound))),), cumulative))
+        rows.append((name + "_bucket", labels + (("le", "+Inf"),), count))
+        rows.append((name + "_sum", labels, total))
+        rows.append((name + "_count", labels, count))
+        return rows
+
+class _Metric:
+    """A named metric with fixed label names; labels(...) returns the child for one label set"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        rows = []
+        for values, child in sorted(self._children.items()):
+            rows.extend(child.samples(self.name, tuple(zip(self.labelnames, values))))
+        return rows
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+class Family:
+    """Samples for one metric built at scrape time by a collector"""
+    __slots__ = ("name", "kind", "documentation", "rows")
+
+    def __init__(self, name, kind, documentation):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.rows = []
+
+    def add(self, value, **labels):
+        self.rows.append((self.name, tuple(labels.items()), value))
+        return self
+
+    def samples(self):
+        return self.rows
+
+class Registry:
+    """Metrics plus scrape-time collectors, rendered in the Prometheus text exposition format"""
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """collect() -> iterable of Family, called on every scrape"""
+        self._collectors.append(collect)
+
+    def families(self):
+        families = list(self._metrics.values())
+        for collect in self._collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                # One broken collector shouldn't take the whole scrape down
+                print(f"Metrics collector {getattr(collect, '__qualname__', collect)} failed: {e}")
+        return families
+
+    def render(self):
+        lines = []
+        for family in self.families():
+            lines.append(f"# HELP {family.name} {_escape(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for name, labels, value in family.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "optimizer_stage_seconds", "Time spent in each stage of the request pipelines", ("pipeline", "stage")
+)
+INFERENCE_SECONDS = registry.histogram(
+    "optimizer_model_inference_seconds", "Model forward pass time per call", ("model",)
+)
+INFERENCE_BATCH_SIZE = registry.histogram(
+    "optimizer_model_inference_batch_size", "Series per model forward pass", ("model",), SIZE_BUCKETS
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "optimizer_db_query_seconds", "Database statement execution time", ("engine", "operation")
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "optimizer_http_request_seconds", "HTTP request time by route template", ("method", "route", "status")
+)
+ERRORS = registry.counter(
+    "optimizer_stage_errors_total", "Timed stages that raised", ("pipeline", "stage")
+)
+
+class _StageTimer(_Timer):
+    __slots__ = ("_key",)
+
+    def __init__(self, pipeline, name):
+        super().__init__(STAGE_SECONDS.labels(pipeline, name).observe)
+        self._key = (pipeline, name)
+
+    def __exit__(self, exc_type, *exc):
+        super().__exit__(exc_type, *exc)
+        if exc_type is not None:
+            ERRORS.labels(*self._key).inc()
+        return False
+
+def stage(pipeline, name):
+    """Context manager timing one stage of a pipeline into optimizer_stage_seconds"""
+    if not enabled:
+        return NULL_TIMER
+    return _StageTimer(pipeline, name)
+
+def inference(model, batch_size):
+    """Context manager timing one forward pass of a model over batch_size series"""
+    if not enabled:
+        return NULL_TIMER
+    name = type(model).__name__
+    INFERENCE_BATCH_SIZE.labels(name).observe(batch_size)
+    return INFERENCE_SECONDS.labels(name).time()
+
+def instrument_engine(engine, name):
+    """Time every statement the engine (a sync Engine; async_engine.sync_engine for async) executes"""
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("telemetry_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["telemetry_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "unknown"
+        DB_QUERY_SECONDS.labels(name, operation).observe(time.perf_counter() - started)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing HTTP requests per route template (never the raw path)"""
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None  # endpoint -> path template, built on first use
+
+    def _route(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            app = scope.get("app")
+            self._route_paths = {getattr(r, "endpoint", None): r.path for r in getattr(app, "routes", ())}
+        return self._route_paths.get(endpoint, getattr(endpoint, "__name__", "unknown"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched endpoint in the shared scope
+            HTTP_REQUEST_SECONDS.labels(scope["method"], self._route(scope), status[0]).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read at import time, so point the app at throwaway storage before any app module loads
+_tmp = tempfile.mkdtemp(prefix="optimizer-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("MODEL_DIR", os.path.join(_tmp, "models"))
+os.environ.setdefault("TRAIN_ON_MISSING_MODEL", "false")
+os.environ.setdefault("MODEL_WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("FORECAST_SCHEDULER_ENABLED", "false")
+os.environ.setdefault("COMPACTION_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
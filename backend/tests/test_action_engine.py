@@ -0,0 +1,41 @@
+import itertools
+
+import numpy as np
+
+from services.action_engine import ActionEngine, MAX_INSTANCES
+
+def _grid(engine):
+    """(cpu, memory, instances, confidence) rows around every decision boundary"""
+    confidences = [0.0, 0.35, 0.7, 0.95, 1.0]
+    utilizations = set(np.linspace(0, 100, 41).tolist())
+    for confidence in confidences:
+        for threshold in (engine.scale_up_threshold + (1 - confidence) * 10,
+                          engine.scale_down_threshold - (1 - confidence) * 10):
+            utilizations.update(threshold + offset for offset in (-1e-9, 0.0, 1e-9, -0.5, 0.5))
+    # Urgency bands and the truncation steps of optimal_instances
+    utilizations.update(65 + offset for offset in (-20, -10, 10, 20))
+    utilizations.update(70 * k / n for n in range(1, MAX_INSTANCES + 1) for k in range(1, n + 1))
+    for avg, instances, confidence in itertools.product(sorted(utilizations), range(1, MAX_INSTANCES + 1), confidences):
+        # Uneven CPU/memory splits must average to the same utilization in both paths
+        yield avg, avg, instances, confidence
+        yield avg + 7.25, avg - 7.25, instances, confidence
+
+def test_batch_actions_match_scalar_get_action():
+    engine = ActionEngine()
+    cpu, memory, instances, confidence = map(np.array, zip(*_grid(engine)))
+    actions = engine.get_actions(cpu, memory, instances, confidence, with_reasons=True)
+    assert {"Scale Up", "Scale Down", "Maintain"} <= set(actions["action"].tolist())
+
+    for i in range(len(cpu)):
+        expected = engine.get_action(cpu[i].item(), memory[i].item(), instances[i].item(), confidence[i].item())
+        assert ActionEngine.action_at(actions, i) == expected, (cpu[i], memory[i], instances[i], confidence[i])
+
+def test_batch_cost_impact_matches_scalar():
+    calculator = ActionEngine().cost_calculator
+    utilization = np.concatenate([np.linspace(0, 120, 241), 70 * np.arange(1, 11) / 7])
+    current, new, avg = map(np.ravel, np.meshgrid(np.arange(1, MAX_INSTANCES + 1), [1, 2, 5, MAX_INSTANCES], utilization))
+    batch = calculator.calculate_scaling_cost_impact_batch(current, new, avg)
+
+    for i in range(len(avg)):
+        expected = calculator.calculate_scaling_cost_impact(current[i].item(), new[i].item(), avg[i].item())
+        assert {name: values[i].item() for name, values in batch.items()} == expected, (current[i], new[i], avg[i])
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from sqlalchemy import select
+
+from database import SessionLocal, MetricRecord
+from services.archive import archive_files, export_metrics, iter_archive_series, read_archive, write_metric_rows
+from services.ingest import write_metrics_batch
+
+START = datetime(2025, 3, 1)
+
+def test_overlapping_part_files_are_read_once(client, tmp_path):
+    # Three resources over two days
+    rows = [
+        {"resource_id": f"arch-{r}", "timestamp": START + timedelta(minutes=20 * i), "cpu_utilization": float(i),
+         "memory_utilization": 50.0, "network_io": 1.0, "cost": 0.1, "instance_count": 1}
+        for i in range(144) for r in range(3)
+    ]
+    client.portal.call(write_metrics_batch, rows)
+    end = START + timedelta(days=2)
+    archive_dir = str(tmp_path)
+
+    # Compaction archives the first 30 hours, then an export covers the whole range again
+    with SessionLocal() as db:
+        expired = db.execute(select(MetricRecord.__table__).where(
+            MetricRecord.timestamp >= START, MetricRecord.timestamp < START + timedelta(hours=30)
+        ).order_by(MetricRecord.id)).all()
+    write_metric_rows(expired, archive_dir)
+    # And an export that starts mid-day
+    export_metrics(archive_dir, START + timedelta(hours=12), end)
+    export_metrics(archive_dir, START, end)
+    assert len(archive_files(archive_dir)) > 2
+
+    archived = read_archive(["id", "resource_id", "cpu_utilization"], archive_dir, START, end)
+    assert len(archived["id"]) == len(rows)
+    assert len(np.unique(archived["id"])) == len(rows)
+    assert np.all(np.diff(archived["id"]) > 0)
+
+    series = {}
+    for resource_id, values in iter_archive_series("cpu_utilization", archive_dir, START, end):
+        series.setdefault(resource_id, []).append(values)
+    for r in range(3):
+        np.testing.assert_array_equal(np.concatenate(series[f"arch-{r}"]), np.arange(144, dtype=np.float32))
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from config import settings
+from database import AsyncSessionLocal, MetricRecord
+from services.compaction import Compactor
+from services.ingest import write_metrics_batch
+from services.rollups import rebuild_rollups
+
+async def _count(resource_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(func.count()).select_from(MetricRecord).where(MetricRecord.resource_id == resource_id)
+        )).scalar()
+
+def _row(resource_id, timestamp):
+    return {"resource_id": resource_id, "timestamp": timestamp, "cpu_utilization": 50.0, "memory_utilization": 60.0,
+            "network_io": 1.0, "cost": 0.1, "instance_count": 1}
+
+async def _insert_raw_only(rows):
+    """Rows written before rollups existed"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(MetricRecord), rows)
+        await db.commit()
+
+def test_raw_metrics_without_rollups_are_kept(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_retention_days", 7.0)
+    old = datetime.utcnow() - timedelta(days=30)
+
+    async def scenario():
+        await _insert_raw_only([_row("legacy", old + timedelta(minutes=i)) for i in range(10)])
+        # Rows ingested since then are rolled up as they arrive
+        await write_metrics_batch([_row("legacy", datetime.utcnow())])
+        compactor = Compactor()
+        await compactor.compact()
+        assert await _count("legacy") == 11
+
+        # Once backfilled, the rollups carry the history and the raw rows can go
+        await rebuild_rollups()
+        await compactor.compact()
+        assert await _count("legacy") == 1
+
+    client.portal.call(scenario)
+
+def test_rollups_of_one_resource_do_not_cover_another(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_retention_days", 7.0)
+    old = datetime.utcnow() - timedelta(days=40)
+
+    async def scenario():
+        # "backfilled" has rollups for the old window; "unrolled" has raw rows in the same window only
+        await write_metrics_batch([_row("backfilled", old + timedelta(minutes=i)) for i in range(10)])
+        await _insert_raw_only([_row("unrolled", old + timedelta(minutes=i)) for i in range(10)])
+        await write_metrics_batch([_row("unrolled", datetime.utcnow())])
+        await Compactor().compact()
+        assert await _count("backfilled") == 0
+        assert await _count("unrolled") == 11
+
+    client.portal.call(scenario)
@@ -0,0 +1,21 @@
+from services.ingest import ingest_buffer
+from config import settings
+
+def test_stats_report_the_newest_ingested_sample(client):
+    samples = [
+        {"resource_id": "stats-test", "timestamp": f"2026-10-18T12:0{i}:00Z", "cpu": 30.0 + i, "memory": 50.0 + i,
+         "network": 2.0 + i, "instance_count": 3}
+        for i in range(3)
+    ]
+    assert client.post("/api/metrics/ingest", json=samples).status_code == 200
+    client.portal.call(ingest_buffer.flush)
+
+    response = client.get("/api/dashboard/stats", params={"resource_id": "stats-test"})
+    assert response.status_code == 200, response.text
+    stats = response.json()
+    assert (stats["current_cpu"], stats["current_memory"], stats["current_network"]) == (32.0, 52.0, 4.0)
+
+def test_stats_simulate_only_the_default_resource(client):
+    assert client.get("/api/dashboard/stats", params={"resource_id": settings.default_resource_id}).status_code == 200
+    response = client.get("/api/dashboard/stats", params={"resource_id": "stats-unknown"})
+    assert response.status_code == 404
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from config import settings
+from schemas import MetricIngest
+from services import ingest
+
+def test_aware_timestamp_is_stored_as_naive_utc():
+    item = MetricIngest.model_validate_json('{"timestamp": "2026-10-18T14:00:00+02:00", "cpu": 10, "memory": 20}')
+    assert item.timestamp == datetime(2026, 10, 18, 12, 0, 0)
+
+def test_ingest_and_query_with_utc_designator(client):
+    sample = {"resource_id": "tz-test", "timestamp": "2026-10-18T12:00:00Z", "cpu": 42.0, "memory": 58.0}
+    response = client.post("/api/metrics/ingest", json=[sample])
+    assert response.status_code == 200, response.text
+    assert response.json()["accepted"] == 1
+
+    response = client.get("/api/metrics/history", params={
+        "resource_id": "tz-test", "start": "2026-10-18T11:00:00Z", "end": "2026-10-18T13:00:00Z"
+    })
+    assert response.status_code == 200, response.text
+    rows = response.json()
+    assert [row["timestamp"] for row in rows] == ["2026-10-18T12:00:00"]
+    assert rows[0]["cpu"] == 42.0
+
+def test_non_finite_values_are_rejected():
+    with pytest.raises(ValidationError):
+        MetricIngest.model_validate_json('{"cpu": NaN, "memory": 20}')
+
+def test_ndjson_line_without_newline_is_capped(client):
+    body = b'{"cpu": 1, "memory": 2}\n' + b" " * (settings.ingest_max_line_bytes + 1)
+    response = client.post("/api/metrics/ingest/ndjson", content=body)
+    assert response.status_code == 413
+    assert "Line 2" in response.json()["detail"]
+
+def test_failed_batch_is_retried_alone_then_dropped(monkeypatch):
+    calls = []
+
+    async def write(rows):
+        calls.append([row["resource_id"] for row in rows])
+        if rows[0]["resource_id"] == "bad":
+            raise RuntimeError("database is locked")
+        return len(rows)
+
+    monkeypatch.setattr(ingest, "write_metrics_batch", write)
+    buffer = ingest.WriteBehindBuffer(max_rows=100, flush_interval=1.0, max_attempts=2)
+    rows = lambda resource_id: ingest.to_metric_rows([MetricIngest(resource_id=resource_id, cpu=1, memory=2)])
+
+    async def scenario():
+        await buffer.add(rows("bad"))
+        assert await buffer.flush() == 0
+        assert buffer.pending == 1
+        # New rows are written on their own while the failed batch waits for its retry
+        await buffer.add(rows("good"))
+        assert await buffer.flush() == 1
+        assert calls == [["bad"], ["good"]]
+        await buffer.flush(retry_all=True)
+        assert calls[-1] == ["bad"]
+
+    asyncio.run(scenario())
+    assert buffer.pending == 0
+    assert buffer.rows_dropped == 1
+    assert buffer.rows_flushed == 1
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from model.lstm_model import LSTMModel
+from model.numpy_engine import NumpyLSTMEngine, export_weights
+
+@pytest.mark.parametrize("horizon", [1, 3])
+def test_numpy_engine_matches_keras(tmp_path, horizon):
+    lstm_model = LSTMModel(horizon=horizon, load=False)
+    lstm_model.model = lstm_model._build_model((lstm_model.sequence_length, 1))
+    engine = NumpyLSTMEngine(export_weights(lstm_model, str(tmp_path / "weights.npz")))
+
+    X = np.random.default_rng(0).uniform(10, 95, (64, lstm_model.sequence_length, 1)).astype(np.float32)
+    expected = lstm_model.model.predict(X, verbose=0)
+    actual = engine._forward(X)
+    assert actual.shape == expected.shape == (64, horizon)
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-4)
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from config import settings
+from services import forecasting, prediction_cache as cache_module
+from services.prediction_cache import PredictionCache
+from services.recent import RecentMetrics
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # Now "b" is the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    cache = PredictionCache(max_entries=10, ttl=60)
+    cache.put("a", 1)
+    clock.now += 59.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert cache.expirations == 1 and len(cache) == 0
+
+    calls = []
+    async def compute():
+        calls.append(clock.now)
+        return len(calls)
+    assert asyncio.run(cache.get_or_compute("b", compute)) == 1
+    assert asyncio.run(cache.get_or_compute("b", compute)) == 1
+    clock.now += 60
+    assert asyncio.run(cache.get_or_compute("b", compute)) == 2
+
+def test_new_sample_bumps_the_version_and_misses_the_cache(monkeypatch):
+    buffers = RecentMetrics()
+    cache = PredictionCache(max_entries=10, ttl=60)
+    calls = []
+    async def forecast(cpu_data, memory_data, model_name="lstm"):
+        calls.append(cpu_data[-1])
+        return float(cpu_data[-1]), float(memory_data[-1]), 0.9
+    monkeypatch.setattr(forecasting, "recent_metrics", buffers)
+    monkeypatch.setattr(forecasting, "prediction_cache", cache)
+    monkeypatch.setattr(forecasting, "forecast_next_async", forecast)
+
+    start = datetime(2026, 10, 18)
+    def ingest(i):
+        buffers.extend([{"resource_id": "cache-test", "timestamp": start + timedelta(minutes=i),
+                         "cpu_utilization": 40.0 + i, "memory_utilization": 50.0, "instance_count": 2}])
+    for i in range(settings.sequence_length):
+        ingest(i)
+
+    first = asyncio.run(forecasting.predict_resource("cache-test"))
+    assert asyncio.run(forecasting.predict_resource("cache-test")) is first
+    assert (cache.misses, cache.hits, len(calls)) == (1, 1, 1)
+
+    ingest(settings.sequence_length)
+    second = asyncio.run(forecasting.predict_resource("cache-test"))
+    assert second is not first
+    assert second["predicted_cpu"] == 40.0 + settings.sequence_length
+    assert (cache.misses, cache.hits, len(calls)) == (2, 1, 2)
@@ -0,0 +1,22 @@
+from config import settings
+from services.ingest import ingest_buffer
+
+def test_actions_default_to_the_reported_instance_count(client):
+    samples = [
+        {"resource_id": "instances-test", "timestamp": f"2026-10-18T12:{i:02d}:00Z", "cpu": 60.0 + i, "memory": 55.0,
+         "instance_count": 4}
+        for i in range(settings.sequence_length)
+    ]
+    assert client.post("/api/metrics/ingest", json=samples).status_code == 200
+    client.portal.call(ingest_buffer.flush)
+
+    for path, field in (("/api/predict/action", None), ("/api/predict/horizon", "action_details")):
+        response = client.get(path, params={"resource_id": "instances-test"})
+        assert response.status_code == 200, response.text
+        action = response.json()[field] if field else response.json()
+        assert action["current_instances"] == 4
+
+        # An explicit query parameter still overrides it
+        response = client.get(path, params={"resource_id": "instances-test", "current_instances": 2})
+        action = response.json()[field] if field else response.json()
+        assert action["current_instances"] == 2
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from datetime import datetime
+
+from services import profiler
+from services.profiler import Profile, request_profiler
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+async def _profiled_request():
+    profile_id = request_profiler.start()
+    started = time.perf_counter()
+    _busy(0.05)
+    await asyncio.sleep(0.05)
+    await asyncio.to_thread(_busy, 0.05)
+    request_profiler.stop(profile_id, "GET", "/test", 200, "header", datetime.utcnow(), time.perf_counter() - started)
+    return profile_id
+
+def test_captured_profile_renders_as_collapsed_and_speedscope(client):
+    profile_id = client.portal.call(_profiled_request)
+
+    response = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "collapsed"})
+    assert response.status_code == 200, response.text
+    lines = response.text.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_profiled_request" in line for line in lines)
+
+    response = client.get(f"/api/admin/profiles/{profile_id}", params={"format": "speedscope"})
+    assert response.status_code == 200, response.text
+    document = response.json()
+    frames = document["shared"]["frames"]
+    sampled = document["profiles"][0]
+    assert len(sampled["samples"]) == len(sampled["weights"]) > 0
+    assert all(0 <= index < len(frames) for sample in sampled["samples"] for index in sample)
+    assert any(frame["name"].endswith("_profiled_request") for frame in frames)
+
+class _OldCode:
+    """Stands in for a code object from before Python 3.11, which has no co_qualname"""
+    co_name = "handler"
+    co_filename = "routers/example.py"
+    co_firstlineno = 12
+
+def test_frame_names_without_co_qualname():
+    code = _OldCode()
+    profile = Profile(1, "GET", "/x", 200, "sampled", datetime.utcnow(), 0.01, {(code, "[await Future]"): [3, 0.01]}, 3)
+    assert profile.collapsed() == "handler (routers/example.py:12);[await Future] 3\n"
+    assert profile.speedscope()["shared"]["frames"][0] == {"name": "handler", "file": "routers/example.py", "line": 12}
+    assert profiler._frame_name(code) == "handler (routers/example.py:12)"
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from database import SessionLocal, MetricRecord
+from services.recent import RecentMetrics, RingBuffer, CPU, INSTANCES, FIELDS
+
+def _values(samples):
+    return np.array([[float(s), 50.0 + s, 1.0, 2.0] for s in samples]).T
+
+def test_window_stays_contiguous_across_the_wrap_point():
+    buffer = RingBuffer(4)
+    for sample in range(11):
+        buffer.extend(np.array([sample]), _values([sample]))
+        expected = list(range(max(0, sample - 3), sample + 1))
+        assert buffer.window(CPU).tolist() == expected
+        # Windows shorter than the ring start mid-ring and cross the wrap point at some step
+        assert buffer.window(CPU, 3).tolist() == expected[-3:]
+        assert np.shares_memory(buffer.window(CPU), buffer._values)
+    assert len(buffer) == 4
+    assert buffer.latest() == (10, [10.0, 60.0, 1.0, 2.0])
+
+def test_batches_wrap_and_late_rows_are_merged_in_time_order():
+    buffer = RingBuffer(4)
+    buffer.extend(np.arange(3), _values(range(3)))
+    # A batch that wraps the ring, then one longer than the ring: only the newest samples are kept
+    buffer.extend(np.arange(3, 6), _values(range(3, 6)))
+    assert buffer.window(CPU).tolist() == [2.0, 3.0, 4.0, 5.0]
+    buffer.extend(np.arange(6, 13), _values(range(6, 13)))
+    assert buffer.window(CPU).tolist() == [9.0, 10.0, 11.0, 12.0]
+
+    buffer.extend(np.array([10, 14]), _values([10.5, 14]))
+    assert buffer.window(CPU).tolist() == [10.5, 11.0, 12.0, 14.0]
+
+def test_rehydrate_loads_each_window_oldest_first(client):
+    start = datetime(2026, 10, 18, 12)
+    # Inserted newest first, so id order is the reverse of time order
+    rows = [
+        {"resource_id": "rehydrate-test", "timestamp": start + timedelta(minutes=i), "cpu_utilization": float(i),
+         "memory_utilization": 50.0, "network_io": None, "instance_count": 3 if i == 7 else 2}
+        for i in reversed(range(8))
+    ]
+    with SessionLocal() as db:
+        db.execute(insert(MetricRecord), rows)
+        db.commit()
+
+    buffers = RecentMetrics(capacity=5)
+    with SessionLocal() as db:
+        buffers.rehydrate(db)
+    buffer = buffers.get("rehydrate-test")
+    assert buffer.window(CPU).tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert buffer.window(FIELDS.index("network_io")).tolist() == [0.0] * 5
+    assert buffer.window(INSTANCES, 1).tolist() == [3.0]
+    assert buffers.snapshot("rehydrate-test")[1] == 3
@@ -0,0 +1,66 @@
+import os
+import time
+
+from config import settings
+from model import registry
+from model.registry import ModelRegistry
+
+class _FakeProcess:
+    spawned = []
+
+    def __init__(self, command, env=None):
+        self.returncode = None
+        _FakeProcess.spawned.append(self)
+
+    def poll(self):
+        return self.returncode
+
+def _worker():
+    """A registry as a separate API worker process would build it"""
+    worker = ModelRegistry()
+    worker.register("lstm", lambda: None, fallback=lambda: None)
+    return worker
+
+def test_one_worker_spawns_training_and_releases_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "model_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "train_on_missing_model", True)
+    monkeypatch.setattr(registry.subprocess, "Popen", _FakeProcess)
+    _FakeProcess.spawned = []
+    first, second = _worker(), _worker()
+
+    first._start_training("lstm")
+    second._start_training("lstm")
+    first._start_training("lstm")
+    assert len(_FakeProcess.spawned) == 1
+
+    # Still running: checking for the artifact leaves the lock in place
+    first.reload_if_changed()
+    second._start_training("lstm")
+    assert len(_FakeProcess.spawned) == 1
+
+    # The finished worker is reaped on the next artifact check and the lock is released
+    _FakeProcess.spawned[0].returncode = 1
+    first.reload_if_changed()
+    assert "lstm" not in first._training
+    assert not os.path.exists(first._lock_path("lstm"))
+    second._start_training("lstm")
+    assert len(_FakeProcess.spawned) == 2
+
+def test_stale_training_lock_is_taken_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "model_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "train_on_missing_model", True)
+    monkeypatch.setattr(registry.subprocess, "Popen", _FakeProcess)
+    _FakeProcess.spawned = []
+    worker = _worker()
+
+    lock_path = worker._lock_path("lstm")
+    open(lock_path, "w").close()
+    worker._start_training("lstm")
+    assert not _FakeProcess.spawned
+
+    # Left behind by a worker that died before reaping its training run
+    expired = time.time() - settings.training_lock_timeout - 1
+    os.utime(lock_path, (expired, expired))
+    worker._start_training("lstm")
+    assert len(_FakeProcess.spawned) == 1
+    assert os.path.exists(lock_path)
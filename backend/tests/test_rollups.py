@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import delete, select, update
+
+from database import AsyncSessionLocal, MetricRecord, MetricRollup
+from services.ingest import write_metrics_batch
+from services.rollups import RESOLUTIONS, rebuild_rollups
+
+START = datetime(2026, 1, 5)
+
+def _samples(resource_id, minutes, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {"resource_id": resource_id, "timestamp": START + timedelta(minutes=m, seconds=int(s)),
+         "cpu_utilization": float(c), "memory_utilization": float(mem), "network_io": float(n), "cost": 0.25,
+         "instance_count": 1}
+        for m, s, c, mem, n in zip(minutes.tolist(), rng.integers(0, 60, len(minutes)).tolist(), rng.uniform(0, 100, len(minutes)),
+                                   rng.uniform(0, 100, len(minutes)), rng.uniform(0, 1000, len(minutes)))
+    ]
+
+async def _rollups(resource_id, resolution):
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(MetricRollup).where(
+            MetricRollup.resource_id == resource_id, MetricRollup.resolution == resolution
+        ).order_by(MetricRollup.bucket_start))).scalars().all()
+    return {row.bucket_start: row for row in rows}
+
+@pytest.fixture(scope="module")
+def ingested(client):
+    # Two samples a minute for two days, written in 90-minute batches so every bucket is merged across batches
+    minutes = np.repeat(np.arange(2 * 24 * 60), 2)
+    rows = _samples("rollup-test", minutes, seed=1)
+    for i in range(0, len(rows), 180):
+        client.portal.call(write_metrics_batch, rows[i:i + 180])
+    return rows
+
+@pytest.mark.parametrize("resolution", list(RESOLUTIONS))
+def test_merged_buckets_match_raw_data(client, ingested, resolution):
+    width = timedelta(seconds=RESOLUTIONS[resolution])
+    expected = {}
+    for row in ingested:
+        bucket = START + (row["timestamp"] - START) // width * width
+        expected.setdefault(bucket, []).append(row)
+    buckets = client.portal.call(_rollups, "rollup-test", resolution)
+    assert sorted(buckets) == sorted(expected)
+    for bucket, rows in expected.items():
+        stored = buckets[bucket]
+        assert stored.samples == len(rows)
+        for metric, column in (("cpu", "cpu_utilization"), ("memory", "memory_utilization"), ("network", "network_io")):
+            values = np.array([row[column] for row in rows])
+            assert getattr(stored, f"{metric}_min") == values.min()
+            assert getattr(stored, f"{metric}_max") == values.max()
+            assert getattr(stored, f"{metric}_avg") == pytest.approx(values.mean(), rel=1e-9)
+        assert stored.cost_avg == pytest.approx(0.25)
+
+@pytest.mark.parametrize("resolution", list(RESOLUTIONS))
+def test_merged_p95_is_within_sketch_accuracy(client, ingested, resolution):
+    width = timedelta(seconds=RESOLUTIONS[resolution])
+    expected = {}
+    for row in ingested:
+        bucket = START + (row["timestamp"] - START) // width * width
+        expected.setdefault(bucket, []).append(row)
+    buckets = client.portal.call(_rollups, "rollup-test", resolution)
+    errors = {"cpu": [], "network": []}
+    for bucket, rows in expected.items():
+        for metric, column in (("cpu", "cpu_utilization"), ("network", "network_io")):
+            exact = np.percentile([row[column] for row in rows], 95)
+            errors[metric].append((getattr(buckets[bucket], f"{metric}_p95") - exact) / exact)
+    # 1% bin accuracy plus the gap to the neighbouring sample, with no systematic bias beyond the bin error
+    for metric, relative in errors.items():
+        assert np.max(np.abs(relative)) < 0.02, metric
+        assert abs(np.mean(relative)) < 0.01, metric
+
+def test_buckets_without_sketch_still_merge(client):
+    async def clear_sketches():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(MetricRollup).where(MetricRollup.resource_id == "legacy-rollup").values(
+                cpu_sketch=None, memory_sketch=None, network_sketch=None
+            ))
+            await db.commit()
+
+    client.portal.call(write_metrics_batch, _samples("legacy-rollup", np.arange(30), seed=2))
+    client.portal.call(clear_sketches)
+    rows = _samples("legacy-rollup", np.arange(30, 60), seed=3)
+    client.portal.call(write_metrics_batch, rows)
+    hour = client.portal.call(_rollups, "legacy-rollup", "1h")[START]
+    assert hour.samples == 60
+    assert hour.cpu_min <= hour.cpu_p95 <= hour.cpu_max
+    assert hour.cpu_sketch is not None
+
+def test_rebuild_keeps_history_of_pruned_raw_rows(client):
+    # 36 hours for one resource; retention then prunes raw rows up to 07:30 on the second day
+    rows = _samples("pruned", np.arange(36 * 60), seed=4)
+    for i in range(0, len(rows), 500):
+        client.portal.call(write_metrics_batch, rows[i:i + 500])
+    summary = lambda: {
+        resolution: {bucket: (row.samples, row.cpu_min, row.cpu_max) for bucket, row in
+                     client.portal.call(_rollups, "pruned", resolution).items()}
+        for resolution in ("1h", "1d")
+    }
+    before = summary()
+
+    async def prune():
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MetricRecord).where(
+                MetricRecord.resource_id == "pruned", MetricRecord.timestamp < START + timedelta(hours=31, minutes=30)
+            ))
+            await db.commit()
+
+    client.portal.call(prune)
+    client.portal.call(rebuild_rollups)
+    assert summary() == before
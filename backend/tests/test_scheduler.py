@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from services import scheduler
+from services.recent import RecentMetrics
+from services.scheduler import ForecastScheduler
+
+def _rows(resource_id, start, count):
+    return [
+        {"resource_id": resource_id, "timestamp": start + timedelta(minutes=i), "cpu_utilization": 40.0 + i % 7,
+         "memory_utilization": 55.0 + i % 5, "network_io": 1.0, "instance_count": 2}
+        for i in range(count)
+    ]
+
+def test_only_changed_windows_are_persisted(client, monkeypatch):
+    buffers = RecentMetrics()
+    monkeypatch.setattr(scheduler, "recent_metrics", buffers)
+    start = datetime(2026, 10, 18)
+    buffers.extend(_rows("a", start, buffers.capacity) + _rows("b", start, buffers.capacity))
+    forecasts = ForecastScheduler(persist=True)
+
+    client.portal.call(forecasts.run_cycle)
+    assert forecasts.records_persisted == 2
+    # Nothing was ingested: the forecasts are the same, so nothing is stored again
+    client.portal.call(forecasts.run_cycle)
+    assert forecasts.records_persisted == 2
+
+    buffers.extend(_rows("b", start + timedelta(days=1), 1))
+    snapshot = client.portal.call(forecasts.run_cycle)
+    assert forecasts.records_persisted == 3
+    assert len(snapshot) == 2
@@ -0,0 +1,61 @@
+import pytest
+
+from services.broadcast import BroadcastHub
+from services.stream_encoding import SCALES, StreamDecoder, quantize
+
+RESOURCES = ("stream-a", "stream-b")
+
+def _sample(tick, resource):
+    offset = RESOURCES.index(resource) * 10
+    # Tick 3 moves network further than a binary delta field can hold, so it is resent in full
+    network = 500.0 if tick >= 3 else 1.5 + tick
+    return quantize((1_700_000_000 + tick) * 1_000_000, 40.0 + offset + tick * 0.37, 55.5 - tick, network, 0.1234 + tick / 1000)
+
+def _expected(sample):
+    return (sample[0] // 1000, *(value / scale for value, scale in zip(sample[1:], SCALES)))
+
+def _tick(hub, tick, keyframe=False):
+    updates = {resource: (hub._latest.get(resource), _sample(tick, resource)) for resource in RESOURCES}
+    hub._latest.update({resource: sample for resource, (_, sample) in updates.items()})
+    hub.publish(updates, keyframe=keyframe)
+
+def _drain(subscriber):
+    frames = list(subscriber.queue)
+    subscriber.queue.clear()
+    return frames
+
+@pytest.mark.parametrize("encoding", ["binary", "msgpack"])
+def test_delta_stream_round_trip_and_resync(encoding):
+    if encoding == "msgpack":
+        pytest.importorskip("msgpack")
+    hub = BroadcastHub(queue_size=3, keyframe_interval=1000)
+    hub._latest.update({resource: _sample(0, resource) for resource in RESOURCES})
+    subscriber = hub.subscribe(set(RESOURCES), encoding=encoding, delta=True)
+    decoder = StreamDecoder(encoding)
+    [keyframe] = _drain(subscriber)
+    assert decoder.apply(keyframe) == {resource: _expected(_sample(0, resource)) for resource in RESOURCES}
+
+    for tick in range(1, 5):
+        _tick(hub, tick)
+        [frame] = _drain(subscriber)
+        if tick != 3:
+            assert len(frame) < len(keyframe)  # Deltas, not full records
+        assert decoder.apply(frame) == {resource: _expected(_sample(tick, resource)) for resource in RESOURCES}
+
+    # A lost frame leaves the client's state wrong until the next keyframe
+    _tick(hub, 5)
+    _drain(subscriber)
+    _tick(hub, 6)
+    assert decoder.apply(_drain(subscriber)[0]) != {resource: _expected(_sample(6, resource)) for resource in RESOURCES}
+    _tick(hub, 7, keyframe=True)
+    assert decoder.apply(_drain(subscriber)[0]) == {resource: _expected(_sample(7, resource)) for resource in RESOURCES}
+
+    # A client that falls behind has its queue dropped on overflow and resyncs from a keyframe
+    for tick in range(8, 12):
+        _tick(hub, tick)
+    [frame] = _drain(subscriber)
+    assert subscriber.dropped == 3
+    assert decoder.apply(frame) == {resource: _expected(_sample(11, resource)) for resource in RESOURCES}
+    _tick(hub, 12)
+    assert decoder.apply(_drain(subscriber)[0]) == {resource: _expected(_sample(12, resource)) for resource in RESOURCES}
+    assert decoder.state == {resource: [_sample(12, resource)[0] // 1000, *_sample(12, resource)[1:]] for resource in RESOURCES}
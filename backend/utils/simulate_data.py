@@ -1,60 +1,122 @@
+"""Synthetic utilization data for demos, benchmarks and load tests.
+
+FleetSimulator produces (resources x timesteps) matrices in one shot. Its random
+numbers are a counter-based hash of (seed, resource, step, variable) rather than a
+stateful generator, so every resource has its own independent stream. Any block of
+the matrix comes out the same whatever order or chunk size it is generated in, and
+resource i's series doesn't depend on how many resources are simulated. DataSimulator,
+behind the demo endpoints, is one such resource clocked by wall time, so callers
+never advance each other's series.
+"""
+import time
+from datetime import datetime
 import numpy as np
-from datetime import datetime, timedelta
-import random
+
+METRICS = ("cpu", "memory", "network")
+_VARIANCE = {"cpu": 15.0, "memory": 12.0, "network": 10.0}
+_VARS_PER_METRIC = 5  # Two uniforms for the normal noise; spike chance, direction and size
+_PROFILE = np.uint64(0x5EED5EED5EED5EED)  # Salts the per-resource profile away from the step streams
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+def _mix(x):
+    """splitmix64 finalizer on a uint64 array (wrapping arithmetic)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _uniforms(keys, counters):
+    """(len(keys), len(counters)) uniforms in [0, 1), one per (resource key, counter) pair"""
+    bits = _mix(keys[:, None] ^ _mix(counters * _GOLDEN)[None, :])
+    return (bits >> np.uint64(11)) * (1.0 / (1 << 53))
+
+class FleetSimulator:
+    """Vectorized synthetic metrics for a fleet of resources with independent seeded streams"""
+    def __init__(self, n_resources, seed=0, resource_ids=None, base_cpu=60.0, base_memory=55.0, base_network=45.0):
+        self.resource_ids = list(resource_ids) if resource_ids is not None else [f"sim-{i:05d}" for i in range(n_resources)]
+        self.base_cpu = base_cpu
+        self.base_memory = base_memory
+        self.base_network = base_network
+        with np.errstate(over="ignore"):
+            self._keys = _mix(_mix(np.arange(1, len(self.resource_ids) + 1, dtype=np.uint64))
+                              ^ _mix(np.array([seed], dtype=np.uint64) * _GOLDEN))
+            # Per-resource profile: level offsets, pattern phase and instance count
+            profile = _uniforms(self._keys ^ _PROFILE, np.arange(5, dtype=np.uint64))
+        self.offsets = {metric: (profile[:, i:i + 1] - 0.5) * 20 for i, metric in enumerate(METRICS)}
+        self.phases = profile[:, 3:4] * 40 * np.pi
+        self.instance_counts = 1 + (profile[:, 4] * 4).astype(np.int64)
+
+    def __len__(self):
+        return len(self.resource_ids)
+
+    def generate(self, start, steps, metrics=METRICS):
+        """{metric: (resources, steps) float64} for steps start .. start + steps - 1
+
+        The same pattern as the original per-value simulator: base level, trend and
+        seasonal waves, normal noise, and 10% spikes, clamped to 10-95.
+        """
+        t = np.arange(start, start + steps, dtype=np.int64)
+        waves = np.sin((t + self.phases) / 20.0) * 10 + np.sin((t + self.phases) / 10.0) * 8
+        bases = {"cpu": self.base_cpu, "memory": self.base_memory, "network": self.base_network}
+        counters = t.astype(np.uint64) * np.uint64(len(METRICS) * _VARS_PER_METRIC)
+        result = {}
+        with np.errstate(over="ignore"):
+            for metric in metrics:
+                first = np.uint64(METRICS.index(metric) * _VARS_PER_METRIC)
+                u = [_uniforms(self._keys, counters + first + np.uint64(i)) for i in range(_VARS_PER_METRIC)]
+                # Box-Muller: 1 - u keeps the log argument in (0, 1]
+                noise = np.sqrt(-2.0 * np.log1p(-u[0])) * np.cos(2 * np.pi * u[1]) * (_VARIANCE[metric] / 3)
+                spike = np.where(u[3] > 0.5, 20 + 20 * u[4], -(10 + 10 * u[4])) * (u[2] < 0.1)
+                result[metric] = np.clip(bases[metric] + self.offsets[metric] + waves + noise + spike, 10, 95)
+        return result
 
 class DataSimulator:
-    def __init__(self):
-        self.base_cpu = 60.0
-        self.base_memory = 55.0
-        self.trend = 0.0
-        self.time_step = 0
-        
-    def _generate_realistic_pattern(self, base_value, variance=15.0, trend_factor=0.1):
-        """Generate realistic time-series data with trends and patterns"""
-        # Add some trend
-        trend = np.sin(self.time_step / 20.0) * 10
-        seasonal = np.sin(self.time_step / 10.0) * 8
-        
-        # Add some noise
-        noise = np.random.normal(0, variance / 3)
-        
-        # Add occasional spikes
-        spike = 0
-        if random.random() < 0.1:  # 10% chance of spike
-            spike = random.uniform(20, 40) if random.random() > 0.5 else -random.uniform(10, 20)
-        
-        value = base_value + trend + seasonal + noise + spike
-        self.time_step += 1
-        
-        # Clamp to realistic range
-        return max(10, min(95, value))
-    
+    """One simulated resource for the demo endpoints, one step per step_seconds of wall time
+
+    Every call reads the series at the current step instead of advancing a shared counter,
+    so concurrent callers see the same consistent series.
+    """
+    def __init__(self, seed=0, step_seconds=1.0):
+        self.fleet = FleetSimulator(1, seed=seed)
+        self.step_seconds = step_seconds
+
+    @property
+    def base_cpu(self):
+        return self.fleet.base_cpu
+
+    @property
+    def base_memory(self):
+        return self.fleet.base_memory
+
+    def _latest(self, metric, n):
+        now = int(time.time() // self.step_seconds)
+        return self.fleet.generate(now - n + 1, n, (metric,))[metric][0].tolist()
+
     def get_mock_cpu_data(self, n=10):
         """Generate realistic CPU utilization data"""
-        return [self._generate_realistic_pattern(self.base_cpu, 15.0) for _ in range(n)]
-    
+        return self._latest("cpu", n)
+
     def get_mock_memory_data(self, n=10):
         """Generate realistic memory utilization data"""
-        return [self._generate_realistic_pattern(self.base_memory, 12.0) for _ in range(n)]
-    
+        return self._latest("memory", n)
+
     def get_mock_network_data(self, n=10):
         """Generate realistic network I/O data (in MB/s)"""
-        base_network = 45.0
-        return [self._generate_realistic_pattern(base_network, 10.0) for _ in range(n)]
-    
+        return self._latest("network", n)
+
     def get_current_metrics(self):
         """Get current metric values"""
+        values = self.fleet.generate(int(time.time() // self.step_seconds), 1)
         return {
-            "cpu": self._generate_realistic_pattern(self.base_cpu, 15.0),
-            "memory": self._generate_realistic_pattern(self.base_memory, 12.0),
-            "network": self._generate_realistic_pattern(45.0, 10.0),
+            "cpu": float(values["cpu"][0, 0]),
+            "memory": float(values["memory"][0, 0]),
+            "network": float(values["network"][0, 0]),
             "timestamp": datetime.utcnow().isoformat()
         }
-    
+
     def update_base_values(self, cpu_change=0, memory_change=0):
         """Update base values to simulate scaling"""
-        self.base_cpu = max(20, min(90, self.base_cpu + cpu_change))
-        self.base_memory = max(20, min(90, self.base_memory + memory_change))
+        self.fleet.base_cpu = max(20, min(90, self.fleet.base_cpu + cpu_change))
+        self.fleet.base_memory = max(20, min(90, self.fleet.base_memory + memory_change))
 
 # Global simulator instance
 simulator = DataSimulator()
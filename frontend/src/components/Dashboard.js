@@ -33,36 +33,31 @@ function Dashboard() {
     document.documentElement.classList.toggle('dark', next === 'dark');
   };
 
-  // Fetch dashboard stats
-  const fetchDashboardStats = async () => {
-    try {
-      const res = await axios.get(`${API_BASE_URL}/api/dashboard/stats`);
-      setDashboardStats(res.data);
-    } catch (err) {
-      console.error('Error fetching dashboard stats:', err);
-      setError('Failed to load dashboard data');
-    }
-  };
-
-  // Fetch prediction
-  const fetchPrediction = async () => {
+  // Fetch stats, prediction and action in one request. The browser cache revalidates
+  // with the ETag, so an unchanged dashboard costs the backend a 304.
+  const fetchOverview = async () => {
     setLoading(true);
     try {
-      const res = await axios.get(`${API_BASE_URL}/api/predict/`);
-      setPrediction(res.data);
+      // The chart plots the prediction window, so skip the raw history
+      const res = await axios.get(`${API_BASE_URL}/api/dashboard/overview`, {
+        params: { history_limit: 0 }
+      });
+      setDashboardStats(res.data.stats);
+      setPrediction(res.data.prediction);
       
       // Format history for chart
-      const formattedHistory = res.data.cpu_history.map((val, i) => ({
-        time: `T-${res.data.cpu_history.length - i}`,
+      const { cpu_history: cpuHistory, memory_history: memoryHistory } = res.data.prediction;
+      const formattedHistory = cpuHistory.map((val, i) => ({
+        time: `T-${cpuHistory.length - i}`,
         cpu: val,
-        memory: res.data.memory_history[i] || 0
+        memory: memoryHistory[i] || 0
       }));
       setHistory(formattedHistory);
       
       setError(null);
     } catch (err) {
-      console.error('Error fetching prediction:', err);
-      setError('Failed to load predictions');
+      console.error('Error fetching dashboard overview:', err);
+      setError('Failed to load dashboard data');
     } finally {
       setLoading(false);
     }
@@ -118,19 +113,13 @@ function Dashboard() {
 
   // Initial data fetch
   useEffect(() => {
-    fetchDashboardStats();
-    fetchPrediction();
+    fetchOverview();
     
-    // Refresh stats every 30 seconds
-    const interval = setInterval(() => {
-      fetchDashboardStats();
-      if (!isRealtime) {
-        fetchPrediction();
-      }
-    }, 30000);
+    // Refresh every 30 seconds
+    const interval = setInterval(fetchOverview, 30000);
 
     return () => clearInterval(interval);
-  }, [isRealtime]);
+  }, []);
 
   return (
     <div className="dashboard-container">
@@ -152,7 +141,7 @@ function Dashboard() {
           </button>
           <button
             className="refresh-button"
-            onClick={fetchPrediction}
+            onClick={fetchOverview}
             disabled={loading}
           >
             {loading ? 'Loading…' : 'Refresh'}